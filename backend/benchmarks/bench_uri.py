@@ -0,0 +1,154 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+# Compares the URI codec against the parse templates it replaced.
+# Usage: python benchmarks/bench_uri.py [--count 20000] [--repeat 5]
+
+import argparse
+import os
+import sys
+import timeit
+from pathlib import Path, PurePath
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "python"))
+
+import parse
+from ignite.server import uri as codec
+
+ROOT = Path("/projects")
+URI_TEMPLATE = parse.compile("ign:{project}:{group}:{context}:{task}:{name}@{version}")
+URI_TEMPLATE_COMP = parse.compile(
+    "ign:{project}:{group}:{context}:{task}:{name}@{version}#{comp}"
+)
+URI_TEMPLATE_UNVERSIONED = parse.compile(
+    "ign:{project}:{group}:{context}:{task}:{name}"
+)
+
+
+def legacy_uri_to_path(uri):
+    uri = str(uri)
+    if "#" in uri:
+        result = URI_TEMPLATE_COMP.parse(uri)
+    else:
+        result = URI_TEMPLATE.parse(uri)
+    if not result:
+        result = URI_TEMPLATE_UNVERSIONED.parse(uri)
+    if not result:
+        amount = uri.count(":")
+        pattern_split = "ign:{project}:{group}:{context}:{task}".split(":")
+        pattern = ":".join(pattern_split[: amount + 1])
+        result = parse.parse(pattern, uri)
+    if not result:
+        return ""
+    data = result.named
+    name = data.get("name")
+    if name and name != "__scene__":
+        data["task"] += "/exports"
+    elif name:
+        data["name"] = "scenes"
+    if data.get("version"):
+        version = data.get("version")
+        if not version.startswith("v"):
+            data["version"] = codec.format_version(data["version"])
+    if data.get("comp"):
+        data["comp"] = data["comp"].replace("#", "")
+    path = ROOT
+    for part in codec.FIELDS:
+        if not data.get(part):
+            return path
+        path = path / data[part]
+    return path
+
+
+def make_uris(count):
+    uris = []
+    for i in range(count):
+        shot = f"shots:sq{i % 20:02d}/sh{i:04d}:comp"
+        kind = i % 4
+        if kind == 0:
+            uris.append(f"ign:proj:{shot}:plate@{i % 9 + 1}")
+        elif kind == 1:
+            uris.append(f"ign:proj:{shot}:render@{i % 9 + 1}#beauty.####.exr")
+        elif kind == 2:
+            uris.append(f"ign:proj:{shot}:__scene__@{i % 9 + 1}")
+        else:
+            uris.append(f"ign:proj:{shot}")
+    return uris
+
+
+def bench(label, fn, items, repeat):
+    def run():
+        for item in items:
+            fn(item)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    per_call = best / len(items) * 1e6
+    print(f"{label:<32} {best * 1000:9.2f} ms {per_call:8.2f} us/call")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    uris = make_uris(args.count)
+    for uri in uris[:100]:
+        assert codec.to_path(uri, ROOT) == legacy_uri_to_path(uri), uri
+
+    print(f"{args.count} URIs, best of {args.repeat}")
+    legacy = bench("uri_to_path (parse templates)", legacy_uri_to_path, uris, 1)
+    uncached = bench(
+        "uri_to_path (codec, uncached)",
+        lambda uri: codec._to_path.__wrapped__(uri, ROOT),
+        uris,
+        args.repeat,
+    )
+    codec.cache_clear()
+    cached = bench(
+        "uri_to_path (codec, memoised)",
+        lambda uri: codec.to_path(uri, ROOT),
+        uris,
+        args.repeat,
+    )
+    print(f"speedup uncached {legacy / uncached:.1f}x, memoised {legacy / cached:.1f}x")
+
+    paths = [(codec.to_path(uri, ROOT), uri) for uri in uris if "@" in uri]
+    items = []
+    for path, uri in paths:
+        if "#" in uri:
+            items.append((PurePath(path).parent, "assetversion"))
+        elif "__scene__" in uri:
+            items.append((path, "scene"))
+        else:
+            items.append((PurePath(path).parent, "asset"))
+    bench(
+        "from_path (uncached)",
+        lambda item: codec._from_path.__wrapped__(item[0], item[1], ROOT, None),
+        items,
+        args.repeat,
+    )
+    codec.cache_clear()
+    bench(
+        "from_path (memoised)",
+        lambda item: codec.from_path(item[0], item[1], ROOT),
+        items,
+        args.repeat,
+    )
+
+
+if __name__ == "__main__":
+    main()
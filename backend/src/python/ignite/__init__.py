@@ -87,6 +87,8 @@ ensure_config(
         "server_address": "0.0.0.0:9070",
         "root": str(HOME / "projects"),
         "vault_name": "__vault__",
+        "watcher": "auto",
+        "watcher_poll_interval": 10,
     },
 )
 
@@ -17,22 +17,19 @@ from genericpath import exists
 import re
 import os
 import glob
-import tempfile
 import yaml
 import shutil
 import clique
-from fnmatch import fnmatch
 from pathlib import Path, PurePath
 from pprint import pprint
-from string import Formatter
 
-import parse
 from ignite.server import api as server_api
 from ignite.client import utils
+from ignite.client import ingest as ingest_engine
 from ignite.client.utils import PROCESS_MANAGER, is_server_local
 
 from ignite.logger import get_logger
-from ignite.utils import copy_dir_or_files, is_sequence, path_has_frame
+from ignite.utils import is_sequence, path_has_frame
 from ignite.utils import replace_frame_in_path, ensure_clean_name
 
 LOGGER = get_logger(__name__)
@@ -58,12 +55,14 @@ def ingest(data):
     dirs = data.get("dirs")
     if not dirs:
         return {}
-    file_data = ingest_get_files(dirs)
+    listing = ingest_engine.get_listing(dirs, list_ingest_files, data.get("refresh"))
+    file_data = listing.data
     if not file_data:
         return {}
     files = file_data["files"]
     files_trimmed = file_data["trimmed"]
     rules = data.get("rules", [])
+    columns = ingest_engine.match(listing, rules)
     results = [
         {
             "trimmed": f,
@@ -81,32 +80,15 @@ def ingest(data):
         "rules_assets": []
     }
     for result in results:
-        file = result["file"]
-        trimmed = result["trimmed"]
-        filepath = str(file)
-        directory = str(file.parent)
-        filename = file.name
         for i, rule in enumerate(rules):
-            file_target = filepath
-            if rule["file_target_type"] == "directory":
-                file_target = directory
-            elif rule["file_target_type"] == "filename":
-                file_target = filename
-            pattern = rule["file_target"]
-            if "*" not in pattern:
-                pattern = f"*{pattern}*"
-            if not fnmatch(file_target, pattern):
+            cell = columns[i][result["index"]]
+            if cell is None:
                 continue
 
             # Extract info
-            rule_value = rule["rule"]
-            expr_target = trimmed
-            if "/" not in rule_value:
-                expr_target = filename
-            result["pattern"] = rule_value
-            parsed = parse.parse(rule_value, expr_target)
-            if parsed:
-                result["extract_info"] = parsed.named
+            result["pattern"] = rule["rule"]
+            if cell is not False:
+                result["extract_info"] = dict(cell)
                 result["rules"].append(i)
 
             # Replace values
@@ -128,9 +110,7 @@ def ingest(data):
         if not extracted_fields:
             continue
         pattern = result["pattern"]
-        fields = [f[1] for f in Formatter().parse(pattern) if f[1]]
-        fields = [field.split(".")[0] for field in fields]
-        fields = set(fields)
+        fields = ingest_engine.get_fields(pattern)
         processed = {}
         for field in fields:
             if field in list(extracted_fields.keys()):
@@ -151,7 +131,6 @@ def ingest(data):
             value += data_filtered[ordered[-1]]
             processed[field] = value
         result["extract_info"] = processed
-        pprint(result)
 
     def format_values(s, d):
         for k, v in d.items():
@@ -220,11 +199,15 @@ def ingest(data):
         return data
     
     for asset in assets:
-        print("Ingesting ", asset)
+        LOGGER.info(f"Ingesting {asset}")
         ingest_asset(asset)
 
 
-def ingest_get_files(dirs):
+def ingest_get_files(dirs, refresh=True):
+    return ingest_engine.get_listing(dirs, list_ingest_files, refresh).data
+
+
+def list_ingest_files(dirs):
     def trim_filepaths(files):
         file0 = files[0]
         windows_path = 0
@@ -373,7 +356,7 @@ def get_actions(project=None):
     return utils.discover_actions(project)
 
 
-def run_action(entity, kind, action, session_id):
+def run_action(entity, kind, action, session_id, priority=None):
     actions = utils.discover_actions().get(kind)
     if not actions:
         LOGGER.error(f"Couldn't find action {kind} {action}")
@@ -386,7 +369,8 @@ def run_action(entity, kind, action, session_id):
         PROCESS_MANAGER.create_process(
             action=_action,
             entity=entity,
-            session_id=session_id
+            session_id=session_id,
+            priority=priority
         )
         break
     else:
@@ -414,6 +398,10 @@ def get_processes(session_id):
     return data
 
 
+def get_process_history(session_id, states=None, limit=None):
+    return PROCESS_MANAGER.history(session_id, states, limit)
+
+
 def get_crates(crate_filter=[]):
     path = USER_CONFIG_PATH / "crates.yaml"
     if not path.is_file():
@@ -423,25 +411,17 @@ def get_crates(crate_filter=[]):
     crates = data
     if crate_filter:
         crates = list(filter(lambda c: c["id"] in crate_filter, crates))
-    uris_entities = {}
+    uris = []
     for crate in crates:
-        for uri in crate.get("entities", []):
-            uris_entities[uri] = ""
+        uris += crate.get("entities", [])
     if is_server_local():
-        uris_entities = {k: server_api.find(k) for k in uris_entities.keys()}
-        uris_entities = {
-            k: entity.as_dict()
-            for k, entity in uris_entities.items()
-            if hasattr(entity, "as_dict")
-        }
+        uris_entities = server_api.find_multiple(uris)
     else:
-        uris_entities = utils.server_request(
-            "find_multiple", {"data": data}
-        ).get("data")
+        uris_entities = utils.server_request("find_multiple", {"data": uris})
+        uris_entities = uris_entities.get("data") or {}
     for crate in crates:
-        crate["entities"] = [
-            uris_entities[uri] for uri in crate.get("entities", [])
-        ]
+        entities = [uris_entities.get(uri) for uri in crate.get("entities", [])]
+        crate["entities"] = [entity for entity in entities if entity]
     return crates
 
 
@@ -466,7 +446,6 @@ def zip_entity(path, dest, session_id):
 
 
 def zip_crate(crate_id, dest, session_id):
-    temp_dir = tempfile.gettempdir()
     crates = get_crates([crate_id])
     if not crates:
         LOGGER.error(f"Crate {crate_id} not found.")
@@ -476,20 +455,62 @@ def zip_crate(crate_id, dest, session_id):
     if not entities:
         LOGGER.warning(f"Attempted to zip crate {crate_id} without entities.")
         return
-    crate_dir = Path(temp_dir) / crate_id
-    if crate_dir.exists():
-        shutil.rmtree(crate_dir)
-    crate_dir.mkdir(parents=True)
-    for entity in entities:
-        path = entity["path"]
-        copy_dir_or_files(path, crate_dir)
+    # Members are streamed from where they are, nothing is staged first.
     data = {
-        "path": crate_dir.as_posix(),
+        "path": dest,
+        "sources": [entity["path"] for entity in entities],
         "zip_dest": dest
     }
     run_action(data, "common", "zip", session_id)
 
 
+def vault_import(path, name, session_id, mode=None):
+    if is_server_local():
+        target = server_api.prepare_vault_import(path, name)
+    else:
+        data = {"path": path, "name": name}
+        target = utils.server_request("prepare_vault_import", data).get("data")
+    if not target:
+        LOGGER.error(f"Failed to prepare vault import of {path}")
+        return
+    run_copy(path, target, session_id, mode)
+    return True
+
+
+def vault_export(path, task, name, session_id, mode=None):
+    if is_server_local():
+        target = server_api.prepare_vault_export(path, task, name)
+    else:
+        data = {"path": path, "task": task, "name": name}
+        target = utils.server_request("prepare_vault_export", data).get("data")
+    if not target:
+        LOGGER.error(f"Failed to prepare vault export of {path}")
+        return
+    run_copy(path, target, session_id, mode)
+    return True
+
+
+def run_copy(path, target, session_id, mode=None):
+    data = {
+        "path": path,
+        "copy_dest": target["dest"],
+        "update": target["update"],
+        "recursive": target.get("recursive", False)
+    }
+    if mode:
+        data["copy_mode"] = mode
+    if target.get("store"):
+        data["store"] = target["store"]
+    run_action(data, "common", "copy", session_id)
+
+
+def update_entity(path, recursive=False):
+    if is_server_local():
+        return server_api.update_entity(path, recursive)
+    data = {"path": path, "recursive": recursive}
+    return utils.server_request("update_entity", data).get("ok")
+
+
 def process_filepath(path):
     path = Path(path)
 
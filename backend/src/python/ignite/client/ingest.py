@@ -0,0 +1,228 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import fnmatch
+import hashlib
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from string import Formatter
+
+import parse
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+# Worker processes for matching, 0 keeps it in the calling thread.
+PROCESSES = int(ENV.get("IGNITE_INGEST_PROCESSES", 0))
+BATCH_SIZE = int(ENV.get("IGNITE_INGEST_BATCH_SIZE", 5000))
+LISTING_TTL = float(ENV.get("IGNITE_INGEST_LISTING_TTL", 30))
+MAX_LISTINGS = 8
+MAX_COLUMNS = int(ENV.get("IGNITE_INGEST_CACHE_SIZE", 512))
+
+
+@lru_cache(maxsize=1024)
+def compile_glob(pattern):
+    # What fnmatch does on every call, done once per rule.
+    if "*" not in pattern:
+        pattern = f"*{pattern}*"
+    return re.compile(fnmatch.translate(os.path.normcase(pattern)))
+
+
+@lru_cache(maxsize=1024)
+def compile_rule(rule_value):
+    try:
+        return parse.compile(rule_value)
+    except (ValueError, re.error) as e:
+        LOGGER.error(f"Invalid ingest rule {rule_value}: {e}")
+        return None
+
+
+@lru_cache(maxsize=1024)
+def get_fields(pattern):
+    fields = [f[1] for f in Formatter().parse(pattern) if f[1]]
+    return {field.split(".")[0] for field in fields}
+
+
+def match_batch(file_target, rule_value, targets, exprs):
+    # One cell per file: None if the glob misses, False if the rule doesn't
+    # parse, the named fields if it does.
+    glob = compile_glob(file_target)
+    parser = compile_rule(rule_value)
+    cells = []
+    for target, expr in zip(targets, exprs):
+        if not glob.match(os.path.normcase(target)):
+            cells.append(None)
+            continue
+        parsed = parser.parse(expr) if parser else None
+        cells.append(parsed.named if parsed else False)
+    return cells
+
+
+class Listing:
+    def __init__(self, data):
+        self.data = data
+        files = data["files"] if data else []
+        self.paths = [str(f) for f in files]
+        self.dirs = [str(f.parent) for f in files]
+        self.names = [f.name for f in files]
+        self.trimmed = data["trimmed"] if data else []
+        s = "\0".join(self.paths)
+        self.digest = hashlib.blake2b(s.encode(), digest_size=16).hexdigest()
+        self.created = time.time()
+
+    def targets(self, target_type):
+        if target_type == "directory":
+            return self.dirs
+        if target_type == "filename":
+            return self.names
+        return self.paths
+
+    def exprs(self, rule_value):
+        return self.trimmed if "/" in rule_value else self.names
+
+
+class IngestCache:
+    # Listings are kept for a short while per set of dirs, columns for as
+    # long as their listing and rule pattern are the same. Editing one rule
+    # only recomputes that rule's column.
+    def __init__(self, max_columns=MAX_COLUMNS, ttl=LISTING_TTL):
+        self.max_columns = max_columns
+        self.ttl = ttl
+        self.listings = OrderedDict()
+        self.columns = OrderedDict()
+        self.lock = threading.Lock()
+        self.pool = None
+        self.hits = 0
+        self.misses = 0
+        self.listed = 0
+
+    def get_listing(self, dirs, loader, refresh=False):
+        with self.lock:
+            listing = self.listings.get(dirs)
+            if listing and not refresh and time.time() - listing.created < self.ttl:
+                self.listings.move_to_end(dirs)
+                return listing
+        listing = Listing(loader(dirs))
+        with self.lock:
+            self.listed += 1
+            self.listings[dirs] = listing
+            self.listings.move_to_end(dirs)
+            while len(self.listings) > MAX_LISTINGS:
+                self.listings.popitem(last=False)
+        return listing
+
+    def column_key(self, listing, rule):
+        return (
+            listing.digest,
+            rule["file_target_type"],
+            rule["file_target"],
+            rule["rule"],
+        )
+
+    def match(self, listing, rules):
+        keys = [self.column_key(listing, rule) for rule in rules]
+        columns = {}
+        with self.lock:
+            for key in keys:
+                column = self.columns.get(key)
+                if column is not None:
+                    self.columns.move_to_end(key)
+                    columns[key] = column
+            missing = {k: r for k, r in zip(keys, rules) if k not in columns}
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        if missing:
+            computed = self.compute(listing, missing)
+            with self.lock:
+                for key, column in computed.items():
+                    self.columns[key] = column
+                    self.columns.move_to_end(key)
+                while len(self.columns) > self.max_columns:
+                    self.columns.popitem(last=False)
+            columns.update(computed)
+        return [columns[key] for key in keys]
+
+    def compute(self, listing, rules):
+        batches = []
+        for key, rule in rules.items():
+            targets = listing.targets(rule["file_target_type"])
+            exprs = listing.exprs(rule["rule"])
+            for start in range(0, len(targets), BATCH_SIZE):
+                end = start + BATCH_SIZE
+                args = (rule["file_target"], rule["rule"])
+                batches.append((key, args + (targets[start:end], exprs[start:end])))
+        pool = self.get_pool() if len(batches) > 1 else None
+        if pool:
+            results = pool.map(match_batch, *zip(*[args for _, args in batches]))
+        else:
+            results = (match_batch(*args) for _, args in batches)
+        computed = {key: [] for key in rules}
+        for (key, _), cells in zip(batches, results):
+            computed[key] += cells
+        return computed
+
+    def get_pool(self):
+        if PROCESSES < 2:
+            return None
+        with self.lock:
+            if not self.pool:
+                # Spawned, forking a process full of server threads isn't safe.
+                context = multiprocessing.get_context("spawn")
+                self.pool = ProcessPoolExecutor(PROCESSES, mp_context=context)
+            return self.pool
+
+    def invalidate(self):
+        with self.lock:
+            self.listings.clear()
+            self.columns.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "listings": len(self.listings),
+                "columns": len(self.columns),
+                "max_columns": self.max_columns,
+                "listed": self.listed,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+                "processes": PROCESSES,
+            }
+
+
+INGEST_CACHE = IngestCache()
+
+
+def get_listing(dirs, loader, refresh=False):
+    return INGEST_CACHE.get_listing(dirs, loader, refresh)
+
+
+def match(listing, rules):
+    return INGEST_CACHE.match(listing, rules)
+
+
+def invalidate():
+    INGEST_CACHE.invalidate()
+
+
+def get_stats():
+    return INGEST_CACHE.stats()
@@ -0,0 +1,232 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+# Finished jobs kept around as history, the oldest go first.
+HISTORY = int(ENV.get("IGNITE_JOB_HISTORY", 5000))
+UNFINISHED = ("waiting", "running", "paused")
+COLUMNS = (
+    "id",
+    "session_id",
+    "action",
+    "entity",
+    "priority",
+    "state",
+    "progress",
+    "result",
+    "created",
+    "started",
+    "finished",
+    "updated",
+)
+JSON_COLUMNS = ("action", "entity", "result")
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        session_id TEXT NOT NULL DEFAULT '',
+        action TEXT NOT NULL,
+        entity TEXT NOT NULL,
+        priority INTEGER NOT NULL DEFAULT 0,
+        state TEXT NOT NULL,
+        progress REAL NOT NULL DEFAULT 0,
+        result TEXT,
+        created REAL NOT NULL,
+        started REAL NOT NULL DEFAULT 0,
+        finished REAL NOT NULL DEFAULT 0,
+        updated REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created)",
+    "CREATE INDEX IF NOT EXISTS jobs_session ON jobs (session_id, state)",
+)
+
+
+def _dumps(value):
+    return json.dumps(value, default=str)
+
+
+def _to_dict(row):
+    d = dict(row)
+    for column in JSON_COLUMNS:
+        if d.get(column) is not None:
+            d[column] = json.loads(d[column])
+    return d
+
+
+class JobStore:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        # One connection for the lifetime of the manager, progress updates
+        # are frequent enough that reopening it each time shows.
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+
+    def __repr__(self):
+        return f"JobStore({self.path})"
+
+    @contextmanager
+    def connect(self):
+        with self.lock:
+            with self.conn:
+                yield self.conn
+
+    def put(self, job):
+        now = time.time()
+        job = dict(job)
+        job.setdefault("created", now)
+        job["updated"] = now
+        row = []
+        for column in COLUMNS:
+            value = job.get(column)
+            if column in JSON_COLUMNS:
+                value = _dumps(value) if value is not None else None
+            elif value is None and column != "result":
+                value = "" if column in ("session_id", "state") else 0
+            row.append(value)
+        placeholders = ", ".join("?" * len(COLUMNS))
+        with self.connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO jobs ({', '.join(COLUMNS)}) "
+                f"VALUES ({placeholders})",
+                row,
+            )
+
+    def update(self, job_id, **fields):
+        fields = {k: v for k, v in fields.items() if k in COLUMNS and k != "id"}
+        for column in JSON_COLUMNS:
+            if column in fields:
+                fields[column] = _dumps(fields[column])
+        fields["updated"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self.connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id):
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _to_dict(row) if row else None
+
+    def query(self, session_id=None, states=None, limit=None):
+        sql = "SELECT * FROM jobs"
+        where = []
+        args = []
+        if session_id:
+            where.append("session_id = ?")
+            args.append(session_id)
+        if states:
+            if isinstance(states, str):
+                states = (states,)
+            where.append(f"state IN ({', '.join('?' * len(states))})")
+            args += list(states)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self.connect() as conn:
+            rows = conn.execute(sql, args).fetchall()
+        return [_to_dict(row) for row in rows]
+
+    def delete(self, job_id):
+        with self.connect() as conn:
+            conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def prune(self, keep=HISTORY):
+        marks = ", ".join("?" * len(UNFINISHED))
+        with self.connect() as conn:
+            cursor = conn.execute(
+                f"""
+                DELETE FROM jobs WHERE state NOT IN ({marks}) AND id NOT IN (
+                    SELECT id FROM jobs WHERE state NOT IN ({marks})
+                    ORDER BY finished DESC LIMIT ?
+                )
+                """,
+                (*UNFINISHED, *UNFINISHED, keep),
+            )
+        if cursor.rowcount:
+            LOGGER.debug(f"Pruned {cursor.rowcount} finished jobs from {self}")
+        return cursor.rowcount
+
+    def counts(self):
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT state, COUNT(*) AS amount FROM jobs GROUP BY state"
+            ).fetchall()
+        return {row["state"]: row["amount"] for row in rows}
+
+    def migrate_tinydb(self, json_path):
+        # processes.json only ever held jobs that hadn't finished yet.
+        json_path = Path(json_path)
+        if not json_path.is_file():
+            return 0
+        try:
+            with open(json_path, "r") as f:
+                data = json.load(f)
+            if not isinstance(data, dict):
+                raise ValueError("not a TinyDB database")
+        except (OSError, ValueError) as e:
+            LOGGER.error(f"Couldn't read {json_path} for migration: {e}")
+            # Set aside, it would otherwise fail again on every start.
+            try:
+                json_path.rename(json_path.with_suffix(".json.invalid"))
+            except OSError as e:
+                LOGGER.error(f"Couldn't move {json_path} aside: {e}")
+            return 0
+        amount = 0
+        for doc in data.get("_default", {}).values():
+            if not doc.get("process_id") or self.get(doc["process_id"]):
+                continue
+            self.put(
+                {
+                    "id": doc["process_id"],
+                    "session_id": doc.get("session_id") or "",
+                    "action": doc.get("action", {}),
+                    "entity": doc.get("entity", {}),
+                    "priority": doc.get("priority") or 0,
+                    "state": "waiting",
+                }
+            )
+            amount += 1
+        json_path.rename(json_path.with_suffix(".json.migrated"))
+        LOGGER.info(f"Migrated {amount} jobs from {json_path} to {self}")
+        return amount
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -15,34 +15,43 @@
 
 import os
 import asyncio
+import heapq
 import importlib
+import itertools
 import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import PurePath
 from uuid import uuid4
 
-from tinydb import Query, TinyDB
-
+from ignite.client.job_store import UNFINISHED, JobStore
 from ignite.logger import get_logger
 
 LOGGER = get_logger(__name__)
+ENV = os.environ
+SLOTS = int(ENV.get("IGNITE_PROCESS_SLOTS", max(2, (os.cpu_count() or 4) // 2)))
+# Progress is persisted at most this often per job, state changes always are.
+PROGRESS_INTERVAL = 1
 
 
-def start_worker(loop):
+def setup_worker_env():
     from ignite.client.utils import get_generic_env
     PID = str(os.getpid())
     LOGGER.warning(f"WORKER INIT - PID {PID}")
     env = os.environ
     ignite_env = get_generic_env()
-    from pprint import pprint
     for k, v in ignite_env.items():
         env[k] = v
-    asyncio.set_event_loop(loop)
-    loop.run_forever()
-    LOGGER.warning("WORKER END")
+
+
+def run_in_slot(process):
+    # Every slot runs its action on a loop of its own, an action sitting in a
+    # blocking call (oiiotool, ffmpeg, zlib) only holds up its own slot.
+    return asyncio.run(process.run())
 
 
 class Process():
-    def __init__(self, action, entity, process_id, processes_manager, on_finish, session_id, **kwargs):
+    def __init__(self, action, entity, process_id, processes_manager, on_finish, session_id, priority=0, on_update=None, **kwargs):
         self.action = action
         self.entity = entity
         self.id = process_id
@@ -50,17 +59,17 @@ class Process():
         self.processes_manager = processes_manager
         self.state = {"paused": False, "killed": False, "active": "waiting"}
         self.on_finish = on_finish
+        self.on_update = on_update
         self.progress = 0
+        self.priority = priority
+        self.failed = False
+        self.queued = time.time()
+        self.started = 0
+        self.finished = 0
+        self.result = None
 
     async def run(self):
         async def progress_fn(progress=-1, state=""):
-            ws = self.processes_manager.get(self.session_id)
-            if not ws and self.processes_manager.connections:
-                ws, ws_id = self.processes_manager.connections[0]
-                LOGGER.error(f"Websocket was not found for {self} {self.session_id} but ended up using {ws_id}")
-            elif not ws:
-                LOGGER.error(f"Websocket was not found for {self} {self.session_id}")
-                return
             data = {
                 "id": self.id,
                 "name": self.action["label"],
@@ -74,22 +83,55 @@ class Process():
                 self.state["active"] = state
             elif progress >= 0:
                 data["state"] = "running" if progress < 100 else "finished"
-                self.state["active"] = state
-            await ws.send_json({"data": data})
-        module_path = PurePath(self.action["module_path"])
-        module = importlib.machinery.SourceFileLoader(
-            module_path.name, str(module_path)
-        ).load_module()
-        result = await module.main(entity=self.entity, progress_fn=progress_fn, state=self.state)
+                self.state["active"] = data["state"]
+            self.send({"data": data})
+            if self.on_update:
+                self.on_update(self)
+        self.started = time.time()
+        self.state["active"] = "running"
+        if self.on_update:
+            self.on_update(self)
+        result = None
+        try:
+            module_path = PurePath(self.action["module_path"])
+            module = importlib.machinery.SourceFileLoader(
+                module_path.name, str(module_path)
+            ).load_module()
+            result = await module.main(entity=self.entity, progress_fn=progress_fn, state=self.state)
+        except Exception as e:
+            LOGGER.error(f"Process {self.id} ({self.action['label']}) failed: {e}")
+            self.failed = True
+        self.result = result
+        self.finished = time.time()
         self.on_finish(self.id, result)
         return result
     
+    def send(self, message):
+        # Runs on a worker slot, the socket manager hands it over to the
+        # server loop so a slow client never holds up the process.
+        manager = self.processes_manager
+        if manager.send(self.session_id, message):
+            return
+        session_ids = manager.session_ids()
+        if not session_ids:
+            LOGGER.error(f"Websocket was not found for {self} {self.session_id}")
+            return
+        LOGGER.error(f"Websocket was not found for {self} {self.session_id} but ended up using {session_ids[0]}")
+        manager.send(session_ids[0], message)
+
     def as_dict(self):
         return {
+            "id": self.id,
             "action": self.action,
             "entity": self.entity,
-            "process_id": self.id,
-            "session_id": self.session_id
+            "session_id": self.session_id or "",
+            "priority": self.priority,
+            "state": self.state["active"],
+            "progress": self.progress,
+            "result": self.result,
+            "created": self.queued,
+            "started": self.started,
+            "finished": self.finished,
         }
 
     def pause(self):
@@ -103,70 +145,171 @@ class Process():
 
 
 class ProcessManager():
-    def __init__(self, processes_manager, db_path):
-        self.db = TinyDB(db_path)
+    def __init__(self, processes_manager, db_path, slots=SLOTS):
+        self.store = JobStore(db_path)
+        self.store.migrate_tinydb(PurePath(db_path).with_suffix(".json"))
         self.processes = []
         self.processes_manager = processes_manager
-        self.loop = None
+        self.slots = max(1, slots)
+        self.executor = None
+        # Guards the queue and the running set, the server loop and the
+        # worker slots all get here.
+        self.lock = threading.RLock()
+        self.queue = []
+        self.counter = itertools.count()
+        self.running = {}
+        self.persisted = {}
 
     def start(self):
-        if not self.loop:
-            self.loop = asyncio.new_event_loop()
-        self.thread = threading.Thread(
-            name="IgniteWorker",
-            target=start_worker,
-            args=(self.loop,),
-            daemon=True
-        )
-        self.thread.start()
+        with self.lock:
+            if self.executor:
+                return
+            setup_worker_env()
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.slots, thread_name_prefix="IgniteWorker"
+            )
+        self.schedule()
+
+    def set_slots(self, slots):
+        slots = max(1, int(slots))
+        with self.lock:
+            old = self.executor
+            self.slots = slots
+            self.executor = ThreadPoolExecutor(
+                max_workers=slots, thread_name_prefix="IgniteWorker"
+            )
+        if old:
+            # Whatever is already running finishes on the old slots.
+            old.shutdown(wait=False)
+        LOGGER.debug(f"Process manager has {slots} slots")
+        self.schedule()
+        return True
 
-    def create_process(self, action, entity, session_id, process_id=None):
+    def create_process(self, action, entity, session_id, process_id=None, priority=None):
         process_id = process_id or str(uuid4())
+        if priority is None:
+            priority = action.get("priority") or 0
         process = Process(
             action=action,
             entity=entity,
             process_id=process_id,
             session_id=session_id,
             processes_manager=self.processes_manager,
-            on_finish=self.handle_process_finished
+            on_finish=self.handle_process_finished,
+            priority=priority,
+            on_update=self.update_process
         )
         self.run_process(process)
     
     def run_process(self, process):
-        LOGGER.debug(f"Process manager info: {self.thread} {self.loop}")
         LOGGER.debug(f"Process: {process}")
-        if not self.thread or not self.thread.is_alive():
+        if not self.executor:
             self.start()
-        if not self.loop:
-            self.loop = asyncio.new_event_loop()
-        asyncio.create_task(self.send(process))
-        future = asyncio.run_coroutine_threadsafe(process.run(), self.loop)
-        LOGGER.debug(f"Future: {future}")
-        self.remove(Query().process.id)
-        self.db.insert(process.as_dict())
-        self.processes.append({
-            "id": process.id,
-            "process": process,
-            "future": future,
-        })
+        with self.lock:
+            if process.id in self.running:
+                LOGGER.warning(f"Process {process.id} is already running")
+                return
+            process.state.update(killed=False, active="waiting")
+            process.failed = False
+            process.progress = 0
+            process.queued = time.time()
+            process.started = process.finished = 0
+            process.result = None
+            self.store.put(process.as_dict())
+            if not self.get_process(process.id):
+                self.processes.append({
+                    "id": process.id,
+                    "process": process,
+                    "future": None,
+                })
+            # Highest priority first, first come first served within it.
+            heapq.heappush(self.queue, (-process.priority, next(self.counter), process))
+        self.send(process, state="waiting")
+        self.schedule()
+
+    def schedule(self):
+        with self.lock:
+            if not self.executor:
+                return
+            held = []
+            while self.queue and len(self.running) < self.slots:
+                entry = heapq.heappop(self.queue)
+                process = entry[2]
+                if process.state["killed"]:
+                    continue
+                if process.state["paused"] or not self.has_capacity(process.action):
+                    held.append(entry)
+                    continue
+                self.running[process.id] = process
+                future = self.executor.submit(run_in_slot, process)
+                for process_data in self.processes:
+                    if process_data["id"] == process.id:
+                        process_data["future"] = future
+                LOGGER.debug(f"Started {process.id} ({process.action['label']})")
+            for entry in held:
+                heapq.heappush(self.queue, entry)
+
+    def has_capacity(self, action):
+        limit = action.get("concurrency")
+        if not limit:
+            return True
+        source = action.get("source")
+        running = [p for p in self.running.values() if p.action.get("source") == source]
+        return len(running) < limit
+
+    def queue_positions(self):
+        with self.lock:
+            ordered = sorted(e[:2] + (e[2].id,) for e in self.queue if not e[2].state["killed"])
+        return {process_id: i for i, (_, _, process_id) in enumerate(ordered, 1)}
+
+    def dequeue(self, process):
+        with self.lock:
+            queued = [e for e in self.queue if e[2] is not process]
+            if len(queued) == len(self.queue):
+                return False
+            self.queue = queued
+            heapq.heapify(self.queue)
+        return True
 
     def remove(self, process_id):
-        for i, process_data in enumerate(self.processes):
-            if process_data["id"] == process_id:
-                self.processes.pop(i)
-                break
-        self.db.remove(Query().process_id == process_id)
+        with self.lock:
+            for i, process_data in enumerate(self.processes):
+                if process_data["id"] == process_id:
+                    self.processes.pop(i)
+                    break
+        self.store.delete(process_id)
     
     def restore_processes(self):
-        for kwargs in self.db:
-            LOGGER.warning(f"Restoring process from db {kwargs['process_id']}")
+        self.store.prune()
+        for job in self.store.query(states=UNFINISHED):
+            LOGGER.warning(f"Restoring process from db {job['id']}")
             self.create_process(
-                action=kwargs["action"],
-                entity=kwargs["entity"],
-                process_id=kwargs["process_id"],
-                session_id=kwargs["session_id"]
+                action=job["action"],
+                entity=job["entity"],
+                process_id=job["id"],
+                session_id=job["session_id"],
+                priority=job["priority"]
             )
 
+    def update_process(self, process):
+        # Called on every progress report, only state changes are written
+        # straight away.
+        now = time.time()
+        last_state, last_time = self.persisted.get(process.id, ("", 0))
+        state = process.state["active"]
+        if state == last_state and now - last_time < PROGRESS_INTERVAL:
+            return
+        self.persisted[process.id] = (state, now)
+        self.store.update(
+            process.id,
+            state=state,
+            progress=process.progress,
+            started=process.started,
+        )
+
+    def history(self, session_id="", states=None, limit=None):
+        return self.store.query(session_id=session_id, states=states, limit=limit)
+
     def processes(self):
         return self.processes
     
@@ -175,10 +318,23 @@ class ProcessManager():
     
     def handle_process_finished(self, process_id, result):
         process = self.get_process(process_id)
-        asyncio.create_task(self.send(process, state="finished" if not process.state["killed"] else "error"))
-        print(f"Removing {process_id} from db...")
-        self.db.remove(Query().process_id == process_id)
-        print("Done.")
+        with self.lock:
+            self.running.pop(process_id, None)
+        self.persisted.pop(process_id, None)
+        if process:
+            failed = process.state["killed"] or process.failed
+            failed = failed or process.state["active"] == "error"
+            process.state["active"] = "error" if failed else "finished"
+            process.finished = process.finished or time.time()
+            self.send(process, state=process.state["active"])
+            self.store.update(
+                process_id,
+                state=process.state["active"],
+                progress=process.progress,
+                result=process.result,
+                finished=process.finished,
+            )
+        self.schedule()
     
     def get_process(self, process_id):
         for process_data in self.processes:
@@ -187,6 +343,7 @@ class ProcessManager():
     
     def report(self, session_id=""):
         data = []
+        positions = self.queue_positions()
         for process_data in self.processes:
             process = process_data["process"]
             if session_id and session_id != process.session_id:
@@ -196,10 +353,26 @@ class ProcessManager():
                 "progress": process.progress,
                 "name": process.action["label"],
                 "entity": process.entity,
-                "id": process.id
+                "id": process.id,
+                "priority": process.priority,
+                "queue_position": positions.get(process.id, 0)
             })
         return data
 
+    def stats(self):
+        with self.lock:
+            actions = {}
+            for process in self.running.values():
+                label = process.action["label"]
+                actions[label] = actions.get(label, 0) + 1
+            return {
+                "slots": self.slots,
+                "running": len(self.running),
+                "queued": len(self.queue),
+                "actions": actions,
+                "jobs": self.store.counts(),
+            }
+
     def get_future(self, process_id):
         for process_data in self.processes:
             if process_data["id"] == process_id:
@@ -210,17 +383,27 @@ class ProcessManager():
         print(f"Pausing {process}")
         if process:
             process.pause()
+            if process.id not in self.running:
+                process.state["active"] = "paused"
+                self.send(process, state="paused")
+                self.update_process(process)
     
     def unpause(self, process_id):
         process = self.get_process(process_id)
         print(f"Unpausing {process}")
         if process:
             process.unpause()
+            if process.id not in self.running:
+                process.state["active"] = "waiting"
+                self.send(process, state="waiting")
+                self.update_process(process)
+                self.schedule()
     
     def retry(self, process_id):
         process = self.get_process(process_id)
         print(f"Retrying {process}")
         if process:
+            self.dequeue(process)
             self.run_process(process)
     
     def kill(self, process_id):
@@ -228,25 +411,25 @@ class ProcessManager():
         print(f"Killing {process}")
         if process:
             process.kill()
+            # Queued ones never get to notice, finish them here.
+            if self.dequeue(process):
+                self.handle_process_finished(process.id, None)
     
     def clear(self, process_id):
-        for i, process_data in enumerate(self.processes):
-            if process_data["id"] == process_id:
-                print(f"Clearing {process_data['process']}")
-                self.db.remove(Query().process_id == process_id)
-                self.processes.pop(i)
-                break
-        else:
-            print(f"Couldn't find process to clear with {process_id}")
-
-    async def send(self, process, progress=-1, state=""):
-        ws = self.processes_manager.get(process.session_id)
-        if not ws and self.processes_manager.connections:
-            ws, ws_id = self.processes_manager.connections[0]
-            LOGGER.error(f"Websocket was not found for {process} {process.session_id} but ended up using {ws_id}")
-        elif not ws:
-            LOGGER.error(f"Websocket was not found for {process} {process.session_id}")
-            return
+        with self.lock:
+            for i, process_data in enumerate(self.processes):
+                if process_data["id"] == process_id:
+                    print(f"Clearing {process_data['process']}")
+                    process = process_data["process"]
+                    if self.dequeue(process):
+                        process.kill()
+                    self.store.delete(process_id)
+                    self.processes.pop(i)
+                    break
+            else:
+                print(f"Couldn't find process to clear with {process_id}")
+
+    def send(self, process, progress=-1, state=""):
         data = {
             "name": process.action["label"],
             "entity": process.entity,
@@ -256,4 +439,6 @@ class ProcessManager():
             data["progress"] = progress
         if state:
             data["state"] = state
-        await ws.send_json({"data": data})
+        if state == "waiting":
+            data["queue_position"] = self.queue_positions().get(process.id, 0)
+        process.send({"data": data})
@@ -18,10 +18,12 @@ from pprint import pprint
 
 from fastapi import APIRouter, Request, WebSocket
 
+from ignite import dispatch
 from ignite.logger import get_logger
 from ignite.utils import mount_root, log_request, error
 from ignite.server import api as server_api
 from ignite.client import utils, api
+from ignite.client import ingest as ingest_engine
 from ignite.client.utils import PROCESS_MANAGER, SOCKET_MANAGER
 from ignite.client.utils import is_server_local
 
@@ -50,10 +52,37 @@ async def processes(websocket: WebSocket, session_id: str):
     while True:
         try:
             received = await websocket.receive_text()
-            await websocket.send_json({"data": PROCESS_MANAGER.report()})
         except Exception as e:
             print("error:", e)
             break
+        data = {"data": PROCESS_MANAGER.report()}
+        if not session_id or not SOCKET_MANAGER.send(session_id, data):
+            await websocket.send_json(data)
+    if session_id:
+        SOCKET_MANAGER.disconnect(websocket, session_id)
+
+
+@router.get("/get_process_stats")
+async def get_process_stats():
+    data = PROCESS_MANAGER.stats()
+    return {"ok": True, "data": data}
+
+
+@router.post("/set_process_slots")
+async def set_process_slots(request: Request):
+    result = await request.json()
+    log_request(result)
+    slots = result.get("slots")
+    if not slots:
+        return error("invalid_data")
+    ok = PROCESS_MANAGER.set_slots(slots)
+    return {"ok": ok}
+
+
+@router.get("/get_socket_stats")
+async def get_socket_stats():
+    data = SOCKET_MANAGER.stats()
+    return {"ok": True, "data": data}
 
 
 @router.get("/get_config")
@@ -67,7 +96,7 @@ async def set_config(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    CONFIG, mount = utils.set_config(data)
+    CONFIG, mount = await dispatch.run(utils.set_config, data)
     if mount:
         mount_root(router, CONFIG)
     return {"ok": True}
@@ -88,13 +117,13 @@ async def launch_dcc(request: Request):
             "dcc": dcc
         }
         if is_server_local():
-            resp = server_api.copy_default_scene(task, dcc)
+            resp = await dispatch.run_io(server_api.copy_default_scene, task, dcc)
         else:
-            resp = utils.server_request("copy_default_scene", data)
+            resp = await dispatch.run(utils.server_request, "copy_default_scene", data)
         scene = resp.get("scene", "")
     elif new_scene and not task:
         return {"ok": False}
-    ok = utils.launch_dcc(dcc, dcc_name, scene)
+    ok = await dispatch.run(utils.launch_dcc, dcc, dcc_name, scene)
     return {"ok": ok}
 
 
@@ -107,10 +136,10 @@ async def get_launch_cmd(request: Request):
     dcc = result.get("dcc", {})
     new_scene = result.get("new_scene", False)
     if new_scene and task:
-        scene = utils.copy_default_scene(task, dcc)
+        scene = await dispatch.run_io(utils.copy_default_scene, task, dcc)
     elif new_scene and not task:
         return {"ok": False}
-    data = utils.get_launch_cmd(dcc, task, scene)
+    data = await dispatch.run(utils.get_launch_cmd, dcc, task, scene)
     return {"ok": True, "data": data}
 
 
@@ -121,7 +150,7 @@ async def show_in_explorer(request: Request):
     filepath = result.get("filepath")
     if not filepath:
         return {"ok": False}
-    ok = utils.show_in_explorer(filepath)
+    ok = await dispatch.run(utils.show_in_explorer, filepath)
     return {"ok": ok}
 
 
@@ -132,7 +161,7 @@ async def get_explorer_cmd(request: Request):
     filepath = result.get("filepath")
     if not filepath:
         return {"ok": False}
-    data = utils.get_explorer_cmd(filepath)
+    data = await dispatch.run(utils.get_explorer_cmd, filepath)
     return {"ok": True, "data": data}
 
 
@@ -142,7 +171,7 @@ async def get_env(request: Request):
     log_request(result)
     task = result.get("task", "")
     dcc = result.get("dcc", "")
-    env = utils.get_env(task, dcc)
+    env = await dispatch.run(utils.get_env, task, dcc)
     return {"ok": True, "data": env}
 
 
@@ -151,16 +180,22 @@ async def ingest_get_files(request: Request):
     result = await request.json()
     log_request(result)
     dirs = result.get("dirs", "")
-    resp = api.ingest_get_files(dirs)
+    resp = await dispatch.run(api.ingest_get_files, dirs)
     return {"ok": True, "data": resp}
 
 
+@router.get("/get_ingest_stats")
+async def get_ingest_stats():
+    data = ingest_engine.get_stats()
+    return {"ok": True, "data": data}
+
+
 @router.post("/ingest")
 async def ingest(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    resp = api.ingest(data)
+    resp = await dispatch.run_io(api.ingest, data)
     return {"ok": True, "data": resp}
 
 
@@ -169,7 +204,7 @@ async def ingest_asset(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    ok = api.ingest_asset(data)
+    ok = await dispatch.run_io(api.ingest_asset, data)
     return {"ok": ok}
 
 
@@ -178,7 +213,7 @@ async def ingest_scene(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    ok = api.ingest_scene(data)
+    ok = await dispatch.run_io(api.ingest_scene, data)
     return {"ok": ok}
 
 
@@ -187,13 +222,13 @@ async def get_actions(request: Request):
     result = await request.json()
     log_request(result)
     project = result.get("project")
-    data = api.get_actions(project)
+    data = await dispatch.run(api.get_actions, project)
     return {"ok": True, "data": data}
 
 
 @router.get("/discover_dcc")
 async def discover_dcc():
-    data = utils.discover_dcc()
+    data = await dispatch.run(utils.discover_dcc)
     return {"ok": True, "data": data}
 
 
@@ -207,7 +242,8 @@ async def run_action(request: Request):
     if not entity or not action:
         return {"ok": False}
     session_id = result.get("session_id")
-    api.run_action(entity, kind, action, session_id)
+    priority = result.get("priority")
+    api.run_action(entity, kind, action, session_id, priority)
     return {"ok": True}
 
 
@@ -230,15 +266,26 @@ async def get_processes(request: Request):
     return {"ok": True, "data": data}
 
 
+@router.post("/get_process_history")
+async def get_process_history(request: Request):
+    result = await request.json()
+    log_request(result)
+    session_id = result.get("session_id")
+    states = result.get("states")
+    limit = result.get("limit")
+    data = await dispatch.run(api.get_process_history, session_id, states, limit)
+    return {"ok": True, "data": data}
+
+
 @router.get("/is_local_server_running")
 async def is_local_server_running():
-    data = api.is_local_server_running()
+    data = await dispatch.run(api.is_local_server_running)
     return {"ok": data}
 
 
 @router.get("/get_crates")
 async def get_crates():
-    data = api.get_crates()
+    data = await dispatch.run(api.get_crates)
     return {"ok": True, "data": data}
 
 
@@ -247,7 +294,7 @@ async def set_crates(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data")
-    ok = api.set_crates(data)
+    ok = await dispatch.run(api.set_crates, data)
     return {"ok": ok}
 
 
@@ -273,10 +320,39 @@ async def zip_crate(request: Request):
     return {"ok": ok}
 
 
+@router.post("/vault_import")
+async def vault_import(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    name = result.get("name")
+    if not path or not name:
+        return error("invalid_data")
+    session_id = result.get("session_id")
+    mode = result.get("mode")
+    ok = await dispatch.run_io(api.vault_import, path, name, session_id, mode)
+    return {"ok": bool(ok)}
+
+
+@router.post("/vault_export")
+async def vault_export(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    task = result.get("task")
+    name = result.get("name")
+    if not path or not task or not name:
+        return error("invalid_data")
+    session_id = result.get("session_id")
+    mode = result.get("mode")
+    ok = await dispatch.run_io(api.vault_export, path, task, name, session_id, mode)
+    return {"ok": bool(ok)}
+
+
 @router.post("/process_filepath")
 async def process_filepath(request: Request):
     result = await request.json()
     log_request(result)
     path = result.get("path")
-    data = api.process_filepath(path)
+    data = await dispatch.run(api.process_filepath, path)
     return {"ok": True, "data": data}
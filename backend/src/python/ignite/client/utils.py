@@ -44,7 +44,7 @@ DCC = Path(ENV["IGNITE_DCC"])
 CONFIG_PATH = Path(ENV["IGNITE_CONFIG_PATH"])
 
 SOCKET_MANAGER = SocketManager()
-PROCESS_MANAGER = ProcessManager(SOCKET_MANAGER, USER_CONFIG_PATH / "processes.json")
+PROCESS_MANAGER = ProcessManager(SOCKET_MANAGER, USER_CONFIG_PATH / "processes.db")
 
 
 def get_config(formatted=True) -> dict:
@@ -464,6 +464,8 @@ def discover_actions(project=None):
                 "source": file.as_posix(),
                 "exts": module.EXTENSIONS if hasattr(module, "EXTENSIONS") else None,
                 "module_path": module.__file__,
+                "priority": getattr(module, "PRIORITY", 0),
+                "concurrency": getattr(module, "CONCURRENCY", None),
             }
             actions[entity][file.name] = entity_action
     return actions
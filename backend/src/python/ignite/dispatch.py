@@ -0,0 +1,141 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+# Filesystem reads (listings, finds, yaml) go to "default", anything that
+# copies, moves or deletes data goes to "io" so it can't starve listings.
+# Thumbnail generation is CPU bound and has its own small pool.
+WORKERS = {
+    "default": int(ENV.get("IGNITE_DISPATCH_WORKERS", 16)),
+    "io": int(ENV.get("IGNITE_DISPATCH_IO_WORKERS", 4)),
+    "thumbnail": int(ENV.get("IGNITE_DISPATCH_THUMBNAIL_WORKERS", 2)),
+}
+SLOW_CALL = float(ENV.get("IGNITE_DISPATCH_SLOW_CALL", 5))
+
+
+class Pool:
+    def __init__(self, name, workers):
+        self.name = name
+        self.lock = threading.Lock()
+        self.workers = 0
+        self.executor = None
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queued = 0
+        self.resize(workers)
+
+    def resize(self, workers):
+        workers = max(1, int(workers))
+        with self.lock:
+            if workers == self.workers:
+                return
+            old = self.executor
+            self.workers = workers
+            self.executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix=f"ignite-{self.name}"
+            )
+        if old:
+            # Whatever the old executor already accepted still runs.
+            old.shutdown(wait=False)
+        LOGGER.debug(f"Dispatch pool {self.name} has {workers} workers")
+
+    def _call(self, fn, *args, **kwargs):
+        with self.lock:
+            self.queued -= 1
+            self.running += 1
+        start = time.time()
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            duration = time.time() - start
+            if duration > SLOW_CALL:
+                name = getattr(fn, "__qualname__", fn)
+                LOGGER.warning(f"{name} took {duration:.2f}s in {self.name} pool")
+            with self.lock:
+                self.running -= 1
+                self.completed += 1
+                self.failed += int(failed)
+
+    async def run(self, fn, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self._call, fn, *args, **kwargs)
+        # Submitted under the lock so a resize can't shut the executor down
+        # between picking it and handing it the call.
+        with self.lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            future = loop.run_in_executor(self.executor, call)
+        return await future
+
+    def submit(self, fn, *args, **kwargs):
+        # Fire and forget, the returned concurrent future can still be awaited.
+        with self.lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            return self.executor.submit(self._call, fn, *args, **kwargs)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "running": self.running,
+                "queued": self.queued,
+                "max_queued": self.max_queued,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+
+POOLS = {name: Pool(name, workers) for name, workers in WORKERS.items()}
+
+
+async def run(fn, *args, **kwargs):
+    return await POOLS["default"].run(fn, *args, **kwargs)
+
+
+async def run_io(fn, *args, **kwargs):
+    return await POOLS["io"].run(fn, *args, **kwargs)
+
+
+def submit(pool, fn, *args, **kwargs):
+    return POOLS[pool].submit(fn, *args, **kwargs)
+
+
+def configure(pool, workers):
+    if pool not in POOLS:
+        LOGGER.error(f"Unknown dispatch pool {pool}")
+        return False
+    POOLS[pool].resize(workers)
+    return True
+
+
+def get_stats():
+    return {name: pool.stats() for name, pool in POOLS.items()}
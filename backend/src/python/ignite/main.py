@@ -25,6 +25,14 @@ from platformdirs import user_data_dir
 from ignite.server import router as server_router
 from ignite.client import router as client_router
 from ignite.server.socket_manager import SocketManager
+from ignite.server import (
+    change_feed,
+    kind_cache,
+    project_tree,
+    repr_cache,
+    resolve_cache,
+)
+from ignite.server.watcher import WATCHER
 from ignite.client.utils import CONFIG
 from ignite.utils import mount_root
 from ignite.logger import get_logger, setup_logger, EndpointFilter
@@ -72,11 +80,18 @@ def startup_event():
     setup_logger(uvicorn_access_logger)
     uvicorn_access_logger.addFilter(EndpointFilter(path="/api/v1/ping"))
     mount_root(app, CONFIG)
+    WATCHER.subscribe(kind_cache.on_change)
+    WATCHER.subscribe(resolve_cache.on_change)
+    WATCHER.subscribe(repr_cache.on_change)
+    WATCHER.subscribe(change_feed.on_change)
+    WATCHER.subscribe(project_tree.on_change)
+    WATCHER.start()
 
 
 @app.on_event("shutdown")
 def shutdown_event():
     LOGGER.debug("Cleaning up...")
+    WATCHER.stop()
     if port_file.exists():
         port_file.unlink()
     else:
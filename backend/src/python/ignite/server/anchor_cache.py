@@ -0,0 +1,145 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+import yaml
+from ignite.logger import get_logger
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+MAX_SIZE = int(ENV.get("IGNITE_ANCHOR_CACHE_SIZE", 50000))
+
+
+def _copy(value):
+    # Callers mutate what they get back (tags, attributes) so hand out
+    # copies of the containers, scalars and datetimes are immutable.
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class AnchorCache:
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self, path):
+        path = os.fspath(path)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.invalidate(path)
+            raise
+        key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry[0] == key:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return _copy(entry[1])
+            self.misses += 1
+        with open(path, "r") as f:
+            config = yaml.load(f, Loader=SafeLoader) or {}
+        with self.lock:
+            self.entries[path] = (key, config)
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        return _copy(config)
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                return
+            self.entries.pop(os.fspath(path), None)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+                "loader": SafeLoader.__name__,
+            }
+
+
+ANCHOR_CACHE = AnchorCache()
+LOCKS = {}
+LOCKS_LOCK = threading.Lock()
+
+
+def load_anchor(path):
+    return ANCHOR_CACHE.load(path)
+
+
+def get_lock(path):
+    # Read-modify-write of an anchor happens under its lock, re-entrant so
+    # tag helpers can hold it around update_config.
+    path = os.fspath(path)
+    with LOCKS_LOCK:
+        lock = LOCKS.get(path)
+        if not lock:
+            lock = LOCKS[path] = threading.RLock()
+        return lock
+
+
+def write_anchor(path, config):
+    # Swapped in whole, a reader never sees a truncated anchor. A protected
+    # anchor stays protected, replacing it would bypass its mode.
+    path = os.fspath(path)
+    exists = os.path.exists(path)
+    if exists and not os.access(path, os.W_OK):
+        raise PermissionError(f"Anchor is read only: {path}")
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "w") as f:
+            yaml.safe_dump(config, f)
+        if exists:
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    ANCHOR_CACHE.invalidate(path)
+
+
+def invalidate(path=None):
+    ANCHOR_CACHE.invalidate(path)
+
+
+def get_stats():
+    return ANCHOR_CACHE.stats()
@@ -15,15 +15,28 @@
 
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path, PurePath
 
 import yaml
-from ignite.server import utils
+from ignite.server import (
+    anchor_cache,
+    change_feed,
+    index,
+    kind_cache,
+    pagination,
+    repr_cache,
+    resolve_cache,
+    transfer,
+    utils,
+    vault_store,
+)
 from ignite.server.constants import ANCHORS
+from ignite.server.filters import compile_filter, get_pushdown
+from ignite.server.pagination import sort_results
 from ignite.server.utils import CONFIG
 from ignite.logger import get_logger
 from ignite.utils import is_sequence
-from mongoquery import Query
 
 LOGGER = get_logger(__name__)
 ENV = os.environ
@@ -33,6 +46,10 @@ IGNITE_SERVER_ROOT = Path(ENV["IGNITE_SERVER_ROOT"])
 IGNITE_DCC = Path(ENV["IGNITE_DCC"])
 USER_CONFIG_PATH = PurePath(ENV["IGNITE_USER_CONFIG_PATH"])
 RULE_TEMPLATES_PATH = USER_CONFIG_PATH / "rule_templates.yaml"
+FIND_WORKERS = int(ENV.get("IGNITE_FIND_WORKERS", 16))
+FIND_EXECUTOR = ThreadPoolExecutor(
+    max_workers=FIND_WORKERS, thread_name_prefix="ignite-find"
+)
 
 
 def create_project(name: str):
@@ -94,10 +111,30 @@ def get_project(name):
     return Project(path=path)
 
 
+def reindex(path):
+    entity_index = index.get_index(path)
+    if not entity_index:
+        LOGGER.error(f"No entity index available for {path}")
+        return 0
+    return entity_index.reindex(path)
+
+
+def search(query, projects=None, kinds=None, limit=100):
+    results = []
+    for name in projects or get_project_names():
+        entity_index = index.get_index(CONFIG["root"] / name)
+        if not entity_index:
+            continue
+        remaining = limit - len(results) if limit else None
+        results += entity_index.search(query, kinds=kinds, limit=remaining)
+        if limit and len(results) >= limit:
+            break
+    return results
+
+
 def get_context_info(path):
     if not path:
         return {}
-    kinds = list(KINDS.keys())
     path = Path(path)
     exists = path.exists()
     if not exists and utils.is_uri(path):
@@ -125,10 +162,7 @@ def get_context_info(path):
         part_path = CONFIG["root"] / PurePath(*parts[:i])
         kind = utils.get_dir_kind(part_path)
         ancestor_kinds[part_path.as_posix()] = kind
-    for x in path.iterdir():
-        name = x.name
-        if name not in kinds:
-            continue
+    for name in kind_cache.get_anchors(path):
         kind = KINDS[name]
         ancestor_kinds[path.as_posix()] = kind
         project = (
@@ -202,18 +236,58 @@ def find(path):
         return _find_from_path(path)
 
 
-def resolve(uri):
+def find_as_dict(path):
+    try:
+        entity = find(path)
+    except Exception as e:
+        LOGGER.error(f"Failed to find {path}: {e}")
+        return None
+    if not hasattr(entity, "as_dict"):
+        return None
+    return entity.as_dict()
+
+
+def find_multiple(paths):
+    # Crates can reference the same entity many times, only find it once.
+    keys = {str(path): str(path).strip() for path in paths if path}
+    unique = list(dict.fromkeys(keys.values()))
+    found = dict(zip(unique, FIND_EXECUTOR.map(find_as_dict, unique)))
+    return {key: found[path] for key, path in keys.items()}
+
+
+def _resolve(uri):
     entity = find(uri)
     if not entity:
         return None
     if entity.dir_kind == "asset":
         entity = entity.latest_av
+        if not entity:
+            return None
     if entity.dir_kind == "assetversion":
         for comp in entity.components:
             if comp["ext"] in (".usd", ".usdc", ".usda", ".usdz"):
                 path = PurePath(comp["path"])
                 return path.as_posix()
-    return None if not entity else entity.path
+    return PurePath(entity.path).as_posix()
+
+
+def resolve(uri):
+    if not uri:
+        return None
+    uri = str(uri).strip()
+    found, path = resolve_cache.lookup(uri)
+    if found:
+        return path
+    path = _resolve(uri)
+    resolve_cache.store(uri, path)
+    return path
+
+
+def resolve_batch(uris):
+    keys = {str(uri): str(uri).strip() for uri in uris if uri}
+    unique = list(dict.fromkeys(keys.values()))
+    resolved = dict(zip(unique, FIND_EXECUTOR.map(resolve, unique)))
+    return {key: resolved[uri] for key, uri in keys.items()}
 
 
 def _find_from_path(path):
@@ -230,7 +304,6 @@ def _find_from_path(path):
     from ignite.server.entities.task import Task
 
     kinds = {v: k for k, v in ANCHORS.items()}
-    anchors = kinds.keys()
     entities = {
         "project": Project,
         "group": Group,
@@ -263,21 +336,19 @@ def _find_from_path(path):
     if not path.is_dir():
         LOGGER.error(f"Invalid path: {path}")
         return
-    for d in path.iterdir():
-        name = d.name
-        if name in anchors:
-            entity = entities[kinds[name]]
-            break
+    anchor = kind_cache.get_anchor(path)
+    if anchor:
+        entity = entities[kinds[anchor.name]]
     else:
         parent1 = path.parent
         parent2 = parent1.parent
         if parent2.name == "exports":
             # Probably an assetversion
-            d["dir_kind"] = "assetversion"
+            entity = AssetVersion
             utils.create_delayed_anchor(path, "assetversion")
         elif parent1.name == "exports":
             # Probably an asset
-            d["dir_kind"] = "asset"
+            entity = Asset
             utils.create_delayed_anchor(path, "asset")
         else:
             return
@@ -301,24 +372,107 @@ def create_dirs(path, method, dirs):
             continue
         if method == "create_task":
             entity.create_task(dir_name, task_type=d["dir_type"])
+            change_feed.emit("created", entity.path / dir_name, "task")
             created += 1
             continue
         if not hasattr(entity, method):
             LOGGER.error(f"{entity} has no method {method}")
             continue
         getattr(entity, method)(dir_name)
+        change_feed.emit("created", entity.path / dir_name, method[len("create_") :])
         created += 1
+    if created:
+        index.update_entity(entity.path, recursive=True)
     return created
 
 
-def sort_results(results, sort):
-    if sort and results:
-        keys = list(results[0].keys())
-        field = sort["field"]
-        reverse = sort.get("reverse", False)
-        if field in keys:
-            results.sort(key=lambda c: c[field], reverse=reverse)
-    return results
+def get_filter_fields(expr):
+    fields = set()
+    if isinstance(expr, list):
+        for e in expr:
+            fields.update(get_filter_fields(e))
+    elif isinstance(expr, dict):
+        for k, v in expr.items():
+            if not k.startswith("$"):
+                fields.add(k.split(".")[0])
+            fields.update(get_filter_fields(v))
+    return fields
+
+
+def get_required_fields(fields, sort=None, filters=None):
+    # A listing may only ask for some fields, but sorting and filtering
+    # still need theirs to be computed.
+    if not fields:
+        return None
+    fields = set(fields)
+    fields.add("path")
+    if sort and sort.get("field"):
+        fields.add(sort["field"])
+    for key in ("collection", "search"):
+        if filters and filters.get(key):
+            fields.update(get_filter_fields(format_filter(filters[key])))
+    return fields
+
+
+def get_filter_match(filters=None, filter_string=""):
+    predicates = []
+    for key in ("collection", "search"):
+        if filters and filters.get(key):
+            predicates.append(compile_filter(format_filter(filters[key])))
+    filter_string = (filter_string or "").strip()
+    if not predicates and not filter_string:
+        return None
+
+    def match(d):
+        if filter_string and filter_string not in str(d.values()):
+            return False
+        return all(predicate(d) for predicate in predicates)
+
+    return match
+
+
+def get_filter_pushdown(filters, columns):
+    pushdown = []
+    for key in ("collection", "search"):
+        if filters and filters.get(key):
+            pushdown += get_pushdown(format_filter(filters[key]), columns)
+    return pushdown
+
+
+def drop_missing(paths):
+    for path in paths:
+        index.remove_entity(path)
+
+
+def get_candidates(path, kind, task_types=[], latest=False, where=None):
+    # Cheap name/version/mtime records straight from the entity index so
+    # listings can sort and page before building any entities. Rows whose
+    # directory went away are dropped once they come up on a page.
+    entity_index = index.get_index(path)
+    if not entity_index:
+        return None
+    rows = entity_index.find(
+        path, kind, task_types=task_types, verify=False, where=where
+    )
+    if kind in ("assetversion", "scene"):
+        grouped = {}
+        for row in rows:
+            grouped.setdefault(row["parent"], []).append(row)
+        rows = []
+        for versions in grouped.values():
+            versions.sort(key=lambda row: row["name"], reverse=True)
+            rows += versions[:1] if latest else versions
+    candidates = []
+    for row in rows:
+        name = row["name"]
+        version = ""
+        if kind == "assetversion":
+            name = PurePath(row["parent"]).name
+            version = row["name"]
+        elif kind == "scene":
+            version = row["name"]
+        candidates.append(pagination.make_row_candidate(row, name, version))
+    return candidates
 
 
 def format_filter(expr):
@@ -344,9 +498,23 @@ def format_filter(expr):
         return {field: {"$regex": value}}
 
 
-def get_contents(path, latest=False, sort=None, as_dict=False):
+def get_contents(
+    path,
+    latest=False,
+    sort=None,
+    as_dict=False,
+    fields=None,
+    offset=0,
+    limit=None,
+    cursor=None,
+    filter_string="",
+):
     path = Path(path)
     contents = []
+    if limit is not None:
+        return _get_contents_page(
+            path, latest, sort, fields, offset, limit, cursor, filter_string
+        )
     if not path.is_dir():
         return contents
     for x in path.iterdir():
@@ -363,8 +531,11 @@ def get_contents(path, latest=False, sort=None, as_dict=False):
         entity = find(x)
         contents.append(entity)
     if as_dict:
-        contents = [c.as_dict() for c in contents if hasattr(c, "as_dict")]
+        fields = get_required_fields(fields, sort)
+        contents = [c.as_dict(fields) for c in contents if hasattr(c, "as_dict")]
         for d in contents:
+            if fields and "thumbnail" not in fields:
+                break
             if not d.get("repr"):
                 continue
             d["thumbnail"] = get_repr_comp(d["path"])
@@ -372,6 +543,64 @@ def get_contents(path, latest=False, sort=None, as_dict=False):
     return contents
 
 
+def _get_contents_page(
+    path, latest, sort, fields, offset, limit, cursor, filter_string
+):
+    candidates = []
+    entity_index = index.get_index(path)
+    if entity_index:
+        entity_index.ensure_crawled()
+    try:
+        entries = list(os.scandir(path))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if not entry.is_dir():
+            continue
+        if entry.name == "scenes":
+            scenes = get_candidates(entry.path, "scene", latest=latest)
+            if scenes is None:
+                scenes = [s.path for s in discover_scenes(entry.path, latest=latest)]
+                scenes = pagination.make_candidates(scenes)
+            candidates += scenes
+        elif entry.name == "exports":
+            avs = get_candidates(entry.path, "assetversion", latest=latest)
+            if avs is None:
+                avs = discover_assetversions(entry.path, latest=latest)
+                avs = pagination.make_candidates([av.path for av in avs])
+            candidates += avs
+        elif not entity_index:
+            candidate = pagination.make_candidate(entry.path)
+            if candidate:
+                candidates.append(candidate)
+        else:
+            row = entity_index.get(entry.path)
+            if row:
+                candidates.append(pagination.make_row_candidate(row))
+    fields = get_required_fields(fields, sort)
+
+    def build(candidate):
+        entity = find(candidate["path"])
+        if not entity or not hasattr(entity, "as_dict"):
+            return
+        d = entity.as_dict(fields)
+        if d.get("repr") and (not fields or "thumbnail" in fields):
+            d["thumbnail"] = get_repr_comp(d["path"])
+        return d
+
+    return pagination.paginate(
+        candidates,
+        build,
+        offset,
+        limit,
+        sort=sort,
+        match=get_filter_match(filter_string=filter_string),
+        cursor=cursor,
+        on_missing=drop_missing,
+        key=pagination.make_cursor_key("contents", path, latest, sort, filter_string),
+    )
+
+
 def get_group(path):
     group = find(utils.get_dir_type(path, "group"))
     return group
@@ -402,39 +631,75 @@ def get_task(path):
     return task
 
 
-def discover_tasks(path, task_types=[], sort=None, as_dict=False):
+def discover_tasks(
+    path,
+    task_types=[],
+    sort=None,
+    as_dict=False,
+    fields=None,
+    offset=0,
+    limit=None,
+    cursor=None,
+    filter_string="",
+):
     from ignite.server.entities.task import Task
 
-    data = []
     path = Path(path)
-    task_anchors = path.glob("**/.ign_task.yaml")
-    for anchor in task_anchors:
-        if anchor.parent == path:
-            continue
-        name = anchor.parent.name
-        d = {}
-        d["name"] = name
-        d["path"] = anchor.parent
-        d["dir_kind"] = "task"
-        d["task_type"] = ""
-        d["anchor"] = anchor
-        if name in KINDS:
-            d["dir_kind"] = KINDS[name]
-        with open(anchor, "r") as f:
-            config = yaml.safe_load(f)
-            config = config or {}
-            d["task_type"] = config.get("task_type")
-        if not task_types or d["task_type"] in task_types:
-            data.append(d)
-    tasks = [Task(path=task["path"]) for task in data]
+    if limit is not None:
+        candidates = get_candidates(path, "task", task_types=task_types)
+        if candidates is None:
+            candidates = pagination.make_candidates(_walk_tasks(path, task_types))
+        fields = get_required_fields(fields, sort)
+        return pagination.paginate(
+            candidates,
+            lambda candidate: Task(path=candidate["path"]).as_dict(fields),
+            offset,
+            limit,
+            sort=sort,
+            match=get_filter_match(filter_string=filter_string),
+            cursor=cursor,
+            on_missing=drop_missing,
+            key=pagination.make_cursor_key(
+                "tasks", path, task_types, sort, filter_string
+            ),
+        )
+    entity_index = index.get_index(path)
+    if entity_index:
+        rows = entity_index.find(path, "task", task_types=task_types)
+        task_paths = [row["path"] for row in rows]
+    else:
+        task_paths = _walk_tasks(path, task_types)
+    tasks = [Task(path=task_path) for task_path in task_paths]
     if as_dict:
-        tasks = [t.as_dict() for t in tasks]
+        fields = get_required_fields(fields, sort)
+        tasks = [t.as_dict(fields) for t in tasks]
         tasks = sort_results(tasks, sort)
     return tasks
 
 
+def _walk_tasks(path, task_types=[]):
+    task_paths = []
+    for anchor in path.glob("**/.ign_task.yaml"):
+        if anchor.parent == path:
+            continue
+        config = anchor_cache.load_anchor(anchor)
+        if not task_types or config.get("task_type") in task_types:
+            task_paths.append(anchor.parent)
+    return task_paths
+
+
 def discover_assets(
-    path, asset_kinds=[], sort=None, as_dict=False, filters={}, single=False
+    path,
+    asset_kinds=[],
+    sort=None,
+    as_dict=False,
+    filters={},
+    single=False,
+    fields=None,
+    offset=0,
+    limit=None,
+    cursor=None,
+    filter_string="",
 ):
     from ignite.server.entities.asset import Asset
 
@@ -505,30 +770,99 @@ def discover_assets(
             del asset["latest_av"]
         return assets
 
-    tasks = [task.parent for task in Path(path).glob("**/.ign_task.yaml")]
-    data = []
-    [discover(Path(path), data) for path in tasks]
+    if limit is not None:
+        where = get_filter_pushdown(filters, {"name": "name"})
+        candidates = get_candidates(path, "asset", where=where)
+        if candidates is None:
+            assets = discover_assets(path, asset_kinds=asset_kinds)
+            candidates = pagination.make_candidates([a.path for a in assets])
+        fields = get_required_fields(fields, sort, filters)
+        if fields and filters:
+            fields.update(("latest_av", "tags", "components"))
+
+        def build(candidate):
+            d = Asset(path=candidate["path"]).as_dict(fields)
+            if filters:
+                promote_av_attribs([d])
+            return d
+
+        return pagination.paginate(
+            candidates,
+            build,
+            offset,
+            limit,
+            sort=sort,
+            match=get_filter_match(filters, filter_string),
+            cursor=cursor,
+            on_missing=drop_missing,
+            key=pagination.make_cursor_key(
+                "assets", path, sort, filters, filter_string
+            ),
+        )
+
+    entity_index = index.get_index(path)
+    if entity_index:
+        rows = entity_index.find(path, "asset", limit=1 if single else None)
+        data = [{"path": row["path"]} for row in rows]
+    else:
+        tasks = [task.parent for task in Path(path).glob("**/.ign_task.yaml")]
+        data = []
+        [discover(Path(path), data) for path in tasks]
     assets = [Asset(path=asset["path"]) for asset in data]
     if as_dict:
-        assets = [a.as_dict() for a in assets]
+        fields = get_required_fields(fields, sort, filters)
+        if fields and filters:
+            fields.update(("latest_av", "tags", "components"))
+        assets = [a.as_dict(fields) for a in assets]
         if filters:
             assets = promote_av_attribs(assets)
-        if filters.get("collection"):
-            query = Query(format_filter(filters["collection"]))
-            filtered = list(filter(query.match, assets))
-            assets = filtered
-        if filters.get("search"):
-            expr = format_filter(filters["search"])
-            query = Query(expr)
-            filtered = list(filter(query.match, assets))
-            assets = filtered
+        match = get_filter_match(filters)
+        if match:
+            assets = list(filter(match, assets))
         assets = sort_results(assets, sort)
     return assets
 
 
 def discover_assetversions(
-    path, asset_kinds=[], latest=False, sort=None, filters={}, as_dict=False
+    path,
+    asset_kinds=[],
+    latest=False,
+    sort=None,
+    filters={},
+    as_dict=False,
+    fields=None,
+    offset=0,
+    limit=None,
+    cursor=None,
+    filter_string="",
 ):
+    from ignite.server.entities.assetversion import AssetVersion
+
+    if limit is not None:
+        # With latest the newest version has to be picked before filtering.
+        where = None
+        if not latest:
+            where = get_filter_pushdown(filters, {"version": "name"})
+        candidates = get_candidates(path, "assetversion", latest=latest, where=where)
+        if candidates is None:
+            assetversions = discover_assetversions(
+                path, asset_kinds=asset_kinds, latest=latest
+            )
+            candidates = pagination.make_candidates([av.path for av in assetversions])
+        fields = get_required_fields(fields, sort, filters)
+        return pagination.paginate(
+            candidates,
+            lambda candidate: AssetVersion(candidate["path"]).as_dict(fields),
+            offset,
+            limit,
+            sort=sort,
+            match=get_filter_match(filters, filter_string),
+            cursor=cursor,
+            on_missing=drop_missing,
+            key=pagination.make_cursor_key(
+                "assetversions", path, latest, sort, filters, filter_string
+            ),
+        )
     assetversions = []
     assets = discover_assets(path, asset_kinds=asset_kinds)
     for asset in assets:
@@ -540,24 +874,58 @@ def discover_assetversions(
             continue
         assetversions += avs
     if as_dict:
-        assetversions = [av.as_dict() for av in assetversions]
-        if filters.get("collection"):
-            query = Query(format_filter(filters["collection"]))
-            filtered = list(filter(query.match, assetversions))
-            assetversions = filtered
-        if filters.get("search"):
-            expr = format_filter(filters["search"])
-            query = Query(expr)
-            filtered = list(filter(query.match, assetversions))
-            assetversions = filtered
+        fields = get_required_fields(fields, sort, filters)
+        assetversions = [av.as_dict(fields) for av in assetversions]
+        match = get_filter_match(filters)
+        if match:
+            assetversions = list(filter(match, assetversions))
         assetversions = sort_results(assetversions, sort)
     return assetversions
 
 
-def discover_scenes(path, dcc=[], latest=False, sort=None, as_dict=False):
+def discover_scenes(
+    path,
+    dcc=[],
+    latest=False,
+    sort=None,
+    as_dict=False,
+    fields=None,
+    offset=0,
+    limit=None,
+    cursor=None,
+    filter_string="",
+):
     from ignite.server.entities.scene import Scene
 
     path = Path(path)
+    if limit is not None:
+        candidates = get_candidates(path, "scene", latest=latest)
+        if candidates is None:
+            scenes = discover_scenes(path, dcc=dcc, latest=latest)
+            candidates = pagination.make_candidates([s.path for s in scenes])
+        fields = get_required_fields(fields, sort)
+        if fields and dcc:
+            fields.add("dcc")
+        text_match = get_filter_match(filter_string=filter_string)
+
+        def match(d):
+            if dcc and d.get("dcc") not in dcc:
+                return False
+            return not text_match or text_match(d)
+
+        return pagination.paginate(
+            candidates,
+            lambda candidate: Scene(path=candidate["path"]).as_dict(fields),
+            offset,
+            limit,
+            sort=sort,
+            match=match if dcc or text_match else None,
+            cursor=cursor,
+            on_missing=drop_missing,
+            key=pagination.make_cursor_key(
+                "scenes", path, dcc, latest, sort, filter_string
+            ),
+        )
 
     def discover(path, l=[]):
         name = path.name
@@ -591,9 +959,7 @@ def discover_scenes(path, dcc=[], latest=False, sort=None, as_dict=False):
                         # We should ignore
                         return []
                 if d["dir_kind"] == "scene" and d["anchor"]:
-                    with open(d["anchor"], "r") as f:
-                        config = yaml.safe_load(f)
-                        config = config or {}
+                    config = anchor_cache.load_anchor(d["anchor"])
                 discover(x, l)
             if d["dir_kind"] == "scene":
                 if not dcc or d["dcc"] in dcc:
@@ -603,7 +969,8 @@ def discover_scenes(path, dcc=[], latest=False, sort=None, as_dict=False):
     data = discover(Path(path))
     scenes = [Scene(path=scene["path"]) for scene in data]
     if as_dict:
-        scenes = [s.as_dict() for s in scenes]
+        fields = get_required_fields(fields, sort)
+        scenes = [s.as_dict(fields) for s in scenes]
         scenes = sort_results(scenes, sort)
     return scenes
 
@@ -635,11 +1002,15 @@ def copy_default_scene(task, dcc):
     LOGGER.info(f"Copying default scene {src} to {dest}")
     shutil.copy2(src, dest)
     utils.create_anchor(dest, "scene")
+    index.update_entity(dest)
+    change_feed.emit("created", dest, "scene")
     return dest / PurePath(src).name
 
 
 def register_directory(path, dir_kind, tags=None):
     utils.create_anchor(path, dir_kind)
+    index.update_entity(path, recursive=True)
+    change_feed.emit("created", path, dir_kind)
     if tags:
         entity = find(path)
         entity.add_tags(tags)
@@ -655,11 +1026,15 @@ def register_task(path, task_type, tags=None):
     task.set_task_type(task_type)
     if tags:
         task.add_tags(tags)
+    index.update_entity(path, recursive=True)
+    change_feed.emit("created", path, "task")
     return True
 
 
 def register_scene(path):
     utils.create_anchor(path, "scene")
+    index.update_entity(path)
+    change_feed.emit("created", path, "scene")
     return True
 
 
@@ -671,6 +1046,8 @@ def register_asset(path, tags=None):
         return
     if tags:
         entity.add_tags(tags)
+    index.update_entity(path, recursive=True)
+    change_feed.emit("created", path, "asset")
     return True
 
 
@@ -682,7 +1059,13 @@ def register_assetversion(path, tags=None):
             f"Asset anchor was missing (but created) when registering assetversion {path}"
         )
         utils.create_anchor(asset_path, "asset")
+        index.update_entity(asset_path)
+        change_feed.emit("created", asset_path, "asset")
     utils.create_anchor(path, "assetversion")
+    index.update_entity(path)
+    # The asset's latest version changed along with it.
+    change_feed.emit("updated", asset_path, "asset")
+    change_feed.emit("created", path, "assetversion")
     av = find(path)
     if not av or not av.dir_kind == "assetversion":
         LOGGER.error(f"Failed to register assetversion at {path}")
@@ -737,10 +1120,23 @@ def get_repr(target):
 
 
 def get_repr_comp(target):
+    # Grids ask for this on every row, the walk below only runs on a miss.
+    key = str(target)
+    found, comp = repr_cache.lookup(key)
+    if found:
+        return comp
+    scopes = []
+    comp = _get_repr_comp(target, scopes)
+    repr_cache.store(key, comp, scopes)
+    return comp
+
+
+def _get_repr_comp(target, scopes):
     anchors = list(ANCHORS.values())
     asset_anchor = ANCHORS["asset"]
 
     def search(path):
+        scopes.append(path)
         for x in path.iterdir():
             if x.name == asset_anchor:
                 return x
@@ -748,8 +1144,7 @@ def get_repr_comp(target):
                 continue
             if x.name in anchors:
                 anchor = KINDS[x.name]
-                with open(x, "r") as f:
-                    config = yaml.safe_load(f) or {}
+                config = anchor_cache.load_anchor(x)
                 their_repr = config.get("repr", "")
                 if their_repr:
                     their_repr_path = Path(utils.uri_to_path(their_repr))
@@ -758,6 +1153,7 @@ def get_repr_comp(target):
     target_entity = find(target)
     if not target_entity:
         return {}
+    scopes.append(target_entity.path)
     if target_entity.dir_kind == "assetversion":
         return target_entity.get_thumbnail()
     if target_entity.dir_kind == "asset":
@@ -781,6 +1177,7 @@ def get_repr_comp(target):
     asset = find(repr_asset)
     if not asset:
         return {}
+    scopes.append(asset.path)
     best_av = asset.best_av
     if not best_av:
         return {}
@@ -803,6 +1200,9 @@ def delete_entity(path, entity_type):
     if not hasattr(entity, "delete"):
         return False
     ok = entity.delete()
+    if ok:
+        index.remove_entity(path)
+        change_feed.emit("deleted", entity.path, entity.dir_kind, entity.uri)
     return ok
 
 
@@ -823,7 +1223,15 @@ def rename_entity(path, entity_type, new_name):
         return False, "wrong entity type"
     if not hasattr(entity, "rename"):
         return False
+    old_path = entity.path
+    old_uri = entity.uri
     ok = entity.rename(new_name)
+    if ok and entity.dir_kind != "component":
+        index.remove_entity(old_path)
+        index.update_entity(entity.path, recursive=True)
+    if ok:
+        change_feed.emit("deleted", old_path, entity.dir_kind, old_uri)
+        change_feed.emit("created", entity.path, entity.dir_kind)
     return ok, ""
 
 
@@ -839,28 +1247,44 @@ def change_task_type(path, new_task_type, new_name):
             )
         )
         return False, "wrong entity type"
+    old_path = entity.path
+    old_uri = entity.uri
     ok = entity.set_task_type(new_task_type)
     if new_name and entity.name != new_name:
         if hasattr(entity, "rename"):
             entity.rename(new_name)
+            index.remove_entity(old_path)
+            change_feed.emit("deleted", old_path, "task", old_uri)
+            change_feed.emit("created", entity.path, "task")
+    index.update_entity(entity.path, recursive=True)
     return ok, ""
 
 
+def _update_tags_index(entity):
+    # Tags live in the asset anchor so both the asset and the version change.
+    index.update_entity(entity.path)
+    index.update_entity(Path(entity.path).parent)
+    change_feed.emit_entity("updated", entity)
+
+
 def set_tags(path, tags):
     entity = find(path)
     entity.set_tags(tags)
+    _update_tags_index(entity)
     return True
 
 
 def add_tags(path, tags):
     entity = find(path)
     entity.add_tags(tags)
+    _update_tags_index(entity)
     return True
 
 
 def remove_tags(path, tags, all=False):
     entity = find(path)
     entity.remove_tags(tags, all=all)
+    _update_tags_index(entity)
     return True
 
 
@@ -911,11 +1335,12 @@ def write_rule_templates(data):
 
 def get_vault_asset_names():
     vault = CONFIG["vault"]
-    asset_names = [a.name for a in vault.iterdir()]
+    asset_names = [a.name for a in vault.iterdir() if not a.name.startswith(".")]
     return asset_names
 
 
-def vault_import(source, name):
+def prepare_vault_import(source, name):
+    # Returns where the copy goes and what to reindex once it's there.
     entity = find(source)
     if not entity:
         LOGGER.error(f"Source entity {source} was not found")
@@ -934,12 +1359,26 @@ def vault_import(source, name):
             f"Target entity {vault_entity_path} kind is {vault_entity.dir_kind}, expected asset"
         )
         return
-    dest = vault_entity.next_path
-    shutil.copytree(source, dest)
+    dest = Path(vault_entity.reserve_next_path()).as_posix()
+    target = {"dest": dest, "update": dest}
+    store = vault_store.get_store()
+    if store:
+        target["store"] = store.root.as_posix()
+    return target
+
+
+def vault_import(source, name):
+    target = prepare_vault_import(source, name)
+    if not target:
+        return
+    store = vault_store.get_store()
+    if not transfer.copy(source, target["dest"], store=store):
+        return
+    index.update_entity(target["update"])
     return True
 
 
-def vault_export(source, task_path, name):
+def prepare_vault_export(source, task_path, name):
     source = Path(source)
     source_entity = find(source)
     if not source_entity:
@@ -952,13 +1391,31 @@ def vault_export(source, task_path, name):
     asset_path = task.exports / name
     if not asset_path.is_dir():
         register_asset(asset_path)
-    dest = task.get_next_export(name)
+    dest = task.reserve_next_export(name)
     dest_asset = dest.parent
     if not dest_asset.is_dir() or not (dest_asset / ANCHORS["asset"]).is_file():
         source_asset_anchor = source.parent / ANCHORS["asset"]
         if source_asset_anchor.is_file():
             shutil.copy2(source_asset_anchor, dest_asset)
-    shutil.copytree(source, dest)
+    return {
+        "dest": Path(dest).as_posix(),
+        "update": Path(dest_asset).as_posix(),
+        "recursive": True,
+    }
+
+
+def vault_export(source, task_path, name):
+    target = prepare_vault_export(source, task_path, name)
+    if not target:
+        return
+    if not transfer.copy(source, target["dest"]):
+        return
+    index.update_entity(target["update"], recursive=True)
+    return True
+
+
+def update_entity(path, recursive=False):
+    index.update_entity(path, recursive=recursive)
     return True
 
 
@@ -0,0 +1,487 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import json
+import os
+import stat
+import struct
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePath
+
+from ignite.server.media import POLL, get_frame_path, get_frames, report_paused
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+WORKERS = int(ENV.get("IGNITE_ARCHIVE_WORKERS", os.cpu_count() or 4))
+LEVEL = int(ENV.get("IGNITE_ARCHIVE_LEVEL", 6))
+# Compressed members are held in memory up to this size, then on disk.
+SPOOL_MB = int(ENV.get("IGNITE_ARCHIVE_SPOOL_MB", 8))
+BUFFER = 1024 * 1024
+# Formats that are compressed already, deflating them again only costs time.
+STORED_EXTENSIONS = {
+    ".exr",
+    ".mp4",
+    ".mov",
+    ".mkv",
+    ".webm",
+    ".avi",
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".webp",
+    ".gif",
+    ".heic",
+    ".mp3",
+    ".aac",
+    ".zip",
+    ".gz",
+    ".bz2",
+    ".xz",
+    ".7z",
+    ".rar",
+    ".usdz",
+    ".sc",
+}
+UTF8 = 0x800
+MAX_32 = 0xFFFFFFFF
+DIR_MODE = (stat.S_IFDIR | 0o775) << 16 | 0x10
+
+
+class Cancelled(Exception):
+    pass
+
+
+def should_store(path):
+    return PurePath(path).suffix.lower() in STORED_EXTENSIONS
+
+
+def walk(path, prefix):
+    members = []
+    for root, dirs, names in os.walk(path):
+        dirs.sort()
+        rel = os.path.relpath(root, path)
+        arc_root = PurePath(prefix, rel).as_posix() if rel != "." else prefix
+        if not dirs and not names and arc_root:
+            members.append((None, arc_root + "/"))
+        for name in sorted(names):
+            arcname = f"{arc_root}/{name}" if arc_root else name
+            members.append((os.path.join(root, name), arcname))
+    return members
+
+
+def get_members(paths, nest=False):
+    # Same layout a copy into a staging directory used to give, a directory
+    # keeps its own name when nested, files and frames land at the top.
+    members = {}
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            found = walk(path, path.name if nest else "")
+        elif path.is_file():
+            found = [(str(path), path.name)]
+        elif "#" in path.name:
+            pattern = path.as_posix()
+            found = [
+                (get_frame_path(pattern, f), PurePath(get_frame_path(pattern, f)).name)
+                for f in get_frames(pattern)
+            ]
+        else:
+            LOGGER.error(f"Attempted to archive {path} but doesn't exist...")
+            continue
+        for source, arcname in found:
+            members[arcname] = source
+    return [(source, arcname) for arcname, source in members.items()]
+
+
+def dos_time(mtime):
+    t = time.localtime(mtime)
+    if t.tm_year < 1980:
+        return 0x21, 0
+    date = (t.tm_year - 1980) << 9 | t.tm_mon << 5 | t.tm_mday
+    return date, t.tm_hour << 11 | t.tm_min << 5 | t.tm_sec // 2
+
+
+def local_header(entry, zip64):
+    name = entry["name"].encode()
+    extra = b""
+    crc, csize, size = entry["crc"], entry["csize"], entry["size"]
+    if zip64:
+        extra = struct.pack("<HHQQ", 1, 16, size, csize)
+        csize = size = MAX_32
+    header = struct.pack(
+        zipfile.structFileHeader,
+        zipfile.stringFileHeader,
+        45 if zip64 else 20,
+        0,
+        UTF8,
+        entry["method"],
+        entry["time"],
+        entry["date"],
+        crc,
+        csize,
+        size,
+        len(name),
+        len(extra),
+    )
+    return header + name + extra
+
+
+def central_header(entry):
+    name = entry["name"].encode()
+    fields = []
+    size, csize, offset = entry["size"], entry["csize"], entry["offset"]
+    if size >= zipfile.ZIP64_LIMIT:
+        fields.append(size)
+        size = MAX_32
+    if csize >= zipfile.ZIP64_LIMIT:
+        fields.append(csize)
+        csize = MAX_32
+    if offset >= zipfile.ZIP64_LIMIT:
+        fields.append(offset)
+        offset = MAX_32
+    extra = b""
+    if fields:
+        extra = struct.pack(f"<HH{len(fields)}Q", 1, 8 * len(fields), *fields)
+    header = struct.pack(
+        zipfile.structCentralDir,
+        zipfile.stringCentralDir,
+        45 if fields else 20,
+        3,
+        45 if fields else 20,
+        0,
+        UTF8,
+        entry["method"],
+        entry["time"],
+        entry["date"],
+        entry["crc"],
+        csize,
+        size,
+        len(name),
+        len(extra),
+        0,
+        0,
+        0,
+        entry["mode"],
+        offset,
+    )
+    return header + name + extra
+
+
+class ArchiveWriter:
+    # Members are read straight from their sources. Compression runs on a
+    # pool ahead of a single writer that appends them in order, each written
+    # member goes in a journal so a killed archive picks up where it stopped.
+    def __init__(self, members, dest, state=None, workers=WORKERS, level=LEVEL):
+        self.members = members
+        self.dest = Path(dest)
+        self.partial = self.dest.with_name(self.dest.name + ".partial")
+        self.journal = self.dest.with_name(self.dest.name + ".journal")
+        self.state = state if state is not None else {}
+        self.workers = max(1, workers)
+        self.level = level
+        self.lock = threading.Lock()
+        self.total = 0
+        self.done = 0
+        self.skipped = 0
+        self.stored = 0
+        self.compressed = 0
+        self.sizes = {}
+        for source, arcname in members:
+            if not source:
+                continue
+            try:
+                self.sizes[arcname] = os.stat(source).st_size
+            except OSError:
+                self.sizes[arcname] = 0
+        self.total = sum(self.sizes.values())
+
+    def progress(self):
+        if not self.total:
+            return 0
+        with self.lock:
+            return round(self.done / self.total * 100, 1)
+
+    def advance(self, amount):
+        with self.lock:
+            self.done += amount
+
+    def check(self):
+        while self.state.get("paused") and not self.state.get("killed"):
+            time.sleep(POLL)
+        if self.state.get("killed"):
+            raise Cancelled()
+
+    def resume(self):
+        # Only the journal lines that still match their source and fit in the
+        # partial archive count, anything after the first mismatch is redone.
+        if not self.partial.is_file() or not self.journal.is_file():
+            return []
+        sources = {arcname: source for source, arcname in self.members}
+        size = self.partial.stat().st_size
+        entries = []
+        with open(self.journal, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                name = entry.get("name")
+                if name not in sources or entry.get("source") != sources[name]:
+                    break
+                if entry["end"] > size or not self.unchanged(entry):
+                    break
+                entries.append(entry)
+        with open(self.partial, "r+b") as f:
+            f.truncate(entries[-1]["end"] if entries else 0)
+        with open(self.journal, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+        if entries:
+            self.skipped = len(entries)
+            self.advance(sum(self.sizes.get(e["name"], 0) for e in entries))
+            LOGGER.debug(f"Resuming {self.dest} after {len(entries)} members")
+        return entries
+
+    def unchanged(self, entry):
+        if not entry["source"]:
+            return True
+        try:
+            st = os.stat(entry["source"])
+        except OSError:
+            return False
+        return st.st_mtime_ns == entry["mtime"] and st.st_size == entry["size"]
+
+    def pack(self, source):
+        # Runs on the pool, returns the deflated data spooled to memory/disk.
+        comp = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+        spool = tempfile.SpooledTemporaryFile(SPOOL_MB * 1024 * 1024)
+        crc = 0
+        size = 0
+        try:
+            with open(source, "rb") as f:
+                while True:
+                    self.check()
+                    chunk = f.read(BUFFER)
+                    if not chunk:
+                        break
+                    crc = zlib.crc32(chunk, crc)
+                    size += len(chunk)
+                    spool.write(comp.compress(chunk))
+                    self.advance(len(chunk))
+            spool.write(comp.flush())
+        except BaseException:
+            spool.close()
+            raise
+        return spool, crc, size
+
+    def write_member(self, f, source, arcname, packed):
+        offset = f.tell()
+        if not source:
+            entry = {"name": arcname, "method": zipfile.ZIP_STORED, "mode": DIR_MODE}
+            entry.update(crc=0, csize=0, size=0, mtime=0)
+            entry["date"], entry["time"] = dos_time(time.time())
+            f.write(local_header(entry, False))
+            entry.update(offset=offset, source=None, end=f.tell())
+            return entry
+        st = os.stat(source)
+        entry = {"name": arcname, "mode": (st.st_mode & 0xFFFF) << 16}
+        entry["date"], entry["time"] = dos_time(st.st_mtime)
+        entry.update(mtime=st.st_mtime_ns, offset=offset, source=source)
+        if packed:
+            spool, crc, size = packed
+            csize = spool.tell()
+            if csize < size:
+                entry.update(method=zipfile.ZIP_DEFLATED, crc=crc)
+                entry.update(csize=csize, size=size)
+                f.write(local_header(entry, size >= zipfile.ZIP64_LIMIT))
+                spool.seek(0)
+                while True:
+                    chunk = spool.read(BUFFER)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                spool.close()
+                self.compressed += 1
+                entry["end"] = f.tell()
+                return entry
+            # Didn't shrink, the bytes were counted when packing.
+            spool.close()
+        self.store(f, source, entry, st.st_size, count=not packed)
+        return entry
+
+    def store(self, f, source, entry, size, count=True):
+        zip64 = size >= zipfile.ZIP64_LIMIT
+        entry.update(method=zipfile.ZIP_STORED, crc=0, csize=size, size=size)
+        header = local_header(entry, zip64)
+        f.write(header)
+        crc = 0
+        written = 0
+        with open(source, "rb") as src:
+            while True:
+                self.check()
+                chunk = src.read(BUFFER)
+                if not chunk:
+                    break
+                crc = zlib.crc32(chunk, crc)
+                written += len(chunk)
+                f.write(chunk)
+                if count:
+                    self.advance(len(chunk))
+        if written != size and zip64 != (written >= zipfile.ZIP64_LIMIT):
+            raise OSError(f"{source} changed size while archiving")
+        entry.update(crc=crc, csize=written, size=written)
+        end = f.tell()
+        f.seek(entry["offset"])
+        f.write(local_header(entry, zip64))
+        f.seek(end)
+        self.stored += 1
+        entry["end"] = end
+
+    def write_central(self, f, entries):
+        start = f.tell()
+        for entry in entries:
+            f.write(central_header(entry))
+        end = f.tell()
+        count = len(entries)
+        size = end - start
+        if (
+            count >= 0xFFFF
+            or start >= zipfile.ZIP64_LIMIT
+            or size >= zipfile.ZIP64_LIMIT
+        ):
+            f.write(
+                struct.pack(
+                    zipfile.structEndArchive64,
+                    zipfile.stringEndArchive64,
+                    44,
+                    45,
+                    45,
+                    0,
+                    0,
+                    count,
+                    count,
+                    size,
+                    start,
+                )
+            )
+            f.write(
+                struct.pack(
+                    zipfile.structEndArchive64Locator,
+                    zipfile.stringEndArchive64Locator,
+                    0,
+                    end,
+                    1,
+                )
+            )
+            count = min(count, 0xFFFF)
+            size = min(size, MAX_32)
+            start = min(start, MAX_32)
+        f.write(
+            struct.pack(
+                zipfile.structEndArchive,
+                zipfile.stringEndArchive,
+                0,
+                0,
+                count,
+                count,
+                size,
+                start,
+                0,
+            )
+        )
+
+    def write(self):
+        # Blocking, returns whether the archive made it to its destination.
+        self.dest.parent.mkdir(parents=True, exist_ok=True)
+        pending = deque()
+        try:
+            entries = self.resume()
+            written = {e["name"] for e in entries}
+            todo = iter([m for m in self.members if m[1] not in written])
+            mode = "r+b" if entries else "wb"
+            with open(self.partial, mode) as f, open(
+                self.journal, "a"
+            ) as journal, ThreadPoolExecutor(self.workers) as pool:
+                f.seek(0, os.SEEK_END)
+
+                def fill():
+                    # Keeps the pool a few members ahead of the writer.
+                    while len(pending) < self.workers * 2:
+                        member = next(todo, None)
+                        if not member:
+                            return
+                        source = member[0]
+                        future = None
+                        if source and not should_store(source):
+                            future = pool.submit(self.pack, source)
+                        pending.append((member, future))
+
+                try:
+                    fill()
+                    while pending:
+                        (source, arcname), future = pending.popleft()
+                        packed = future.result() if future else None
+                        fill()
+                        self.check()
+                        entry = self.write_member(f, source, arcname, packed)
+                        entries.append(entry)
+                        f.flush()
+                        journal.write(json.dumps(entry) + "\n")
+                        journal.flush()
+                    self.write_central(f, entries)
+                except BaseException:
+                    for _, future in pending:
+                        if future:
+                            future.cancel()
+                    raise
+            os.replace(self.partial, self.dest)
+            self.journal.unlink()
+        except Cancelled:
+            LOGGER.warning(f"Stopped writing {self.dest}, it resumes on retry")
+            return False
+        except OSError as e:
+            LOGGER.error(f"Failed to write {self.dest}: {e}")
+            return False
+        LOGGER.debug(
+            f"Wrote {self.dest}: {self.compressed} compressed, {self.stored} stored, "
+            f"{self.skipped} already written"
+        )
+        return True
+
+
+async def write_archive(
+    members, dest, state=None, progress_fn=None, workers=WORKERS, level=LEVEL
+):
+    state = state if state is not None else {}
+    writer = ArchiveWriter(members, dest, state, workers, level)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, writer.write)
+    reported = None
+    while not future.done():
+        await asyncio.wait({future}, timeout=POLL)
+        await report_paused(state, progress_fn, bool(state.get("paused")))
+        progress = writer.progress()
+        if progress_fn and progress != reported and not future.done():
+            reported = progress
+            await progress_fn(progress)
+    return future.result()
@@ -0,0 +1,234 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import PurePath
+
+from ignite.server import kind_cache, utils
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+DEBOUNCE = float(ENV.get("IGNITE_CHANGE_FEED_DEBOUNCE", 0.25))
+# The watcher reports ignite's own writes too, those are already in the feed.
+WATCHER_GRACE = float(ENV.get("IGNITE_CHANGE_FEED_WATCHER_GRACE", 2))
+WATCHER_EVENTS = {"created": "created", "changed": "updated", "removed": "deleted"}
+
+
+def _posix(path):
+    return PurePath(path).as_posix().rstrip("/")
+
+
+def merge(old, new):
+    # What a client that missed both events needs to hear, None for nothing.
+    if old == "created":
+        return None if new == "deleted" else "created"
+    if old == "deleted" and new == "created":
+        return "updated"
+    return new
+
+
+def matches(path, prefixes):
+    for prefix in prefixes:
+        if not prefix or path == prefix or path.startswith(prefix + "/"):
+            return True
+    return False
+
+
+class ChangeFeed:
+    def __init__(self, debounce=DEBOUNCE):
+        self.debounce = debounce
+        self.manager = None
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()
+        self.recent = {}
+        self.subscriptions = {}
+        self.loop = None
+        self.wakeup = None
+        self.task = None
+        self.emitted = 0
+        self.coalesced = 0
+        self.sent = 0
+
+    def attach(self, manager):
+        self.manager = manager
+
+    def start(self):
+        if self.task and not self.task.done():
+            return
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.task = self.loop.create_task(self.run())
+
+    def subscribe(self, session_id, prefixes):
+        prefixes = {self.normalise(p) for p in prefixes or [""]}
+        with self.lock:
+            subscribed = self.subscriptions.setdefault(session_id, set())
+            subscribed |= prefixes
+            return sorted(subscribed)
+
+    def unsubscribe(self, session_id, prefixes=None):
+        with self.lock:
+            if prefixes is None:
+                self.subscriptions.pop(session_id, None)
+                return []
+            subscribed = self.subscriptions.get(session_id, set())
+            subscribed -= {self.normalise(p) for p in prefixes}
+            return sorted(subscribed)
+
+    def normalise(self, prefix):
+        if not prefix:
+            return ""
+        if utils.is_uri(prefix):
+            prefix = utils.uri_to_path(prefix.split("@", 1)[0])
+        return _posix(prefix)
+
+    def emit(self, event, path, kind="", uri=""):
+        if not self.subscriptions or not path:
+            return
+        path = _posix(path)
+        if not uri and kind and event != "deleted":
+            try:
+                uri = utils.get_uri(path, kind=kind)
+            except Exception:
+                uri = ""
+        with self.lock:
+            self.emitted += 1
+            self.recent[path] = time.time()
+            change = self.pending.get(path)
+            if change:
+                self.coalesced += 1
+                merged = merge(change["event"], event)
+                if not merged:
+                    del self.pending[path]
+                    return
+                change["event"] = merged
+                change["kind"] = kind or change["kind"]
+                change["uri"] = uri or change["uri"]
+            else:
+                self.pending[path] = {
+                    "event": event,
+                    "path": path,
+                    "kind": kind,
+                    "uri": uri,
+                }
+        self.wake()
+
+    def on_change(self, event, path):
+        event = WATCHER_EVENTS.get(event)
+        if not event or not self.subscriptions:
+            return
+        path = _posix(path)
+        with self.lock:
+            if time.time() - self.recent.get(path, 0) < WATCHER_GRACE:
+                return
+        kind = "" if event == "deleted" else kind_cache.get_kind(path)
+        if event != "deleted" and not kind:
+            return
+        self.emit(event, path, kind)
+
+    def wake(self):
+        loop = self.loop
+        if not loop or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self.wakeup.set)
+        except RuntimeError:
+            pass
+
+    def drain(self):
+        with self.lock:
+            changes = list(self.pending.values())
+            self.pending.clear()
+            now = time.time()
+            self.recent = {
+                p: t for p, t in self.recent.items() if now - t < WATCHER_GRACE
+            }
+            subscriptions = {k: set(v) for k, v in self.subscriptions.items()}
+        return changes, subscriptions
+
+    async def run(self):
+        while True:
+            await self.wakeup.wait()
+            # Whatever else arrives within the window goes out with it.
+            await asyncio.sleep(self.debounce)
+            self.wakeup.clear()
+            changes, subscriptions = self.drain()
+            if changes:
+                self.publish(changes, subscriptions)
+
+    def publish(self, changes, subscriptions):
+        for session_id, prefixes in subscriptions.items():
+            data = [c for c in changes if matches(c["path"], prefixes)]
+            if not data:
+                continue
+            message = {"type": "changes", "data": data}
+            if not self.manager or not self.manager.send(session_id, message):
+                LOGGER.debug(f"Dropping change feed for {session_id}")
+                self.unsubscribe(session_id)
+                continue
+            self.sent += len(data)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sessions": len(self.subscriptions),
+                "pending": len(self.pending),
+                "emitted": self.emitted,
+                "coalesced": self.coalesced,
+                "sent": self.sent,
+                "debounce": self.debounce,
+            }
+
+
+FEED = ChangeFeed()
+
+
+def attach(manager):
+    FEED.attach(manager)
+
+
+def start():
+    FEED.start()
+
+
+def subscribe(session_id, prefixes):
+    return FEED.subscribe(session_id, prefixes)
+
+
+def unsubscribe(session_id, prefixes=None):
+    return FEED.unsubscribe(session_id, prefixes)
+
+
+def emit(event, path, kind="", uri=""):
+    FEED.emit(event, path, kind, uri)
+
+
+def emit_entity(event, entity):
+    if not entity:
+        return
+    FEED.emit(event, entity.path, entity.dir_kind, getattr(entity, "uri", ""))
+
+
+def on_change(event, path):
+    FEED.on_change(event, path)
+
+
+def get_stats():
+    return FEED.stats()
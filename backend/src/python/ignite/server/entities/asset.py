@@ -15,7 +15,7 @@
 
 from pathlib import Path
 
-import yaml
+from ignite.server import anchor_cache
 from ignite.utils import symlink_points_to, lock_directory, unlock_directory
 from ignite.server.entities.directory import Directory
 
@@ -90,6 +90,8 @@ class Asset(Directory):
         versions = sorted(versions, reverse=True)
         assetversions = [AssetVersion(path / v) for v in versions]
         assetversions = [av for av in assetversions if av]
+        for av in assetversions:
+            av.versions = versions
         self._versions = versions
         self._assetversions = assetversions
         if versions:
@@ -113,6 +115,7 @@ class Asset(Directory):
         version = versions[0]
         assetversion = AssetVersion(path / version)
         if assetversion:
+            assetversion.versions = versions
             self._latest_v = version
             self._latest_av = assetversion
 
@@ -145,6 +148,18 @@ class Asset(Directory):
         next_v = self.next_version
         return self.path / next_v
 
+    def reserve_next_path(self):
+        # The empty directory claims the version, so a second copy queued
+        # before this one lands gets the one after.
+        version = int(self.next_version.lstrip("v"))
+        while True:
+            path = self.path / ("v" + str(version).zfill(3))
+            try:
+                path.mkdir()
+                return path
+            except FileExistsError:
+                version += 1
+
     def post_write(self):
         self.check_symlinks()
         # Disabled for now until there's a solution to Windows asking for UAC
@@ -171,9 +186,13 @@ class Asset(Directory):
                 best.unlink()
             best.symlink_to(best_target, target_is_directory=True)
 
-    def as_dict(self):
-        d = super().as_dict()
-        d["latest_av"] = self.latest_av.as_dict() if self.latest_av else {}
+    def as_dict(self, fields=None):
+        d = super().as_dict(fields)
+        if not fields or "latest_av" in fields:
+            latest_av = self.latest_av
+            d["latest_av"] = latest_av.as_dict(fields) if latest_av else {}
+        if fields and "filter_string" not in fields:
+            return d
         attribs = ("name", "path", "dir_kind", "project")
         filter_string = "".join([str(getattr(self, a)) for a in attribs])
         filter_string += "".join(self.versions)
@@ -185,33 +204,35 @@ class Asset(Directory):
         return d
 
     def get_tags(self):
-        with open(self.anchor, "r") as f:
-            config = yaml.safe_load(f) or {}
+        config = anchor_cache.load_anchor(self.anchor)
         return config.get("tags", {})
 
     def set_tags(self, version, tags):
-        asset_tags = self.get_tags()
-        asset_tags[version] = tags
-        self.update_config({"tags": asset_tags})
+        with anchor_cache.get_lock(self.anchor):
+            asset_tags = self.get_tags()
+            asset_tags[version] = tags
+            self.update_config({"tags": asset_tags})
         return asset_tags[version]
 
     def add_tags(self, version, tags):
-        asset_tags = self.get_tags()
-        existing = asset_tags.get(version, [])
-        existing += tags
-        asset_tags[version] = list(set(existing))
-        self.update_config({"tags": asset_tags})
+        with anchor_cache.get_lock(self.anchor):
+            asset_tags = self.get_tags()
+            existing = asset_tags.get(version, [])
+            existing += tags
+            asset_tags[version] = list(set(existing))
+            self.update_config({"tags": asset_tags})
         return asset_tags[version]
 
     def remove_tags(self, version, tags=[], all=False):
-        asset_tags = self.get_tags()
-        existing = asset_tags.get(version, [])
-        if all:
-            existing = []
-        for tag in tags:
-            if tag not in existing:
-                continue
-            existing.remove(tag)
-        asset_tags[version] = list(set(existing))
-        self.update_config({"tags": asset_tags})
+        with anchor_cache.get_lock(self.anchor):
+            asset_tags = self.get_tags()
+            existing = asset_tags.get(version, [])
+            if all:
+                existing = []
+            for tag in tags:
+                if tag not in existing:
+                    continue
+                existing.remove(tag)
+            asset_tags[version] = list(set(existing))
+            self.update_config({"tags": asset_tags})
         return asset_tags[version]
@@ -16,9 +16,9 @@
 from pathlib import Path, PurePath
 
 import clique
-from ignite.server import utils
+from ignite.server import anchor_cache, utils
 from ignite.logger import get_logger
-from ignite.server.constants import COMP_TYPES, TAG_WEIGHTS
+from ignite.server.constants import ANCHORS, COMP_TYPES, TAG_WEIGHTS
 from ignite.server.entities.asset import Asset
 from ignite.server.entities.component import Component
 from ignite.server.entities.directory import Directory
@@ -33,9 +33,9 @@ for name, exts in COMP_TYPES.items():
 
 class AssetVersion(Directory):
     def __init__(self, path) -> None:
-        self.score = 0
-        self.tags = set()
+        self._reset_lazy()
         super().__init__(path, dir_kind="assetversion")
+        self._reset_lazy()
         self.dict_attrs = [
             "components",
             "asset",
@@ -54,19 +54,79 @@ class AssetVersion(Directory):
         self.version_int = 0
         if self.version.startswith("v"):
             self.version_int = int(self.version.lstrip("v"))
-        self.versions = self._fetch_versions()
-        self.is_latest = self._is_latest()
         self.name = self.path.parent.name
-        self.components = []
-        self.uri = utils.get_uri(self.asset, self.version_int)
+        self.uri = utils.get_uri(self.asset, self.version_int, kind="asset")
         self.task = (
             self.asset.parent.parent if "/exports/" in self.path.as_posix() else None
         )
         self.context = self.get_context()
-        self.fetch_components()
-        self._get_score()
-        self.tags = self.get_tags()
-        self.thumbnail = self.get_thumbnail()
+
+    def _reset_lazy(self):
+        # Components, versions, tags and thumbnails are only worked out when
+        # first accessed as listings rarely need all of them.
+        self._components = None
+        self._versions = None
+        self._tags = None
+        self._score = None
+        self._thumbnail = None
+        self._thumbnail_fetched = False
+
+    @property
+    def components(self):
+        if self._components is None:
+            self.fetch_components()
+        return self._components
+
+    @components.setter
+    def components(self, value):
+        self._components = value
+
+    @property
+    def versions(self):
+        if self._versions is None:
+            self._versions = self._fetch_versions()
+        return self._versions
+
+    @versions.setter
+    def versions(self, value):
+        self._versions = value
+
+    @property
+    def is_latest(self):
+        return self._is_latest()
+
+    @property
+    def tags(self):
+        if self._tags is None:
+            self._tags = self.get_tags()
+        return self._tags
+
+    @tags.setter
+    def tags(self, value):
+        self._tags = value
+        self._score = None
+
+    @property
+    def score(self):
+        if self._score is None:
+            self._get_score()
+        return self._score
+
+    @score.setter
+    def score(self, value):
+        self._score = value
+
+    @property
+    def thumbnail(self):
+        if not self._thumbnail_fetched:
+            self._thumbnail = self.get_thumbnail()
+            self._thumbnail_fetched = True
+        return self._thumbnail
+
+    @thumbnail.setter
+    def thumbnail(self, value):
+        self._thumbnail = value
+        self._thumbnail_fetched = True
 
     def __lt__(self, other):
         return self.version_int < other.version_int
@@ -114,18 +174,20 @@ class AssetVersion(Directory):
     def _is_latest(self):
         return self.version == self.versions[0]
 
-    def as_dict(self):
-        d = super().as_dict()
+    def as_dict(self, fields=None):
+        d = super().as_dict(fields)
         d["build"] = self.asset
-        d["default_name"] = ""
-        d["default_type"] = ""
-        if self.components:
-            c = self.components[0]
-            d["default_name"] = c["name"]
-            ext = c["ext"]
+        if not fields or {"default_name", "default_type"} & set(fields):
+            d["default_name"] = ""
             d["default_type"] = ""
-            if ext in COMP_EXT_TYPES.keys():
-                d["default_type"] = COMP_EXT_TYPES[ext]
+            if self.components:
+                c = self.components[0]
+                d["default_name"] = c["name"]
+                ext = c["ext"]
+                if ext in COMP_EXT_TYPES.keys():
+                    d["default_type"] = COMP_EXT_TYPES[ext]
+        if fields and "filter_string" not in fields:
+            return d
         attribs = ("name", "path", "dir_kind", "project")
         filter_string = "".join([str(getattr(self, a)) for a in attribs])
         filter_string += "".join(self.tags)
@@ -156,8 +218,11 @@ class AssetVersion(Directory):
         return sorted(candidates, key=lambda c: c["priority"])[0]
 
     def get_tags(self):
-        asset = Asset(self.asset)
-        tags = asset.get_tags()
+        try:
+            config = anchor_cache.load_anchor(self.asset / ANCHORS["asset"])
+            tags = config.get("tags", {})
+        except FileNotFoundError:
+            tags = Asset(self.asset).get_tags()
         return sorted(tags.get(self.version, []))
 
     def set_tags(self, tags):
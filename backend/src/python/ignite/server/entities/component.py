@@ -81,7 +81,7 @@ class Component:
         self.name = path.stem
         self.filename = path.name
         self.path = path.as_posix()
-        self.uri = utils.get_uri(self.path)
+        self.uri = utils.get_uri(self.path, kind="component")
         self.path_nr = utils.get_nr(path)
         if self.path.endswith(".bgeo.sc"):
             self.ext = ".bgeo.sc"
@@ -101,7 +101,7 @@ class Component:
         self.name = path.stem.replace(".####", "")
         self.filename = name
         self.path = path.as_posix()
-        self.uri = utils.get_uri(self.path)
+        self.uri = utils.get_uri(self.path, kind="component")
         self.path_nr = utils.get_nr(path)
         self.ext = ext
         self.static = False
@@ -20,7 +20,7 @@ from pathlib import Path
 
 import timeago
 import yaml
-from ignite.server import api, utils
+from ignite.server import anchor_cache, api, change_feed, kind_cache, utils
 from ignite.server.constants import ANCHORS
 from ignite.server.utils import CONFIG, is_dir_of_kind
 from ignite.utils import (
@@ -33,6 +33,13 @@ from ignite.utils import (
 
 
 LOGGER = get_logger(__name__)
+TIME_FIELDS = (
+    "size",
+    "creation_time",
+    "modification_time",
+    "creation_ts",
+    "modification_ts",
+)
 
 
 class Directory:
@@ -101,7 +108,7 @@ class Directory:
         if is_dir_of_kind(CONFIG["root"] / project / split2[1], "group"):
             self.group = split2[1]
         self.name = split2[-1]
-        self.uri = utils.get_uri(path)
+        self.uri = utils.get_uri(path, kind=self.dir_kind)
         self.protected = is_read_only(self.anchor)
         self.context = self.get_context()
         self.load_from_config()
@@ -119,8 +126,7 @@ class Directory:
         return context.relative_to(static_path).as_posix() if context else ""
 
     def load_from_config(self):
-        with open(self.anchor, "r") as f:
-            config = yaml.safe_load(f) or {}
+        config = anchor_cache.load_anchor(self.anchor)
         for k, v in config.items():
             setattr(self, k, v)
 
@@ -130,7 +136,7 @@ class Directory:
         else:
             return self.path.parent
 
-    def as_dict(self):
+    def as_dict(self, fields=None):
         default = [
             "path",
             "protected",
@@ -146,18 +152,29 @@ class Directory:
         default_nr = ["path"]
         d = {}
         for s in default:
+            if fields and s not in fields:
+                continue
             value = getattr(self, s)
             d[s] = value
             if s in default_nr or s in self.nr_attrs:
                 d[f"{s}_nr"] = utils.get_nr(value)
         attrs = dir(self)
         for s in self.dict_attrs:
+            if fields and s not in fields:
+                continue
             if not s in attrs:
                 continue
             value = getattr(self, s)
             d[s] = value
             if s in self.nr_attrs:
                 d[f"{s}_nr"] = utils.get_nr(value)
+        d["icon"] = self.dir_kind
+        if hasattr(self, "task_type"):
+            d["icon"] += "_" + self.task_type
+        if self.repr and (not fields or "thumbnail" in fields):
+            d["thumbnail"] = api.get_repr_comp(self.repr)
+        if fields and not set(fields) & set(TIME_FIELDS):
+            return d
         d["size"] = bytes_to_human_readable(self.size)
         try:
             d["creation_time"] = timeago.format(
@@ -174,11 +191,6 @@ class Directory:
             d["modification_time"] = "data error"
             d["creation_ts"] = 0
             d["modification_ts"] = 0
-        d["icon"] = self.dir_kind
-        if hasattr(self, "task_type"):
-            d["icon"] += "_" + self.task_type
-        if self.repr:
-            d["thumbnail"] = api.get_repr_comp(self.repr)
         return d
 
     def create_dir(self, name, anchor="directory", recursive=False):
@@ -224,17 +236,21 @@ class Directory:
 
     def update_config(self, data):
         data["modification_time"] = datetime.now(tz=timezone.utc)
-        with open(self.anchor, "w+") as f:
-            config = yaml.safe_load(f) or {}
+        with anchor_cache.get_lock(self.anchor):
+            try:
+                config = anchor_cache.load_anchor(self.anchor)
+            except FileNotFoundError:
+                config = {}
             if not config.get("creation_time"):
                 if config == data:
                     LOGGER.debug("Asset config identical - not writing.")
                     return config
                 config["creation_time"] = data["modification_time"]
             config.update(data)
-            yaml.safe_dump(config, f)
+            anchor_cache.write_anchor(self.anchor, config)
         if hasattr(self, "post_write"):
             self.post_write()
+        change_feed.emit_entity("updated", self)
         return config
 
     def set_repr(self, uri):
@@ -285,23 +301,34 @@ class Directory:
         self.update_config({"tags": tags})
         return tags
 
+    def current_tags(self):
+        # Whatever is on disk now, self.tags is only as fresh as this object.
+        try:
+            return anchor_cache.load_anchor(self.anchor).get("tags") or []
+        except FileNotFoundError:
+            return []
+
     def add_tags(self, tags):
-        existing = self.get_tags()
-        existing += tags
-        existing = list(set(existing))
-        self.update_config({"tags": existing})
+        with anchor_cache.get_lock(self.anchor):
+            existing = self.current_tags()
+            existing += tags
+            existing = list(set(existing))
+            self.update_config({"tags": existing})
+        self.tags = existing
         return existing
 
     def remove_tags(self, tags=[], all=False):
-        existing = self.get_tags()
-        if all:
-            existing = []
-        for tag in tags:
-            if tag not in existing:
-                continue
-            existing.remove(tag)
-        existing = list(set(existing))
-        self.update_config({"tags": existing})
+        with anchor_cache.get_lock(self.anchor):
+            existing = self.current_tags()
+            if all:
+                existing = []
+            for tag in tags:
+                if tag not in existing:
+                    continue
+                existing.remove(tag)
+            existing = list(set(existing))
+            self.update_config({"tags": existing})
+        self.tags = existing
         return existing
 
     def set_protected(self, protected):
@@ -343,34 +370,18 @@ class Directory:
 
     @property
     def attributes(self):
-        root = CONFIG["root"].as_posix()
-        parent = Path(self.path.parent)
-        iter = 1
         parent_attrib_list = []
-        while root != parent.as_posix():
-            if iter > 20:
-                raise Exception(
-                    f"Reached iteration limit when walking directory: {self.path}"
-                )
-            contents = next(parent.glob(".ign_*.yaml"), None)
-            if not contents:
-                parent = parent.parent
-                iter += 1
-                continue
-            with open(contents, "r") as f:
-                config = yaml.safe_load(f) or {}
+        for anchor in kind_cache.get_ancestor_anchors(self.path, CONFIG["root"]):
+            config = anchor_cache.load_anchor(anchor)
             dir_attribs = config.get("attributes")
             if dir_attribs:
                 parent_attrib_list.append(dir_attribs)
-            parent = parent.parent
-            iter += 1
         parent_attrib_list.reverse()
         parent_attribs = {}
         for attribs in parent_attrib_list:
             parent_attribs.update(attribs)
 
-        with open(self.anchor, "r") as f:
-            config = yaml.safe_load(f) or {}
+        config = anchor_cache.load_anchor(self.anchor)
         current_attribs = config.get("attributes", {})
 
         attributes = dict(parent_attribs)
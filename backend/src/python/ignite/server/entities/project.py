@@ -18,7 +18,7 @@ import time
 from pathlib import Path, PurePath
 
 import yaml
-from ignite.server import utils
+from ignite.server import anchor_cache, project_tree, utils
 from ignite.server.constants import ANCHORS
 from ignite.server.entities.group import Group
 from ignite.server.entities.directory import Directory
@@ -58,6 +58,7 @@ class Project(Directory):
             config = {"status": "open", "short_name": "", "created": time.time()}
             with open(self.anchor, "w") as f:
                 yaml.safe_dump(config, f)
+            anchor_cache.invalidate(self.anchor)
         else:
             LOGGER.warning("Initialising an existing project!?")
         self.load_from_path()
@@ -74,7 +75,7 @@ class Project(Directory):
         for d in dirs:
             dir_path = path / d
             setattr(self, f"{d}_path", dir_path)
-        self.uri = utils.get_uri(path)
+        self.uri = utils.get_uri(path, kind=self.dir_kind)
         self.load_from_config()
 
     def set_short_name(self, name):
@@ -89,71 +90,14 @@ class Project(Directory):
         config.update(data)
         super().update_config(config)
 
-    def get_project_tree(self):
-        kinds = {v: k for k, v in ANCHORS.items()}
-        anchors = kinds.keys()
-
-        def walk_project(path, d={}, _id=[0]):
-            name = path.name
-            if path.is_dir():
-                d["id"] = str(_id[0] or "root")
-                d["name"] = name
-                d["path"] = str(path)
-                d["dir_kind"] = ""
-                d["task_type"] = ""
-                d["children"] = []
-                d["anchor"] = None
-                for x in sorted(list(path.iterdir())):
-                    name = x.name
-                    _id[0] += 1
-                    if name in (".config", "common"):
-                        LOGGER.debug(f"Skipping {x} - reserved name.")
-                        continue
-                    if name in anchors:
-                        kind = kinds[name]
-                        if kind in ("asset", "assetversion"):
-                            LOGGER.debug(f"Skipping {x} - is asset or av.")
-                            continue
-                        d["dir_kind"] = kind
-                        d["anchor"] = x
-                        continue
-                    if name.startswith("."):
-                        LOGGER.debug(f"Skipping {x} - starts with period.")
-                        continue
-                    elif not d["dir_kind"]:
-                        LOGGER.debug(f"Skipping {x} - no anchor.")
-                        return
-                    if d["dir_kind"] == "task" and d["anchor"]:
-                        with open(d["anchor"], "r") as f:
-                            config = yaml.safe_load(f)
-                            config = config or {}
-                            d["task_type"] = config.get("task_type")
-                    child_d = {}
-                    d["children"].append(child_d)
-                    walk_project(x, child_d, _id)
-                del d["anchor"]
-                d["children"] = [
-                    child for child in d["children"] if child and child["dir_kind"]
-                ]
-                d["icon"] = d["dir_kind"]
-                if d["task_type"]:
-                    d["icon"] = d["icon"] + "_" + d["task_type"]
-            return d
-
-        def get_filter_strings(node, prepend):
-            node["filter_strings"] = set(prepend)
-            node["filter_strings"].add(node["name"])
-            if not node.get("children"):
-                return {node["name"]}
-            child_strings = set()
-            for child in node["children"]:
-                child_strings.update(
-                    get_filter_strings(child, set(node["filter_strings"]))
-                )
-            node["filter_strings"].update(child_strings)
-            return set(node["filter_strings"])
-
-        path = Path(self.path)
-        tree = walk_project(path)
-        get_filter_strings(tree, set())
-        return tree
+    def get_project_tree(self, known=None):
+        tree = project_tree.get_project_tree(self.path)
+        return tree.get_tree(known) if tree else (0, None)
+
+    def get_tree_children(self, node_id="root", depth=1):
+        tree = project_tree.get_project_tree(self.path)
+        return tree.get_children(node_id, depth) if tree else None
+
+    def get_tree_version(self):
+        tree = project_tree.get_project_tree(self.path)
+        return tree.version if tree else 0
@@ -101,7 +101,7 @@ class Scene(Directory):
         self.extension = ext
         self.task = path.parent.parent
         self.context = self.get_context()
-        self.uri = get_uri(path)
+        self.uri = get_uri(path, kind="scene")
         self.load_from_config()
 
     def is_valid(self):
@@ -109,8 +109,8 @@ class Scene(Directory):
             return False
         return True
 
-    def as_dict(self):
-        d = super().as_dict()
+    def as_dict(self, fields=None):
+        d = super().as_dict(fields)
         d["exports"] = os.path.join(self.task, "exports")
         return d
 
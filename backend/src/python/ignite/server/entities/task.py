@@ -50,9 +50,10 @@ class Task(Directory):
         self.update_config(config)
         return True
 
-    def as_dict(self):
-        d = super().as_dict()
-        d["next_scene"] = self.get_next_scene()
+    def as_dict(self, fields=None):
+        d = super().as_dict(fields)
+        if not fields or "next_scene" in fields:
+            d["next_scene"] = self.get_next_scene()
         return d
 
     def discover_scenes(self, dcc=[], latest=True, as_dict=False):
@@ -116,3 +117,8 @@ class Task(Directory):
         path = self.exports / asset_name
         asset = Asset(path)
         return asset.next_path
+
+    def reserve_next_export(self, asset_name):
+        path = self.exports / asset_name
+        asset = Asset(path)
+        return asset.reserve_next_path()
@@ -0,0 +1,188 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+from functools import lru_cache
+
+from ignite.logger import get_logger
+from mongoquery import Query
+
+LOGGER = get_logger(__name__)
+MAX_CACHED = 256
+REGEX_FLAGS = {"i": re.I, "m": re.M, "s": re.S, "x": re.X}
+MISSING = object()
+
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=1024)
+def compile_regex(pattern, options=""):
+    flags = 0
+    delimited = re.match(r"\A/(.+)/([imsx]{,4})\Z", pattern, flags=re.DOTALL)
+    if delimited:
+        pattern, extra = delimited.groups()
+        options += extra
+    for option in options:
+        flags |= REGEX_FLAGS.get(option, 0)
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        # Half typed searches such as "[" shouldn't fail the whole listing.
+        LOGGER.debug(f"Matching {pattern!r} literally: {e}")
+        return re.compile(re.escape(pattern), flags)
+
+
+def _is_array(value):
+    return isinstance(value, Sequence) and not isinstance(value, str)
+
+
+def _extract(entry, path):
+    # Same traversal as mongoquery: lists are mapped unless indexed.
+    for i, key in enumerate(path):
+        if entry is None:
+            return None
+        if _is_array(entry):
+            if key.isdigit():
+                index = int(key)
+                if index >= len(entry):
+                    return MISSING
+                entry = entry[index]
+                continue
+            return [_extract(item, path[i:]) for item in entry]
+        if isinstance(entry, Mapping) and key in entry:
+            entry = entry[key]
+            continue
+        return MISSING
+    return entry
+
+
+def _equals(condition):
+    def test(value):
+        if value == condition:
+            return True
+        return _is_array(value) and condition in value
+
+    return test
+
+
+def _combine(tests):
+    if len(tests) == 1:
+        return tests[0]
+    return lambda v: all(test(v) for test in tests)
+
+
+def _compile_condition(condition):
+    if not isinstance(condition, Mapping):
+        return _equals(condition)
+    tests = []
+    for key, arg in condition.items():
+        if key == "$options":
+            continue
+        elif key == "$regex":
+            regex = compile_regex(arg, condition.get("$options", ""))
+            tests.append(lambda v, r=regex: isinstance(v, str) and bool(r.search(v)))
+        elif key in ("$and", "$or", "$nor"):
+            subs = [_compile_condition(c) for c in arg]
+            if key == "$and":
+                tests.append(lambda v, s=subs: all(sub(v) for sub in s))
+            elif key == "$or":
+                tests.append(lambda v, s=subs: any(sub(v) for sub in s))
+            else:
+                tests.append(lambda v, s=subs: not any(sub(v) for sub in s))
+        elif key == "$elemMatch":
+            element_test = _compile_condition(arg)
+            tests.append(
+                lambda v, t=element_test: isinstance(v, Sequence)
+                and any(t(element) for element in v)
+            )
+        elif key.startswith("$"):
+            raise NotImplementedError(key)
+        else:
+            tests.append(_compile_field(key, arg))
+    if not tests:
+        return lambda v: True
+    return _combine(tests)
+
+
+def _compile_field(key, condition):
+    try:
+        test = _compile_condition(condition)
+    except NotImplementedError:
+        return Query({key: condition}).match
+    path = key.split(".")
+    return lambda d: test(_extract(d, path))
+
+
+def _compile_document(expr):
+    if not expr:
+        return lambda d: True
+    try:
+        return _compile_condition(expr)
+    except NotImplementedError:
+        return Query(expr).match
+
+
+def get_key(expr):
+    data = json.dumps(expr, sort_keys=True, default=str)
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def compile_filter(expr):
+    key = get_key(expr)
+    with _CACHE_LOCK:
+        predicate = _CACHE.get(key)
+        if predicate:
+            _CACHE.move_to_end(key)
+            return predicate
+    predicate = _compile_document(expr)
+    with _CACHE_LOCK:
+        _CACHE[key] = predicate
+        while len(_CACHE) > MAX_CACHED:
+            _CACHE.popitem(last=False)
+    return predicate
+
+
+def get_pushdown(expr, columns):
+    # Regex conditions on fields the index stores can also be evaluated by
+    # sqlite, as long as they are required by every match.
+    if not isinstance(expr, Mapping):
+        return []
+    pushdown = []
+    for key, condition in expr.items():
+        if key == "$and":
+            for sub in condition:
+                pushdown += get_pushdown(sub, columns)
+            continue
+        column = columns.get(key)
+        if not column or not isinstance(condition, Mapping):
+            continue
+        if set(condition.keys()) - {"$regex", "$options"}:
+            continue
+        pattern = condition.get("$regex")
+        if not isinstance(pattern, str):
+            continue
+        regex = compile_regex(pattern, condition.get("$options", ""))
+        inline = "".join(k for k, flag in REGEX_FLAGS.items() if regex.flags & flag)
+        if inline:
+            pushdown.append((column, f"(?{inline}){regex.pattern}"))
+        else:
+            pushdown.append((column, regex.pattern))
+    return pushdown
@@ -0,0 +1,469 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from pathlib import Path, PurePath
+
+from ignite.server import (
+    anchor_cache,
+    kind_cache,
+    project_tree,
+    repr_cache,
+    resolve_cache,
+    search,
+    utils,
+)
+from ignite.server.constants import ANCHORS
+from ignite.server.utils import CONFIG
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+KINDS = {v: k for k, v in ANCHORS.items()}
+INDEX_NAME = "index.db"
+# Bump when the tables change so existing indexes get recrawled.
+SCHEMA_VERSION = 2
+WHERE_COLUMNS = ("name", "path", "parent", "task_type")
+RESERVED_NAMES = (".config", "common")
+CONTAINER_NAMES = ("exports", "scenes")
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entities (
+        path TEXT PRIMARY KEY,
+        parent TEXT NOT NULL,
+        name TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        task_type TEXT NOT NULL DEFAULT '',
+        mtime REAL NOT NULL DEFAULT 0,
+        ctime REAL NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS entities_kind ON entities (kind, path)",
+    "CREATE INDEX IF NOT EXISTS entities_parent ON entities (parent)",
+    "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)",
+)
+
+_INDEXES = {}
+_INDEXES_LOCK = threading.Lock()
+
+
+def _posix(path):
+    return PurePath(path).as_posix().rstrip("/")
+
+
+def _prefix_range(path):
+    # Every descendant of "a/b" sorts between "a/b/" and "a/b0" as "0"
+    # follows "/" in ASCII, which lets sqlite use the primary key index.
+    return path + "/", path + "0"
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern):
+    return re.compile(pattern)
+
+
+def _regexp(pattern, value):
+    if value is None:
+        return False
+    return _compile(pattern).search(value) is not None
+
+
+def read_task_type(anchor):
+    try:
+        config = anchor_cache.load_anchor(anchor)
+    except Exception as e:
+        LOGGER.error(f"Failed to read {anchor}: {e}")
+        return ""
+    return config.get("task_type") or "generic"
+
+
+def detect_kind(path, names=None):
+    # Directories without an anchor inside exports or scenes get a delayed
+    # anchor, the same way discovery always treated them.
+    path = Path(path)
+    if names is None:
+        try:
+            names = [entry.name for entry in os.scandir(path)]
+        except OSError:
+            return ""
+    for name in names:
+        if name in KINDS:
+            return KINDS[name]
+    parent1 = path.parent
+    if parent1.parent.name == "exports":
+        utils.create_delayed_anchor(path, "assetversion")
+        return "assetversion"
+    elif parent1.name == "exports":
+        utils.create_delayed_anchor(path, "asset")
+        return "asset"
+    elif parent1.name == "scenes":
+        utils.create_delayed_anchor(path, "scene")
+        return "scene"
+    return ""
+
+
+class EntityIndex:
+    def __init__(self, path):
+        self.root = Path(path)
+        self.db_path = self.root / ".config" / INDEX_NAME
+        self.lock = threading.RLock()
+        self.local = threading.local()
+        self.conns = []
+        self.crawled = False
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.connect() as conn:
+            for statement in SCHEMA + search.SCHEMA:
+                conn.execute(statement)
+
+    def __repr__(self):
+        return f"EntityIndex({self.root})"
+
+    def get_conn(self):
+        # One connection per thread, kept open. The index lives in the project
+        # on shared storage, WAL needs shared memory all hosts can see, so it
+        # keeps a rollback journal instead.
+        conn = getattr(self.local, "conn", None)
+        if conn:
+            return conn
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.create_function("REGEXP", 2, _regexp, deterministic=True)
+        conn.execute("PRAGMA journal_mode=TRUNCATE")
+        self.local.conn = conn
+        with self.lock:
+            self.conns.append(conn)
+        return conn
+
+    @contextmanager
+    def connect(self):
+        conn = self.get_conn()
+        with conn:
+            yield conn
+
+    def close(self):
+        with self.lock:
+            for conn in self.conns:
+                conn.close()
+            self.conns.clear()
+        self.local = threading.local()
+
+    def get_meta(self, key, default=None):
+        with self.connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM meta WHERE key = ?", (key,)
+            ).fetchone()
+        return row["value"] if row else default
+
+    def set_meta(self, key, value, conn=None):
+        sql = "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)"
+        if conn:
+            conn.execute(sql, (key, str(value)))
+            return
+        with self.connect() as conn:
+            conn.execute(sql, (key, str(value)))
+
+    @property
+    def is_crawled(self):
+        # Once crawled it stays so, only the negative answer is asked again.
+        if self.crawled:
+            return True
+        with self.connect() as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM meta WHERE key IN ('crawled', 'version')"
+            ).fetchall()
+        meta = {row["key"]: row["value"] for row in rows}
+        if meta.get("crawled") is None:
+            return False
+        self.crawled = meta.get("version") == str(SCHEMA_VERSION)
+        return self.crawled
+
+    def ensure_crawled(self):
+        if self.is_crawled:
+            return
+        with self.lock:
+            if not self.is_crawled:
+                self.crawl()
+
+    def _make_row(self, path, kind):
+        path = Path(path)
+        stat = path.stat()
+        task_type = ""
+        if kind == "task":
+            task_type = read_task_type(path / ANCHORS["task"])
+        return (
+            path.as_posix(),
+            path.parent.as_posix(),
+            path.name,
+            kind,
+            task_type,
+            stat.st_mtime,
+            stat.st_ctime,
+        )
+
+    def _make_doc(self, path, kind, names=None):
+        return search.make_document(self.root, path, kind, names)
+
+    def _insert(self, conn, rows, docs):
+        conn.executemany(
+            "INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        search.insert(conn, docs)
+
+    def _delete(self, conn, path, recursive=True):
+        for table in ("entities", "search", "search_grams"):
+            conn.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+            if recursive:
+                low, high = _prefix_range(path)
+                conn.execute(
+                    f"DELETE FROM {table} WHERE path > ? AND path < ?", (low, high)
+                )
+
+    def _walk(self, path, rows, docs, is_root=False):
+        try:
+            entries = list(os.scandir(path))
+        except OSError as e:
+            LOGGER.error(f"Failed to list {path}: {e}")
+            return
+        names = [entry.name for entry in entries]
+        kind = "" if is_root else detect_kind(path, names)
+        if not kind and not is_root and Path(path).name not in CONTAINER_NAMES:
+            return
+        if kind:
+            rows.append(self._make_row(path, kind))
+            files = [entry.name for entry in entries if entry.is_file()]
+            docs.append(self._make_doc(path, kind, files))
+        if kind in ("assetversion", "scene"):
+            return
+        for entry in entries:
+            name = entry.name
+            if name in RESERVED_NAMES or name.startswith("."):
+                continue
+            if not entry.is_dir(follow_symlinks=False):
+                continue
+            if kind == "asset" and not name.startswith("v"):
+                continue
+            self._walk(entry.path, rows, docs)
+
+    def crawl(self):
+        start = time.time()
+        LOGGER.info(f"Crawling {self.root} to build the entity index...")
+        rows = []
+        docs = []
+        self._walk(self.root.as_posix(), rows, docs, is_root=True)
+        with self.lock, self.connect() as conn:
+            for table in ("entities", "search", "search_grams"):
+                conn.execute(f"DELETE FROM {table}")
+            self._insert(conn, rows, docs)
+            self.set_meta("crawled", time.time(), conn=conn)
+            self.set_meta("version", SCHEMA_VERSION, conn=conn)
+        self.crawled = True
+        LOGGER.info(
+            f"Indexed {len(rows)} entities in {self.root} "
+            f"({time.time() - start:.2f}s)"
+        )
+        return len(rows)
+
+    def find(self, path, kind, task_types=None, limit=None, verify=True, where=None):
+        self.ensure_crawled()
+        path = _posix(path)
+        low, high = _prefix_range(path)
+        sql = "SELECT * FROM entities WHERE kind = ? AND path > ? AND path < ?"
+        params = [kind, low, high]
+        if task_types:
+            sql += f" AND task_type IN ({', '.join('?' * len(task_types))})"
+            params += list(task_types)
+        for column, pattern in where or []:
+            if column not in WHERE_COLUMNS:
+                raise ValueError(f"Can't filter on {column}")
+            sql += f" AND {column} REGEXP ?"
+            params.append(pattern)
+        sql += " ORDER BY path"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return self._verify(rows) if verify else rows
+
+    def rows(self, kinds=None, path=None):
+        self.ensure_crawled()
+        sql = "SELECT * FROM entities WHERE 1"
+        params = []
+        if kinds:
+            sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+            params += list(kinds)
+        if path:
+            path = _posix(path)
+            low, high = _prefix_range(path)
+            sql += " AND (path = ? OR (path > ? AND path < ?))"
+            params += [path, low, high]
+        with self.connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def search(self, text, kinds=None, limit=100):
+        self.ensure_crawled()
+        with self.connect() as conn:
+            return search.query(conn, text, kinds=kinds, limit=limit)
+
+    def children(self, parent):
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT * FROM entities WHERE parent = ?", (_posix(parent),)
+            ).fetchall()
+
+    def get(self, path):
+        with self.connect() as conn:
+            return conn.execute(
+                "SELECT * FROM entities WHERE path = ?", (_posix(path),)
+            ).fetchone()
+
+    def _verify(self, rows):
+        # Rows can go stale if something outside ignite touched the tree,
+        # drop them lazily instead of recrawling.
+        valid = []
+        stale = []
+        for row in rows:
+            if os.path.isdir(row["path"]):
+                valid.append(row)
+            else:
+                stale.append(row["path"])
+        if stale:
+            LOGGER.debug(f"Dropping {len(stale)} stale rows from {self}")
+            self.remove_many(stale)
+        return valid
+
+    def update(self, path, kind=None):
+        path = Path(path)
+        if not path.is_dir():
+            self.remove(path)
+            return
+        kind = kind or detect_kind(path)
+        if not kind:
+            self.remove(path, recursive=False)
+            return
+        row = self._make_row(path, kind)
+        doc = self._make_doc(path, kind)
+        with self.connect() as conn:
+            self._insert(conn, [row], [doc])
+
+    def reindex(self, path):
+        path = Path(path)
+        if path.as_posix() == self.root.as_posix():
+            return self.crawl()
+        rows = []
+        docs = []
+        if path.is_dir():
+            self._walk(path.as_posix(), rows, docs)
+        with self.connect() as conn:
+            self._delete(conn, _posix(path))
+            self._insert(conn, rows, docs)
+        return len(rows)
+
+    def remove(self, path, recursive=True):
+        with self.connect() as conn:
+            self._delete(conn, _posix(path), recursive=recursive)
+
+    def remove_many(self, paths):
+        with self.connect() as conn:
+            for table in ("entities", "search", "search_grams"):
+                conn.executemany(
+                    f"DELETE FROM {table} WHERE path = ?", [(p,) for p in paths]
+                )
+
+
+def get_index_root(path):
+    # relative_to is purely lexical, a ".." would climb out of the root and
+    # get the parent crawled and an index written into it.
+    root = Path(os.path.normpath(CONFIG["root"]))
+    path = PurePath(path)
+    if ".." in path.parts:
+        return None
+    try:
+        rel = PurePath(os.path.normpath(path)).relative_to(root)
+    except ValueError:
+        return None
+    if not rel.parts or rel.parts[0] in RESERVED_NAMES:
+        return None
+    top = root / rel.parts[0]
+    if not top.is_dir():
+        return None
+    return top
+
+
+def get_indexes():
+    with _INDEXES_LOCK:
+        return list(_INDEXES.values())
+
+
+def get_index(path):
+    top = get_index_root(path)
+    if not top:
+        return None
+    key = top.as_posix()
+    with _INDEXES_LOCK:
+        index = _INDEXES.get(key)
+        if not index:
+            try:
+                index = EntityIndex(top)
+            except Exception as e:
+                LOGGER.error(f"Failed to open entity index for {top}: {e}")
+                return None
+            _INDEXES[key] = index
+    return index
+
+
+def forget_index(path):
+    with _INDEXES_LOCK:
+        index = _INDEXES.pop(_posix(path), None)
+    if index:
+        index.close()
+
+
+def update_entity(path, recursive=False):
+    resolve_cache.invalidate(path)
+    repr_cache.invalidate(path)
+    project_tree.invalidate(path)
+    kind_cache.invalidate(path)
+    entity_index = get_index(path)
+    if not entity_index or not entity_index.is_crawled:
+        return
+    try:
+        if recursive:
+            entity_index.reindex(path)
+        else:
+            entity_index.update(path)
+    except Exception as e:
+        LOGGER.error(f"Failed to update entity index for {path}: {e}")
+
+
+def remove_entity(path):
+    resolve_cache.invalidate(path)
+    repr_cache.invalidate(path)
+    project_tree.invalidate(path)
+    kind_cache.invalidate(path)
+    entity_index = get_index(path)
+    if not entity_index or not entity_index.is_crawled:
+        return
+    try:
+        entity_index.remove(path)
+        if _posix(path) == entity_index.root.as_posix():
+            forget_index(path)
+    except Exception as e:
+        LOGGER.error(f"Failed to update entity index for {path}: {e}")
@@ -0,0 +1,166 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path, PurePath
+
+from ignite.server.constants import ANCHORS
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+MAX_SIZE = int(ENV.get("IGNITE_KIND_CACHE_SIZE", 100000))
+KINDS = {v: k for k, v in ANCHORS.items()}
+MAX_DEPTH = 20
+
+
+def _key(path):
+    return PurePath(path).as_posix().rstrip("/") or "/"
+
+
+class KindCache:
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_anchors(self, path):
+        # Anchors only come and go with directory entries, so the directory
+        # mtime is enough to tell whether a cached listing is still valid.
+        key = _key(path)
+        try:
+            stamp = os.stat(key).st_mtime_ns
+        except OSError:
+            self.invalidate(key)
+            return ()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == stamp:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        try:
+            anchors = tuple(e.name for e in os.scandir(key) if e.name in KINDS)
+        except NotADirectoryError:
+            anchors = ()
+        except OSError as e:
+            LOGGER.error(f"Failed to list {key}: {e}")
+            return ()
+        with self.lock:
+            self.entries[key] = (stamp, anchors)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+        return anchors
+
+    def invalidate(self, path=None, recursive=True):
+        with self.lock:
+            if path is None:
+                self.invalidations += len(self.entries)
+                self.entries.clear()
+                return
+            key = _key(path)
+            dropped = [key] if key in self.entries else []
+            if recursive:
+                prefix = key.rstrip("/") + "/"
+                dropped += [p for p in self.entries if p.startswith(prefix)]
+            for p in dropped:
+                del self.entries[p]
+            self.invalidations += len(dropped)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+            }
+
+
+KIND_CACHE = KindCache()
+
+
+def get_anchors(path):
+    return KIND_CACHE.get_anchors(path)
+
+
+def get_anchor(path):
+    anchors = KIND_CACHE.get_anchors(path)
+    if not anchors:
+        return None
+    return Path(path) / anchors[0]
+
+
+def get_kind(path):
+    anchors = KIND_CACHE.get_anchors(path)
+    return KINDS[anchors[0]] if anchors else ""
+
+
+def is_kind(path, kind):
+    return ANCHORS[kind] in KIND_CACHE.get_anchors(path)
+
+
+def get_ancestor(path, kind, root):
+    # Closest directory at or above path (but below root) of the given kind.
+    anchor = ANCHORS[kind]
+    root = _key(root)
+    parent = Path(path)
+    for _ in range(MAX_DEPTH):
+        if _key(parent) == root or parent == parent.parent:
+            return ""
+        if anchor in KIND_CACHE.get_anchors(parent):
+            return parent
+        parent = parent.parent
+    raise Exception(f"Reached iteration limit when walking directory: {path}")
+
+
+def get_ancestor_anchors(path, root):
+    # Anchor files of every anchored directory between root and path,
+    # closest first, path itself excluded.
+    root = _key(root)
+    parent = Path(path).parent
+    anchors = []
+    for _ in range(MAX_DEPTH):
+        if _key(parent) == root or parent == parent.parent:
+            return anchors
+        anchor = get_anchor(parent)
+        if anchor:
+            anchors.append(anchor)
+        parent = parent.parent
+    raise Exception(f"Reached iteration limit when walking directory: {path}")
+
+
+def invalidate(path=None, recursive=True):
+    KIND_CACHE.invalidate(path, recursive)
+
+
+def on_change(event, path):
+    # Anchors appearing or disappearing change the parent's listing.
+    KIND_CACHE.invalidate(path)
+    KIND_CACHE.invalidate(PurePath(path).parent, recursive=False)
+
+
+def get_stats():
+    return KIND_CACHE.stats()
@@ -13,79 +13,282 @@
 # limitations under the License.
 
 
+import asyncio
 import glob
 import os
 import platform
-import subprocess
+import signal
+import tempfile
+import time
 
 import clique
 from ignite.server.constants import OS_NAMES, TOOLS
 from ignite.logger import get_logger
 
 LOGGER = get_logger(__name__)
+ENV = os.environ
 OS_NAME = OS_NAMES[platform.system()]
+WORKERS = int(ENV.get("IGNITE_MEDIA_WORKERS", os.cpu_count() or 4))
+CHUNK_SIZE = int(ENV.get("IGNITE_MEDIA_CHUNK_SIZE", 20))
+POLL = 0.25
+CAN_STOP = hasattr(signal, "SIGSTOP")
+ENCODE_WIDTH = 1280
+ENCODE_ARGS = ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-crf", "18"]
 
 
-def convert_img(input, output):
+def get_frames(path):
+    padding = path.count("#")
+    head, _, tail = path.partition("#" * padding)
+    files = glob.glob(path.replace("#" * padding, "*"))
+    sequences, _ = clique.assemble(files, minimum_items=1)
+    for seq in sequences:
+        if seq.head == head and seq.tail == tail:
+            return sorted(seq.indexes)
+    return []
+
+
+def get_frame_path(path, frame):
+    padding = path.count("#")
+    return path.replace("#" * padding, str(frame).zfill(padding))
+
+
+def get_chunks(frames, size=CHUNK_SIZE):
+    # Contiguous runs only, so each chunk is a plain --frames range.
+    chunks = []
+    chunk = []
+    for frame in frames:
+        if chunk and (frame != chunk[-1] + 1 or len(chunk) >= size):
+            chunks.append(chunk)
+            chunk = []
+        chunk.append(frame)
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def is_converted(input, output):
+    try:
+        return os.stat(output).st_mtime >= os.stat(input).st_mtime
+    except OSError:
+        return False
+
+
+def discard_frames(output, frames, since):
+    for frame in frames:
+        path = get_frame_path(output, frame)
+        try:
+            if os.stat(path).st_mtime >= since - 1:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+async def report_paused(state, progress_fn, paused):
+    # state["active"] is shared between concurrent commands, so only the
+    # first one to notice reports the change.
+    if not progress_fn:
+        return
+    if paused and state.get("active") != "paused":
+        await progress_fn(state="paused")
+    elif not paused and state.get("active") == "paused":
+        await progress_fn(state="running")
+
+
+async def wait_if_paused(state, progress_fn=None):
+    if not state.get("paused"):
+        return
+    await report_paused(state, progress_fn, True)
+    while state.get("paused") and not state.get("killed"):
+        await asyncio.sleep(POLL)
+    await report_paused(state, progress_fn, False)
+
+
+async def read_lines(stream, on_output):
+    async for line in stream:
+        await on_output(line.decode(errors="replace").strip())
+
+
+async def run_command(cmd, state=None, progress_fn=None, on_output=None):
+    # Returns the exit code. Killing the process kills the subprocess, pausing
+    # stops it where the platform has SIGSTOP.
+    state = state if state is not None else {}
+    LOGGER.debug(" ".join(cmd))
+    stdout = asyncio.subprocess.PIPE if on_output else asyncio.subprocess.DEVNULL
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *cmd, stdout=stdout, stderr=asyncio.subprocess.PIPE
+        )
+    except OSError as e:
+        LOGGER.error(f"Failed to run {cmd[0]}: {e}")
+        return -1
+    errors = asyncio.ensure_future(process.stderr.read())
+    reader = None
+    if on_output:
+        reader = asyncio.ensure_future(read_lines(process.stdout, on_output))
+    waiter = asyncio.ensure_future(process.wait())
+    stopped = False
+    while not waiter.done():
+        if state.get("killed"):
+            process.kill()
+            break
+        if CAN_STOP and bool(state.get("paused")) != stopped:
+            stopped = not stopped
+            process.send_signal(signal.SIGSTOP if stopped else signal.SIGCONT)
+            await report_paused(state, progress_fn, stopped)
+        await asyncio.wait({waiter}, timeout=POLL)
+    await waiter
+    if reader:
+        await reader
+    stderr = await errors
+    if state.get("killed"):
+        return -1
+    if process.returncode:
+        LOGGER.error(f"{cmd[0]} exited with {process.returncode}: {stderr.decode()}")
+    return process.returncode
+
+
+async def convert_images(
+    input,
+    output,
+    state=None,
+    progress_fn=None,
+    workers=WORKERS,
+    chunk_size=CHUNK_SIZE,
+    force=False,
+):
     tool = TOOLS.get("oiiotool").get(OS_NAME)
-    if "#" in input:
-        padding = input.count("#")
-        files = glob.glob(input.replace("#" * padding, "*"))
-        sequences, _ = clique.assemble(files)
-        seq = sequences[0]
-        indexes = list(seq.indexes)
-        range = "{}-{}".format(indexes[0], indexes[-1])
-        # input = input.replace("#" * padding, f"%0{padding}d")
-        # padding = output.count("#")
-        # output = output.replace("#" * padding, f"%0{padding}d")
-        cmd = f"{tool} --frames {range} --framepadding {padding} {input} "
-    else:
-        cmd = f"{tool} {input} "
-    # cmd += f"--colorconvert \"ACES - ACEScg\" \"Output - sRGB\" -o {output}"
-    # cmd += "--autocc "
-    cmd += "--ch R,G,B "
-    cmd += f"-o {output}"
-    LOGGER.debug(cmd)
-    LOGGER.warning(os.environ.get("OCIO"))
-    os.system(cmd)
-    # exit_code = -1
-    # try:
-    #     exit_code = subprocess.check_call(
-    #         cmd.split(),
-    #         # stdout=subprocess.PIPE,
-    #         # stderr=subprocess.STDOUT
-    #     )
-    # except Exception as e:
-    #     print(exit_code, e)
-    # return exit_code
+    state = state if state is not None else {}
+    if "#" not in input:
+        if force or not is_converted(input, output):
+            cmd = [tool, input, "--ch", "R,G,B", "-o", output]
+            if await run_command(cmd, state, progress_fn):
+                return False
+        if progress_fn:
+            await progress_fn(100)
+        return True
+    padding = input.count("#")
+    frames = get_frames(input)
+    if not frames:
+        LOGGER.error(f"Couldn't find any frames for {input}")
+        return False
+    todo = [
+        f
+        for f in frames
+        if force
+        or not is_converted(get_frame_path(input, f), get_frame_path(output, f))
+    ]
+    total = len(frames)
+    done = total - len(todo)
+    if done:
+        LOGGER.debug(f"Skipping {done} already converted frames of {input}")
+    if progress_fn and done:
+        await progress_fn(done / total * 100)
+    semaphore = asyncio.Semaphore(workers)
+    # Each oiiotool gets its share of the cores instead of all of them.
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    input_pattern = input.replace("#" * padding, f"%0{padding}d")
+    output_pattern = output.replace("#" * output.count("#"), f"%0{padding}d")
+    failed = []
 
+    async def convert_chunk(chunk):
+        nonlocal done
+        async with semaphore:
+            await wait_if_paused(state, progress_fn)
+            if state.get("killed"):
+                return
+            cmd = [tool, "--threads", str(threads)]
+            cmd += ["--frames", f"{chunk[0]}-{chunk[-1]}"]
+            cmd += [input_pattern, "--ch", "R,G,B", "-o", output_pattern]
+            started = time.time()
+            if await run_command(cmd, state, progress_fn):
+                # A frame cut off halfway would pass as converted next time.
+                discard_frames(output, chunk, started)
+                if not state.get("killed"):
+                    failed.extend(chunk)
+                return
+            done += len(chunk)
+            if progress_fn:
+                await progress_fn(done / total * 100)
 
-def encode(input, output, fps=25):
-    tool = TOOLS.get("ffmpeg").get(OS_NAME)
+    await asyncio.gather(*(convert_chunk(c) for c in get_chunks(todo, chunk_size)))
+    if state.get("killed"):
+        return False
+    if failed:
+        LOGGER.error(f"Failed to convert {len(failed)} frames of {input}")
+    return not failed
+
+
+def convert_img(input, output):
+    # Blocking wrapper, actions should await convert_images instead.
+    return asyncio.run(convert_images(input, output))
 
-    cmd_frame = ""
-    cmd_fps = ""
 
+def write_concat_list(input, frames, fps):
+    # image2 stops at the first missing frame, the concat demuxer doesn't.
+    fd, path = tempfile.mkstemp(suffix=".ffconcat")
+    with os.fdopen(fd, "w") as f:
+        f.write("ffconcat version 1.0\n")
+        for frame in frames:
+            frame_path = get_frame_path(input, frame).replace("'", "'\\''")
+            f.write(f"file '{frame_path}'\nduration {1 / fps}\n")
+    return path
+
+
+async def encode_sequence(
+    input, output, fps=25, state=None, progress_fn=None, width=ENCODE_WIDTH
+):
+    # EXRs are decoded by ffmpeg itself straight to sRGB and scaled on the
+    # way into the encoder, nothing is written besides the mp4.
+    tool = TOOLS.get("ffmpeg").get(OS_NAME)
+    state = state if state is not None else {}
+    cmd = [tool, "-y", "-hide_banner", "-nostats", "-loglevel", "error"]
+    cmd += ["-progress", "pipe:1"]
+    if input.lower().endswith(".exr"):
+        cmd += ["-apply_trc", "iec61966_2_1"]
+    listing = None
+    total = 0
     if "#" in input:
-        padding = input.count("#")
-        files = glob.glob(input.replace("#" * padding, "*"))
-        sequences, _ = clique.assemble(files)
-        seq = sequences[0]
-        seq_string = seq.format("{head}{padding}{tail}")
-        cmd_frame = "-start_number {} ".format(list(seq.indexes)[0])
-        cmd_fps = f"-r {fps} "
+        frames = get_frames(input)
+        if not frames:
+            LOGGER.error(f"Couldn't find any frames for {input}")
+            return False
+        total = len(frames)
+        if frames[-1] - frames[0] + 1 == total:
+            padding = input.count("#")
+            pattern = input.replace("#" * padding, f"%0{padding}d")
+            cmd += ["-framerate", str(fps), "-start_number", str(frames[0])]
+            cmd += ["-i", pattern]
+        else:
+            LOGGER.warning(f"{input} has missing frames, encoding what's there")
+            listing = write_concat_list(input, frames, fps)
+            cmd += ["-f", "concat", "-safe", "0", "-i", listing]
     else:
-        seq_string = input
-    cmd = f"{tool} {cmd_frame}-i {seq_string} -c:v libx264 {cmd_fps}-vf "
-    cmd += f"scale=1280:-2 {output}"
-    print(cmd)
-    exit_code = -1
+        cmd += ["-i", input]
+    cmd += ["-vf", f"scale={width}:-2", "-r", str(fps)]
+    cmd += ENCODE_ARGS + [output]
+
+    async def on_output(line):
+        key, _, value = line.partition("=")
+        if key != "frame" or not total or not progress_fn:
+            return
+        try:
+            frame = int(value)
+        except ValueError:
+            return
+        # 100 is left to the caller, it means finished.
+        await progress_fn(min(frame / total * 100, 99))
+
     try:
-        exit_code = subprocess.check_call(
-            cmd.split(),
-            # stdout=subprocess.PIPE,
-            # stderr=subprocess.STDOUT
-        )
-    except Exception as e:
-        print(exit_code, e)
-    return exit_code
+        exit_code = await run_command(cmd, state, progress_fn, on_output)
+    finally:
+        if listing:
+            os.remove(listing)
+    if exit_code and os.path.isfile(output):
+        os.remove(output)
+    return exit_code == 0
+
+
+def encode(input, output, fps=25):
+    # Blocking wrapper, actions should await encode_sequence instead.
+    ok = asyncio.run(encode_sequence(input, output, fps))
+    return 0 if ok else -1
@@ -0,0 +1,187 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import base64
+import hashlib
+import json
+import os
+from pathlib import PurePath
+
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+SORT_KEYS = {
+    "name": "name",
+    "version": "version",
+    "modification_ts": "mtime",
+    "creation_ts": "ctime",
+}
+
+
+def sort_results(results, sort):
+    if sort and results:
+        keys = list(results[0].keys())
+        field = sort["field"]
+        reverse = sort.get("reverse", False)
+        if field in keys:
+            results.sort(key=lambda c: c[field], reverse=reverse)
+    return results
+
+
+def make_candidate(path, name=None, version=""):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    path = PurePath(path)
+    return {
+        "path": path.as_posix(),
+        "name": name or path.name,
+        "version": version,
+        "mtime": stat.st_mtime,
+        "ctime": stat.st_ctime,
+    }
+
+
+def make_row_candidate(row, name=None, version=""):
+    # Straight from an entity index row, nothing is stat'ed until the
+    # candidate gets built for a page.
+    return {
+        "path": row["path"],
+        "name": name or row["name"],
+        "version": version,
+        "mtime": row["mtime"],
+        "ctime": row["ctime"],
+        "indexed": True,
+    }
+
+
+def make_candidates(paths):
+    candidates = [make_candidate(path) for path in paths]
+    return [c for c in candidates if c]
+
+
+def sort_candidates(candidates, sort):
+    # Returns False when the sort field is only known after building entities.
+    if not sort or not sort.get("field"):
+        return True
+    key = SORT_KEYS.get(sort["field"])
+    if not key:
+        return False
+    candidates.sort(
+        key=lambda c: (c[key], c["path"]), reverse=sort.get("reverse", False)
+    )
+    return True
+
+
+def make_cursor_key(*args):
+    data = json.dumps(args, sort_keys=True, default=str)
+    return hashlib.md5(data.encode()).hexdigest()[:16]
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return {}
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception as e:
+        LOGGER.warning(f"Ignoring invalid cursor {cursor}: {e}")
+        return {}
+
+
+def paginate(
+    candidates,
+    build,
+    offset=0,
+    limit=20,
+    sort=None,
+    match=None,
+    cursor=None,
+    key="",
+    on_missing=None,
+):
+    # A cursor for this listing says where the previous page stopped, it wins
+    # over the offset.
+    state = decode_cursor(cursor)
+    if state.get("key") != key or "position" not in state:
+        state = {}
+    if state:
+        offset = state.get("matched", 0)
+    missing = []
+
+    def build_existing(candidate):
+        # Index rows can outlive their directory, that's found out here.
+        if candidate.get("indexed") and not os.path.isdir(candidate["path"]):
+            missing.append(candidate["path"])
+            return None
+        return build(candidate)
+
+    if not sort_candidates(candidates, sort):
+        results = [build_existing(c) for c in candidates]
+        results = [d for d in results if d is not None and (not match or match(d))]
+        results = sort_results(results, sort)
+        total = len(results)
+        end = offset + limit
+        next_cursor = None
+        if end < total:
+            next_cursor = encode_cursor({"key": key, "position": end, "matched": end})
+        if missing and on_missing:
+            on_missing(missing)
+        return {
+            "data": results[offset:end],
+            "total": total,
+            "exact": True,
+            "cursor": next_cursor,
+        }
+
+    position = 0
+    matched = 0
+    if state:
+        position = state["position"]
+        matched = offset
+    elif not match:
+        position = matched = offset
+
+    results = []
+    while position < len(candidates) and len(results) < limit:
+        d = build_existing(candidates[position])
+        position += 1
+        if d is None or (match and not match(d)):
+            continue
+        if matched >= offset:
+            results.append(d)
+        matched += 1
+
+    remaining = len(candidates) - position
+    next_cursor = None
+    if remaining > 0:
+        next_cursor = encode_cursor(
+            {"key": key, "position": position, "matched": matched}
+        )
+    if missing and on_missing:
+        on_missing(missing)
+    return {
+        "data": results,
+        # Without filters every candidate is a result, with them the total is
+        # an upper bound until the remaining candidates have been checked.
+        "total": len(candidates) - len(missing) if not match else matched + remaining,
+        "exact": not match or remaining == 0,
+        "cursor": next_cursor,
+    }
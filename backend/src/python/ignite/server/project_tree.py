@@ -0,0 +1,254 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+import time
+from pathlib import PurePath
+
+from ignite.server import anchor_cache
+from ignite.server.constants import ANCHORS
+from ignite.server.utils import CONFIG
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+KINDS = {v: k for k, v in ANCHORS.items()}
+RESERVED_NAMES = (".config", "common")
+SKIPPED_KINDS = ("asset", "assetversion")
+# Seconds a validated tree is trusted for before directories get stat'ed
+# again, changes made through ignite or seen by the watcher skip the wait.
+MAX_AGE = float(ENV.get("IGNITE_TREE_MAX_AGE", 1))
+
+_TREES = {}
+_TREES_LOCK = threading.Lock()
+
+
+def _posix(path):
+    return PurePath(path).as_posix().rstrip("/")
+
+
+def _stamp(path, anchor=None):
+    stamp = os.stat(path).st_mtime_ns
+    if not anchor:
+        return stamp, 0
+    try:
+        return stamp, os.stat(anchor).st_mtime_ns
+    except OSError:
+        return stamp, 0
+
+
+class ProjectTree:
+    def __init__(self, root):
+        self.root = _posix(root)
+        self.entries = {}
+        self.lock = threading.RLock()
+        self.version = 0
+        self.validated = 0
+        self.tree = None
+        self.tree_version = -1
+
+    def __repr__(self):
+        return f"ProjectTree({self.root})"
+
+    def get_id(self, path):
+        if path == self.root:
+            return "root"
+        return PurePath(path).relative_to(self.root).as_posix()
+
+    def get_path(self, node_id):
+        if not node_id or node_id == "root":
+            return self.root
+        rel = PurePath(node_id)
+        if rel.is_absolute() or ".." in rel.parts:
+            return None
+        return _posix(PurePath(self.root) / rel)
+
+    def scan(self, path):
+        entries = list(os.scandir(path))
+        kind = ""
+        anchor = None
+        dirs = []
+        for entry in entries:
+            name = entry.name
+            if name in KINDS:
+                if KINDS[name] not in SKIPPED_KINDS:
+                    kind = KINDS[name]
+                    anchor = entry.path
+                continue
+            if name in RESERVED_NAMES or name.startswith("."):
+                continue
+            if entry.is_dir():
+                dirs.append(name)
+        node = None
+        if kind:
+            task_type = ""
+            if kind == "task":
+                config = anchor_cache.load_anchor(anchor)
+                task_type = config.get("task_type") or ""
+            node = {
+                "id": self.get_id(path),
+                "name": PurePath(path).name,
+                "path": str(PurePath(path)),
+                "dir_kind": kind,
+                "task_type": task_type,
+                "icon": f"{kind}_{task_type}" if task_type else kind,
+            }
+        return {
+            "node": node,
+            "anchor": anchor,
+            "dirs": sorted(dirs),
+            "stamp": _stamp(path, anchor),
+        }
+
+    def refresh(self, path, depth=None):
+        # Rescans directories whose stat changed since they were last seen,
+        # returns whether anything under path had to be rebuilt.
+        entry = self.entries.get(path)
+        try:
+            stamp = _stamp(path, entry["anchor"] if entry else None)
+        except OSError:
+            return self.forget(path)
+        changed = False
+        if not entry or entry["stamp"] != stamp:
+            try:
+                entry = self.scan(path)
+            except Exception as e:
+                LOGGER.error(f"Failed to scan {path}: {e}")
+                return self.forget(path)
+            self.entries[path] = entry
+            changed = True
+        if not entry["node"] or depth == 0:
+            return changed
+        for name in entry["dirs"]:
+            child_depth = None if depth is None else depth - 1
+            changed = self.refresh(f"{path}/{name}", child_depth) or changed
+        return changed
+
+    def forget(self, path):
+        prefix = path + "/"
+        stale = [p for p in self.entries if p == path or p.startswith(prefix)]
+        for p in stale:
+            del self.entries[p]
+        return bool(stale)
+
+    def build(self, path, depth=None):
+        entry = self.entries.get(path)
+        if not entry or not entry["node"]:
+            return None
+        node = dict(entry["node"])
+        children = []
+        for name in entry["dirs"]:
+            if depth == 0:
+                child = self.entries.get(f"{path}/{name}")
+                if child and child["node"]:
+                    node["has_children"] = True
+                    break
+                continue
+            child_depth = None if depth is None else depth - 1
+            child = self.build(f"{path}/{name}", child_depth)
+            if child:
+                children.append(child)
+        if depth != 0:
+            node["children"] = children
+            node["has_children"] = bool(children)
+        else:
+            node.setdefault("has_children", False)
+        return node
+
+    def validate(self):
+        if time.time() - self.validated < MAX_AGE:
+            return
+        if self.refresh(self.root):
+            self.version += 1
+        self.validated = time.time()
+
+    def get_tree(self, known=None):
+        # Returns (version, tree), the tree is None if known is still current.
+        with self.lock:
+            self.validate()
+            if known == self.version:
+                return self.version, None
+            if self.tree_version != self.version:
+                self.tree = self.build(self.root)
+                if self.tree:
+                    set_filter_strings(self.tree, [])
+                self.tree_version = self.version
+            return self.version, self.tree
+
+    def get_children(self, node_id, depth=1):
+        path = self.get_path(node_id)
+        if not path:
+            return None
+        depth = max(1, int(depth))
+        with self.lock:
+            # One level further so the deepest nodes know if they expand.
+            if self.refresh(path, depth + 1):
+                self.version += 1
+            return self.build(path, depth)
+
+    def invalidate(self):
+        self.validated = 0
+
+
+def set_filter_strings(node, ancestors):
+    # Nodes match a search for any of their ancestors or descendants.
+    names = ancestors + [node["name"]]
+    descendants = []
+    for child in node.get("children", []):
+        descendants += set_filter_strings(child, names)
+    node["filter_strings"] = sorted(set(names + descendants))
+    return [node["name"]] + descendants
+
+
+def get_root(path):
+    root = PurePath(os.path.normpath(CONFIG["root"]))
+    path = PurePath(path)
+    if ".." in path.parts:
+        return None
+    try:
+        rel = PurePath(os.path.normpath(path)).relative_to(root)
+    except ValueError:
+        return None
+    if not rel.parts or rel.parts[0] in RESERVED_NAMES:
+        return None
+    return _posix(root / rel.parts[0])
+
+
+def get_project_tree(path):
+    root = get_root(path)
+    if not root:
+        return None
+    with _TREES_LOCK:
+        tree = _TREES.get(root)
+        if not tree:
+            tree = _TREES[root] = ProjectTree(root)
+    return tree
+
+
+def invalidate(path=None):
+    if path is None:
+        with _TREES_LOCK:
+            trees = list(_TREES.values())
+    else:
+        with _TREES_LOCK:
+            trees = [_TREES.get(get_root(path))]
+    for tree in trees:
+        if tree:
+            tree.invalidate()
+
+
+def on_change(event, path):
+    invalidate(path)
@@ -0,0 +1,118 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import PurePath
+
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+MAX_SIZE = int(ENV.get("IGNITE_REPR_CACHE_SIZE", 20000))
+
+
+def _posix(path):
+    return PurePath(path).as_posix().rstrip("/")
+
+
+class ReprCache:
+    # Which component represents a directory depends on its repr, the reprs
+    # it points through and the asset the search lands on, so every entry
+    # keeps all of those as scopes and goes when any of them change.
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, target):
+        with self.lock:
+            entry = self.entries.get(target)
+            if entry:
+                self.entries.move_to_end(target)
+                self.hits += 1
+                return True, _copy(entry[1])
+            self.misses += 1
+        return False, None
+
+    def set(self, target, comp, scopes):
+        scopes = tuple({_posix(s) for s in scopes if s})
+        with self.lock:
+            self.entries[target] = (scopes, _copy(comp))
+            self.entries.move_to_end(target)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.invalidations += len(self.entries)
+                self.entries.clear()
+                return
+            path = _posix(path)
+            dropped = [
+                target
+                for target, (scopes, _) in self.entries.items()
+                if any(
+                    s == path or path.startswith(s + "/") or s.startswith(path + "/")
+                    for s in scopes
+                )
+            ]
+            for target in dropped:
+                del self.entries[target]
+            self.invalidations += len(dropped)
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+            }
+
+
+def _copy(comp):
+    return dict(comp) if isinstance(comp, dict) else comp
+
+
+REPR_CACHE = ReprCache()
+
+
+def lookup(target):
+    return REPR_CACHE.get(target)
+
+
+def store(target, comp, scopes):
+    REPR_CACHE.set(target, comp, scopes)
+
+
+def invalidate(path=None):
+    REPR_CACHE.invalidate(path)
+
+
+def on_change(event, path):
+    REPR_CACHE.invalidate(path)
+
+
+def get_stats():
+    return REPR_CACHE.stats()
@@ -0,0 +1,129 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import PurePath
+
+from ignite.server import utils
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+MAX_SIZE = int(ENV.get("IGNITE_RESOLVE_CACHE_SIZE", 50000))
+
+
+def get_scope(uri):
+    # Everything a URI can resolve to lives under its asset (or the entity
+    # itself when unversioned), changes there are what invalidate it.
+    uri = str(uri).split("@", 1)[0].split("#", 1)[0]
+    path = utils.uri_to_path(uri) if utils.is_uri(uri) else uri
+    return PurePath(path).as_posix() if path else ""
+
+
+class ResolveCache:
+    def __init__(self, max_size=MAX_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.scopes = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, uri):
+        with self.lock:
+            if uri in self.entries:
+                self.entries.move_to_end(uri)
+                self.hits += 1
+                return True, self.entries[uri][1]
+            self.misses += 1
+        return False, None
+
+    def set(self, uri, path):
+        scope = get_scope(uri)
+        with self.lock:
+            self._pop(uri)
+            self.entries[uri] = (scope, path)
+            self.scopes.setdefault(scope, set()).add(uri)
+            while len(self.entries) > self.max_size:
+                self._pop(next(iter(self.entries)))
+
+    def _pop(self, uri):
+        entry = self.entries.pop(uri, None)
+        if not entry:
+            return
+        uris = self.scopes.get(entry[0])
+        if uris:
+            uris.discard(uri)
+            if not uris:
+                del self.scopes[entry[0]]
+
+    def invalidate(self, path=None):
+        with self.lock:
+            if path is None:
+                self.entries.clear()
+                self.scopes.clear()
+                return
+            path = PurePath(path).as_posix().rstrip("/")
+            # A change inside an asset, to the asset itself or to anything
+            # above it can all change what its URIs resolve to.
+            dropped = [
+                scope
+                for scope in self.scopes
+                if scope == path
+                or path.startswith(scope + "/")
+                or scope.startswith(path + "/")
+            ]
+            for scope in dropped:
+                for uri in list(self.scopes.get(scope, ())):
+                    self._pop(uri)
+                    self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+            }
+
+
+RESOLVE_CACHE = ResolveCache()
+
+
+def lookup(uri):
+    return RESOLVE_CACHE.get(uri)
+
+
+def store(uri, path):
+    RESOLVE_CACHE.set(uri, path)
+
+
+def invalidate(path=None):
+    RESOLVE_CACHE.invalidate(path)
+
+
+def on_change(event, path):
+    RESOLVE_CACHE.invalidate(path)
+
+
+def get_stats():
+    return RESOLVE_CACHE.stats()
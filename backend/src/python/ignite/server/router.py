@@ -13,23 +13,37 @@
 # limitations under the License.
 
 
+import asyncio
 import logging
 import math
 import os
 
-from fastapi import APIRouter, Request, WebSocket
-from fastapi.responses import PlainTextResponse
-
-from ignite.server import api, utils
+from fastapi import APIRouter, Request, Response, WebSocket
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from ignite import dispatch
+from ignite.server import (
+    anchor_cache,
+    api,
+    change_feed,
+    kind_cache,
+    repr_cache,
+    resolve_cache,
+    thumbnails,
+    utils,
+    vault_store,
+)
 from ignite.vault import api as vault_api
 from ignite.server.socket_manager import SocketManager
 from ignite.server.utils import CONFIG
+from ignite.server.watcher import WATCHER
 from ignite.logger import get_logger
 from ignite.utils import error, mount_root, log_request, process_request
 
 
 LOGGER = get_logger(__name__)
 ASSET_UPDATES_MANAGER = SocketManager()
+change_feed.attach(ASSET_UPDATES_MANAGER)
 ENV = os.environ
 
 
@@ -50,9 +64,10 @@ async def set_projects_root(request: Request):
     result = await request.json()
     log_request(result)
     path = result.get("path")
-    ok = utils.set_projects_root(path)
+    ok = await dispatch.run(utils.set_projects_root, path)
     if ok:
         mount_root(router, CONFIG)
+        await dispatch.run(WATCHER.restart)
     return {"ok": ok}
 
 
@@ -62,12 +77,96 @@ async def get_vault_path():
     return {"ok": True, "data": data}
 
 
+@router.get("/get_anchor_cache_stats")
+async def get_anchor_cache_stats():
+    data = anchor_cache.get_stats()
+    return {"ok": True, "data": data}
+
+
+@router.get("/get_socket_stats")
+async def get_socket_stats():
+    data = ASSET_UPDATES_MANAGER.stats()
+    return {"ok": True, "data": data}
+
+
+@router.get("/get_change_feed_stats")
+async def get_change_feed_stats():
+    data = change_feed.get_stats()
+    return {"ok": True, "data": data}
+
+
+@router.get("/get_repr_cache_stats")
+async def get_repr_cache_stats():
+    data = repr_cache.get_stats()
+    return {"ok": True, "data": data}
+
+
+@router.get("/get_thumbnail_stats")
+async def get_thumbnail_stats():
+    data = thumbnails.get_stats()
+    return {"ok": True, "data": data}
+
+
+@router.get("/thumbnail")
+async def get_thumbnail(request: Request):
+    # Same paths as the /files mount, relative to the projects root.
+    path = request.query_params.get("path")
+    size = request.query_params.get("size", thumbnails.DEFAULT_SIZE)
+    if not path:
+        return PlainTextResponse("invalid_data", status_code=400)
+    root = os.path.realpath(CONFIG["root"])
+    path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath((root, path)) != root:
+        return PlainTextResponse("forbidden", status_code=403)
+    data = await asyncio.wrap_future(thumbnails.request(path, size))
+    if not data:
+        return PlainTextResponse("not_found", status_code=404)
+    etag = f'"{data["etag"]}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={thumbnails.MAX_AGE}",
+    }
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(data["path"], media_type=data["media_type"], headers=headers)
+
+
+@router.get("/get_kind_cache_stats")
+async def get_kind_cache_stats():
+    data = kind_cache.get_stats()
+    return {"ok": True, "data": data}
+
+
+@router.get("/get_dispatch_stats")
+async def get_dispatch_stats():
+    data = dispatch.get_stats()
+    return {"ok": True, "data": data}
+
+
+@router.post("/set_dispatch_workers")
+async def set_dispatch_workers(request: Request):
+    result = await request.json()
+    log_request(result)
+    pool = result.get("pool")
+    workers = result.get("workers")
+    if not pool or not workers:
+        return error("invalid_data")
+    ok = dispatch.configure(pool, workers)
+    return {"ok": ok}
+
+
+@router.get("/get_resolve_cache_stats")
+async def get_resolve_cache_stats():
+    data = resolve_cache.get_stats()
+    return {"ok": True, "data": data}
+
+
 @router.post("/get_context_info")
 async def get_context_info(request: Request):
     result = await request.json()
     log_request(result)
     path = result.get("path")
-    data = api.get_context_info(path)
+    data = await dispatch.run(api.get_context_info, path)
     if not data:
         return error("entity_not_found")
     print("Result:", data)
@@ -76,7 +175,7 @@ async def get_context_info(request: Request):
 
 @router.get("/get_projects")
 async def get_projects():
-    data = api.get_projects()
+    data = await dispatch.run(api.get_projects)
     for i, d in enumerate(data):
         d["result_id"] = i
     return {"ok": True, "data": data}
@@ -84,7 +183,7 @@ async def get_projects():
 
 @router.get("/get_project_names")
 async def get_project_names():
-    data = api.get_project_names()
+    data = await dispatch.run(api.get_project_names)
     return {"ok": True, "data": data}
 
 
@@ -92,10 +191,60 @@ async def get_project_names():
 async def get_project_tree(request: Request):
     result = await request.json()
     log_request(result)
-    project = api.get_project(result.get("project"))
+    project = await dispatch.run(api.get_project, result.get("project"))
     if not project:
         return error("entity_not_found")
-    data = project.get_project_tree() or {}
+    version = result.get("version")
+    current, data = await dispatch.run(project.get_project_tree, version)
+    if version is not None and version == current:
+        return {"ok": True, "data": None, "version": current, "unchanged": True}
+    return {"ok": True, "data": data or {}, "version": current}
+
+
+@router.post("/get_tree_children")
+async def get_tree_children(request: Request):
+    result = await request.json()
+    log_request(result)
+    project = await dispatch.run(api.get_project, result.get("project"))
+    if not project:
+        return error("entity_not_found")
+    node_id = result.get("id") or "root"
+    depth = result.get("depth", 1)
+    if not isinstance(depth, int) or depth < 1:
+        return error("invalid_data")
+    data = await dispatch.run(project.get_tree_children, node_id, depth)
+    if not data:
+        return error("entity_not_found")
+    return {"ok": True, "data": data, "version": project.get_tree_version()}
+
+
+@router.post("/reindex")
+async def reindex(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    if not path:
+        project = result.get("project")
+        if not project:
+            return error("invalid_data")
+        path = CONFIG["root"] / project
+    amount = await dispatch.run_io(api.reindex, path)
+    return {"ok": True, "data": amount}
+
+
+@router.post("/search")
+async def search(request: Request):
+    result = await request.json()
+    log_request(result)
+    query = result.get("query", "")
+    if not query.strip():
+        return {"ok": True, "data": []}
+    projects = result.get("projects")
+    kinds = result.get("kinds")
+    limit = result.get("limit", 100)
+    data = await dispatch.run(
+        api.search, query, projects=projects, kinds=kinds, limit=limit
+    )
     return {"ok": True, "data": data}
 
 
@@ -104,7 +253,7 @@ async def create_project(request: Request):
     result = await request.json()
     log_request(result)
     name = result.get("name")
-    ok, msg = api.create_project(name)
+    ok, msg = await dispatch.run(api.create_project, name)
     if not ok:
         return error("generic_error", msg)
     return {"ok": True}
@@ -116,10 +265,7 @@ async def find(request: Request):
     log_request(result)
     result = process_request(result)
     path = result.get("path", "")
-    entity = api.find(path)
-    data = {}
-    if hasattr(entity, "as_dict"):
-        data = entity.as_dict()
+    data = await dispatch.run(api.find_as_dict, path)
     if not data:
         return error("entity_not_found")
     return {"ok": True, "data": data}
@@ -130,15 +276,10 @@ async def find_multiple(request: Request):
     result = await request.json()
     log_request(result)
     result = process_request(result)
-    data = result.get(data)
-    if type(data) == "list":
-        entities = [api.find(path) for path in data]
-        data = [entity.as_dict() for entity in entities if hasattr(entity, "as_dict")]
-    elif type(data) == "dict":
-        entities = {path: api.find(path) for path in data.keys()}
-        data = {
-            k: entity.as_dict() for k, entity in entities if hasattr(entity, "as_dict")
-        }
+    data = result.get("data")
+    if not isinstance(data, (list, dict)):
+        return error("invalid_data")
+    data = await dispatch.run(api.find_multiple, list(data))
     return {"ok": True, "data": data}
 
 
@@ -148,10 +289,21 @@ async def resolve(request: Request):
     result = await request.json()
     log_request(result)
     uri = result.get("uri")
-    data = api.resolve(uri)
+    data = await dispatch.run(api.resolve, uri)
     return data
 
 
+@router.post("/resolve_batch")
+async def resolve_batch(request: Request):
+    result = await request.json()
+    log_request(result)
+    uris = result.get("uris")
+    if not isinstance(uris, list):
+        return error("invalid_data")
+    data = await dispatch.run(api.resolve_batch, uris)
+    return {"ok": True, "data": data}
+
+
 @router.post("/create_dirs")
 async def create_dirs(request: Request):
     result = await request.json()
@@ -160,7 +312,7 @@ async def create_dirs(request: Request):
     method = result.get("method")
     dir_kind = result.get("kind")
     dirs = result.get("dirs", [])
-    created_amount = api.create_dirs(path, method, dirs)
+    created_amount = await dispatch.run_io(api.create_dirs, path, method, dirs)
     if not created_amount:
         return error("generic_error")
     s = "s" if created_amount > 1 else ""
@@ -171,37 +323,59 @@ async def create_dirs(request: Request):
     return {"ok": True, "text": text}
 
 
+def get_fields(result):
+    # Free text filtering matches against every value so needs them all.
+    if result.get("query", {}).get("filter_string"):
+        return None
+    return result.get("fields")
+
+
+def get_page(result):
+    limit = int(result.get("limit", 20))
+    page = int(result.get("page", 1))
+    query = result.get("query", {})
+    return {
+        "offset": (page - 1) * limit,
+        "limit": limit,
+        "cursor": result.get("cursor"),
+        "filter_string": query.get("filter_string", ""),
+    }
+
+
+def paged_response(result, data):
+    limit = int(result.get("limit", 20))
+    total = data["total"]
+    for i, d in enumerate(data["data"]):
+        d["result_id"] = i
+    return {
+        "ok": True,
+        "pages": {
+            "total": int(math.ceil(total / limit)),
+            "current": int(result.get("page", 1)),
+            "results": total,
+            "exact": data["exact"],
+        },
+        "result_amount": total,
+        "cursor": data["cursor"],
+        "data": data["data"],
+    }
+
+
 @router.post("/get_contents")
 async def get_contents(request: Request):
     result = await request.json()
     log_request(result)
     query = result.get("query", {})
-    data = api.get_contents(
+    data = await dispatch.run(
+        api.get_contents,
         result.get("path", ""),
         latest=query.get("latest", 0),
         sort=query.get("sort"),
         as_dict=True,
+        fields=get_fields(result),
+        **get_page(result),
     )
-    data = utils.query_filter(data, query)
-    limit = int(result.get("limit", 20))
-    total = len(data)
-    print(f"{total} results")
-    pages = int(math.ceil(total / limit))
-    page = result.get("page", 1)
-    start = (page - 1) * limit
-    end = start + limit
-    to_return = data[start:end]
-    for i, d in enumerate(to_return):
-        d["result_id"] = i
-    return {
-        "ok": True,
-        "pages": {
-            "total": pages,
-            "current": page,
-        },
-        "result_amount": total,
-        "data": to_return,
-    }
+    return paged_response(result, data)
 
 
 @router.post("/get_tasks")
@@ -209,26 +383,15 @@ async def get_tasks(request: Request):
     result = await request.json()
     log_request(result)
     query = result.get("query", {})
-    data = api.discover_tasks(result.get("path"), sort=query.get("sort"), as_dict=True)
-    data = utils.query_filter(data, query)
-    limit = result.get("limit", 20)
-    total = len(data)
-    pages = int(math.ceil(total / limit))
-    page = result.get("page", 1)
-    start = (page - 1) * limit
-    end = start + limit
-    to_return = data[start:end]
-    for i, d in enumerate(to_return):
-        d["result_id"] = i
-    return {
-        "ok": True,
-        "pages": {
-            "total": pages,
-            "current": page,
-        },
-        "result_amount": total,
-        "data": to_return,
-    }
+    data = await dispatch.run(
+        api.discover_tasks,
+        result.get("path"),
+        sort=query.get("sort"),
+        as_dict=True,
+        fields=get_fields(result),
+        **get_page(result),
+    )
+    return paged_response(result, data)
 
 
 @router.post("/get_assets")
@@ -236,29 +399,16 @@ async def get_assets(request: Request):
     result = await request.json()
     log_request(result)
     query = result.get("query", {})
-    data = api.discover_assets(
+    data = await dispatch.run(
+        api.discover_assets,
         result.get("path"),
-        # latest=query.get("latest", 0),
         sort=query.get("sort"),
-        filters=query.get("filters"),
+        filters=query.get("filters") or {},
         as_dict=True,
+        fields=get_fields(result),
+        **get_page(result),
     )
-    data = utils.query_filter(data, query)
-    limit = result.get("limit", 20)
-    total = len(data)
-    pages = int(math.ceil(total / limit))
-    page = result.get("page", 1)
-    start = (page - 1) * limit
-    end = start + limit
-    to_return = data[start:end]
-    for i, d in enumerate(to_return):
-        d["result_id"] = i
-    return {
-        "ok": True,
-        "pages": {"total": pages, "current": page, "results": total},
-        "result_amount": total,
-        "data": to_return,
-    }
+    return paged_response(result, data)
 
 
 @router.post("/get_assetversion")
@@ -266,7 +416,7 @@ async def get_assetversion(request: Request):
     result = await request.json()
     log_request(result)
     path = result.get("path")
-    data = api.get_assetversion(path)
+    data = await dispatch.run(api.get_assetversion, path)
     if not data:
         return error("entity_not_found")
     return {"ok": True, "data": data}
@@ -277,29 +427,17 @@ async def get_assetversions(request: Request):
     result = await request.json()
     log_request(result)
     query = result.get("query", {})
-    data = api.discover_assetversions(
+    data = await dispatch.run(
+        api.discover_assetversions,
         result.get("path"),
         latest=query.get("latest", 0),
         sort=query.get("sort"),
         as_dict=True,
-        filters=query.get("filters", {}),
+        filters=query.get("filters") or {},
+        fields=get_fields(result),
+        **get_page(result),
     )
-    data = utils.query_filter(data, query)
-    limit = result.get("limit", 20)
-    total = len(data)
-    pages = int(math.ceil(total / limit))
-    page = result.get("page", 1)
-    start = (page - 1) * limit
-    end = start + limit
-    to_return = data[start:end]
-    for i, d in enumerate(to_return):
-        d["result_id"] = i
-    return {
-        "ok": True,
-        "pages": {"total": pages, "current": page, "results": total},
-        "result_amount": total,
-        "data": to_return,
-    }
+    return paged_response(result, data)
 
 
 @router.post("/get_scenes")
@@ -307,28 +445,16 @@ async def get_scenes(request: Request):
     result = await request.json()
     log_request(result)
     query = result.get("query", {})
-    data = api.discover_scenes(
+    data = await dispatch.run(
+        api.discover_scenes,
         result.get("path"),
         latest=query.get("latest", 0),
         sort=query.get("sort"),
         as_dict=True,
+        fields=get_fields(result),
+        **get_page(result),
     )
-    data = utils.query_filter(data, query)
-    limit = result.get("limit", 20)
-    total = len(data)
-    pages = int(math.ceil(total / limit))
-    page = result.get("page", 1)
-    start = (page - 1) * limit
-    end = start + limit
-    to_return = data[start:end]
-    for i, d in enumerate(to_return):
-        d["result_id"] = i
-    return {
-        "ok": True,
-        "pages": {"total": pages, "current": page, "results": total},
-        "result_amount": total,
-        "data": to_return,
-    }
+    return paged_response(result, data)
 
 
 @router.post("/copy_default_scene")
@@ -337,7 +463,7 @@ async def copy_default_scene(request: Request):
     log_request(result)
     task = result.get("task", "")
     dcc = result.get("dcc", "")
-    scene = api.copy_default_scene(task, dcc)
+    scene = await dispatch.run_io(api.copy_default_scene, task, dcc)
     if not scene:
         return error("generic_error")
     return {"ok": True, "scene": scene}
@@ -351,7 +477,7 @@ async def register_directory(request: Request):
     path = result.get("path", "")
     dir_kind = result.get("dir_kind", "")
     tags = result.get("tags")
-    ok = api.register_directory(path, dir_kind, tags)
+    ok = await dispatch.run(api.register_directory, path, dir_kind, tags)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -365,7 +491,7 @@ async def register_task(request: Request):
     path = result.get("path", "")
     task_type = result.get("task_type", "")
     tags = result.get("tags")
-    ok = api.register_task(path, task_type, tags)
+    ok = await dispatch.run(api.register_task, path, task_type, tags)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -377,7 +503,7 @@ async def register_scene(request: Request):
     log_request(result)
     result = process_request(result)
     path = result.get("path", "")
-    ok = api.register_scene(path)
+    ok = await dispatch.run(api.register_scene, path)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -390,7 +516,7 @@ async def register_asset(request: Request):
     result = process_request(result)
     path = result.get("path", "")
     tags = result.get("tags")
-    ok = api.register_asset(path, tags)
+    ok = await dispatch.run(api.register_asset, path, tags)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -402,7 +528,7 @@ async def set_repr(request: Request):
     log_request(result)
     target = result.get("target", "")
     repr = result.get("repr", "")
-    ok = api.set_repr(target, repr)
+    ok = await dispatch.run(api.set_repr, target, repr)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -413,7 +539,7 @@ async def set_repr_for_project(request: Request):
     result = await request.json()
     log_request(result)
     repr = result.get("repr", "")
-    ok, target = api.set_repr_for_project(repr)
+    ok, target = await dispatch.run(api.set_repr_for_project, repr)
     return {"ok": ok, "data": target}
 
 
@@ -422,7 +548,7 @@ async def set_repr_for_parent(request: Request):
     result = await request.json()
     log_request(result)
     repr = result.get("repr", "")
-    ok, target = api.set_repr_for_parent(repr)
+    ok, target = await dispatch.run(api.set_repr_for_parent, repr)
     return {"ok": ok, "data": target}
 
 
@@ -433,7 +559,7 @@ async def register_assetversion(request: Request):
     result = process_request(result)
     path = result.get("path", "")
     tags = result.get("tags")
-    ok = api.register_assetversion(path, tags)
+    ok = await dispatch.run(api.register_assetversion, path, tags)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -445,7 +571,7 @@ async def delete_entity(request: Request):
     log_request(result)
     path = result.get("path", "")
     entity = result.get("kind", "")
-    ok = api.delete_entity(path, entity)
+    ok = await dispatch.run_io(api.delete_entity, path, entity)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -460,7 +586,7 @@ async def rename_entity(request: Request):
     new_name = result.get("name")
     if not new_name:
         return error("invalid_data")
-    ok, msg = api.rename_entity(path, entity, new_name)
+    ok, msg = await dispatch.run_io(api.rename_entity, path, entity, new_name)
     if not ok:
         return error("invalid_data", msg)
     return {"ok": ok}
@@ -475,7 +601,7 @@ async def change_task_type(request: Request):
     new_name = result.get("name")
     if not new_task_type:
         return error("invalid_data")
-    ok, msg = api.change_task_type(path, new_task_type, new_name)
+    ok, msg = await dispatch.run_io(api.change_task_type, path, new_task_type, new_name)
     if not ok:
         return error("invalid_data", msg)
     return {"ok": ok}
@@ -489,7 +615,7 @@ async def set_tags(request: Request):
     tags = result.get("tags", [])
     if not path or not tags:
         return error("invalid_data")
-    ok = api.set_tags(path, tags)
+    ok = await dispatch.run(api.set_tags, path, tags)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -503,7 +629,7 @@ async def add_tags(request: Request):
     tags = result.get("tags", [])
     if not path or not tags:
         return error("invalid_data")
-    ok = api.add_tags(path, tags)
+    ok = await dispatch.run(api.add_tags, path, tags)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -518,7 +644,7 @@ async def remove_tags(request: Request):
     all = result.get("all")
     if not path or not (tags or all):
         return error("invalid_data")
-    ok = api.remove_tags(path, tags=tags, all=all)
+    ok = await dispatch.run(api.remove_tags, path, tags=tags, all=all)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -532,7 +658,7 @@ async def set_attributes(request: Request):
     attributes = result.get("attributes", [])
     if not path or not attributes:
         return error("invalid_data")
-    ok = api.set_attributes(path, attributes)
+    ok = await dispatch.run(api.set_attributes, path, attributes)
     if not ok:
         return error("generic_error")
     return {"ok": ok}
@@ -542,6 +668,7 @@ async def set_attributes(request: Request):
 async def asset_updates(websocket: WebSocket, session_id: str):
     if session_id:
         await ASSET_UPDATES_MANAGER.connect(websocket, session_id)
+        change_feed.start()
     while True:
         try:
             received = await websocket.receive_json()
@@ -549,11 +676,26 @@ async def asset_updates(websocket: WebSocket, session_id: str):
         except Exception as e:
             print("error:", e)
             break
+        if not session_id or not isinstance(received, dict):
+            continue
+        # {"subscribe": [path or uri, ...]}, an empty list means everything.
+        if "subscribe" in received:
+            prefixes = change_feed.subscribe(session_id, received["subscribe"])
+        elif "unsubscribe" in received:
+            prefixes = change_feed.unsubscribe(session_id, received["unsubscribe"])
+        else:
+            continue
+        data = {"type": "subscribed", "data": prefixes}
+        ASSET_UPDATES_MANAGER.send(session_id, data)
+    # A reconnect under the same session replaces this socket, leave it be.
+    if session_id and ASSET_UPDATES_MANAGER.get(session_id) is websocket:
+        change_feed.unsubscribe(session_id)
+        ASSET_UPDATES_MANAGER.disconnect(websocket, session_id)
 
 
 @router.get("/get_filter_templates")
 async def get_filters():
-    data = vault_api.get_filter_templates()
+    data = await dispatch.run(vault_api.get_filter_templates)
     return {"ok": True, "data": data}
 
 
@@ -565,7 +707,7 @@ async def add_filter(request: Request):
     data = result.get("data", {})
     if not name or not data:
         return {"ok": False}
-    data = vault_api.add_filter_template(data, name)
+    data = await dispatch.run(vault_api.add_filter_template, data, name)
     return {"ok": True, "data": data}
 
 
@@ -574,7 +716,7 @@ async def remove_filter(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.remove_filter_template(data)
+    data = await dispatch.run(vault_api.remove_filter_template, data)
     return {"ok": True, "data": data}
 
 
@@ -583,7 +725,7 @@ async def rename_collection(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.rename_collection(data)
+    data = await dispatch.run(vault_api.rename_collection, data)
     return {"ok": True, "data": data}
 
 
@@ -592,7 +734,7 @@ async def edit_collection(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.edit_collection(data)
+    data = await dispatch.run(vault_api.edit_collection, data)
     return {"ok": True, "data": data}
 
 
@@ -601,13 +743,13 @@ async def write_collections(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.write_collections(data)
+    data = await dispatch.run(vault_api.write_collections, data)
     return {"ok": True, "data": data}
 
 
 @router.get("/get_filter_templates")
 async def get_filter_templates():
-    data = vault_api.get_filter_templates()
+    data = await dispatch.run(vault_api.get_filter_templates)
     return {"ok": True, "data": data}
 
 
@@ -620,7 +762,7 @@ async def add_rule_template(request: Request):
     if not name or not data:
         LOGGER.error(f"name {name} data {data}")
         return {"ok": False}
-    data = vault_api.add_rule_template(data, name)
+    data = await dispatch.run(vault_api.add_rule_template, data, name)
     return {"ok": True, "data": data}
 
 
@@ -629,7 +771,7 @@ async def remove_rule_template(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.remove_rule_template(data)
+    data = await dispatch.run(vault_api.remove_rule_template, data)
     return {"ok": True, "data": data}
 
 
@@ -638,7 +780,7 @@ async def get_collections(request: Request):
     result = await request.json()
     log_request(result)
     user = result.get("user")
-    data = vault_api.get_collections(user, "all")
+    data = await dispatch.run(vault_api.get_collections, user, "all")
     return {"ok": True, "data": data}
 
 
@@ -647,7 +789,7 @@ async def create_collection(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.create_collection(data)
+    data = await dispatch.run(vault_api.create_collection, data)
     return {"ok": True, "data": data}
 
 
@@ -656,7 +798,7 @@ async def delete_collection(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = vault_api.delete_collection(data)
+    data = await dispatch.run(vault_api.delete_collection, data)
     return {"ok": True, "data": data}
 
 
@@ -665,13 +807,13 @@ async def reorder_collection(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data")
-    ok = vault_api.reorder_collection(data)
+    ok = await dispatch.run(vault_api.reorder_collection, data)
     return {"ok": ok}
 
 
 @router.get("/get_rule_templates")
 async def get_rule_templates():
-    data = api.get_rule_templates()
+    data = await dispatch.run(api.get_rule_templates)
     return {"ok": True, "data": data}
 
 
@@ -684,7 +826,7 @@ async def add_rule_template(request: Request):
     if not name or not data:
         logging.error(f"name {name} data {data}")
         return {"ok": False}
-    data = api.add_rule_template(data, name)
+    data = await dispatch.run(api.add_rule_template, data, name)
     return {"ok": True, "data": data}
 
 
@@ -693,13 +835,36 @@ async def remove_rule_template(request: Request):
     result = await request.json()
     log_request(result)
     data = result.get("data", {})
-    data = api.remove_rule_template(data)
+    data = await dispatch.run(api.remove_rule_template, data)
     return {"ok": True, "data": data}
 
 
 @router.get("/get_vault_asset_names")
 async def get_vault_asset_names():
-    data = api.get_vault_asset_names()
+    data = await dispatch.run(api.get_vault_asset_names)
+    return {"ok": True, "data": data}
+
+
+@router.get("/get_vault_store_stats")
+async def get_vault_store_stats():
+    data = await dispatch.run_io(vault_store.get_stats)
+    return {"ok": True, "data": data}
+
+
+@router.post("/vault_store_gc")
+async def vault_store_gc(request: Request):
+    result = await request.json()
+    log_request(result)
+    data = await dispatch.run_io(vault_store.gc)
+    return {"ok": True, "data": data}
+
+
+@router.post("/vault_store_dedupe")
+async def vault_store_dedupe(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    data = await dispatch.run_io(vault_store.dedupe, path)
     return {"ok": True, "data": data}
 
 
@@ -711,7 +876,7 @@ async def vault_import(request: Request):
     name = result.get("name")
     if not path or not name:
         return error("invalid_data")
-    ok = api.vault_import(path, name)
+    ok = await dispatch.run_io(api.vault_import, path, name)
     return {"ok": ok}
 
 
@@ -724,7 +889,48 @@ async def vault_export(request: Request):
     name = result.get("name")
     if not path or not task or not name:
         return error("invalid_data")
-    ok = api.vault_export(path, task, name)
+    ok = await dispatch.run_io(api.vault_export, path, task, name)
+    return {"ok": ok}
+
+
+@router.post("/prepare_vault_import")
+async def prepare_vault_import(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    name = result.get("name")
+    if not path or not name:
+        return error("invalid_data")
+    data = await dispatch.run_io(api.prepare_vault_import, path, name)
+    if not data:
+        return error("generic_error")
+    return {"ok": True, "data": data}
+
+
+@router.post("/prepare_vault_export")
+async def prepare_vault_export(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    task = result.get("task")
+    name = result.get("name")
+    if not path or not task or not name:
+        return error("invalid_data")
+    data = await dispatch.run_io(api.prepare_vault_export, path, task, name)
+    if not data:
+        return error("generic_error")
+    return {"ok": True, "data": data}
+
+
+@router.post("/update_entity")
+async def update_entity(request: Request):
+    result = await request.json()
+    log_request(result)
+    path = result.get("path")
+    if not path:
+        return error("invalid_data")
+    recursive = bool(result.get("recursive"))
+    ok = await dispatch.run_io(api.update_entity, path, recursive)
     return {"ok": ok}
 
 
@@ -734,7 +940,7 @@ async def set_scene_comment(request: Request):
     log_request(result)
     path = result.get("path")
     comment = result.get("comment")
-    ok = api.set_scene_comment(path, comment)
+    ok = await dispatch.run(api.set_scene_comment, path, comment)
     return {"ok": ok}
 
 
@@ -744,5 +950,5 @@ async def set_directory_protected(request: Request):
     log_request(result)
     path = result.get("path")
     protected = result.get("protected")
-    ok = api.set_directory_protected(path, protected)
+    ok = await dispatch.run(api.set_directory_protected, path, protected)
     return {"ok": ok}
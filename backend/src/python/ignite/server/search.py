@@ -0,0 +1,173 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import json
+import os
+import re
+from pathlib import PurePath
+
+from ignite.server import anchor_cache
+from ignite.server.constants import ANCHORS
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+GRAM_SIZE = 3
+CONTAINER_NAMES = ("exports", "scenes")
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS search (
+        path TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        name TEXT NOT NULL,
+        context TEXT NOT NULL DEFAULT '',
+        tags TEXT NOT NULL DEFAULT '[]',
+        text TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS search_grams (
+        gram TEXT NOT NULL,
+        path TEXT NOT NULL,
+        PRIMARY KEY (gram, path)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS search_grams_path ON search_grams (path)",
+)
+
+
+def get_grams(text):
+    text = text.lower()
+    return {text[i : i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def get_terms(query):
+    return [term for term in query.lower().split() if term]
+
+
+def get_component_names(names):
+    # Frames of a sequence all collapse to the component name.
+    components = set()
+    for name in names:
+        if name.startswith(".") or ".temp." in name:
+            continue
+        stem = PurePath(name).stem
+        components.add(re.sub(r"\.#+$|\.\d+$", "", stem))
+    return sorted(components)
+
+
+def get_tags(path, kind):
+    path = PurePath(path)
+    if kind == "asset":
+        anchor = path / ANCHORS["asset"]
+    elif kind == "assetversion":
+        anchor = path.parent / ANCHORS["asset"]
+    else:
+        return []
+    try:
+        config = anchor_cache.load_anchor(anchor)
+    except FileNotFoundError:
+        return []
+    except Exception as e:
+        LOGGER.error(f"Failed to read tags from {anchor}: {e}")
+        return []
+    tags = config.get("tags") or {}
+    if kind == "assetversion":
+        return sorted(tags.get(path.name) or [])
+    return sorted({tag for version_tags in tags.values() for tag in version_tags or []})
+
+
+def make_document(root, path, kind, names=None):
+    path = PurePath(path)
+    parts = path.relative_to(root).parts
+    task_parts = parts[:-1]
+    for i, part in enumerate(parts):
+        if part in CONTAINER_NAMES:
+            task_parts = parts[:i]
+            break
+    context = "/".join(task_parts)
+    task = task_parts[-1] if task_parts else ""
+    tags = get_tags(path, kind)
+    components = []
+    if kind == "assetversion":
+        if names is None:
+            try:
+                names = [entry.name for entry in os.scandir(path) if entry.is_file()]
+            except OSError:
+                names = []
+        components = get_component_names(names)
+    words = [PurePath(root).name, context, task, path.name]
+    if kind == "assetversion":
+        words.append(path.parent.name)
+    words += tags + components
+    return (
+        path.as_posix(),
+        kind,
+        path.name,
+        context,
+        json.dumps(tags),
+        " ".join(w for w in words if w).lower(),
+    )
+
+
+def insert(conn, docs):
+    conn.executemany("INSERT OR REPLACE INTO search VALUES (?, ?, ?, ?, ?, ?)", docs)
+    for doc in docs:
+        conn.execute("DELETE FROM search_grams WHERE path = ?", (doc[0],))
+        conn.executemany(
+            "INSERT OR IGNORE INTO search_grams VALUES (?, ?)",
+            [(gram, doc[0]) for gram in get_grams(doc[5])],
+        )
+
+
+def query(conn, text, kinds=None, limit=100):
+    terms = get_terms(text)
+    if not terms:
+        return []
+    grams = set()
+    for term in terms:
+        grams |= get_grams(term)
+    if grams:
+        sql = (
+            "SELECT * FROM search WHERE path IN ("
+            "SELECT path FROM search_grams "
+            f"WHERE gram IN ({', '.join('?' * len(grams))}) "
+            "GROUP BY path HAVING COUNT(*) = ?)"
+        )
+        params = list(grams) + [len(grams)]
+    else:
+        # Terms shorter than a gram can't use the index.
+        sql = "SELECT * FROM search WHERE 1"
+        params = []
+    if kinds:
+        sql += f" AND kind IN ({', '.join('?' * len(kinds))})"
+        params += list(kinds)
+    sql += " ORDER BY path"
+    results = []
+    for row in conn.execute(sql, params):
+        # Grams only narrow things down, the terms still have to be in there.
+        if not all(term in row["text"] for term in terms):
+            continue
+        results.append(
+            {
+                "path": row["path"],
+                "kind": row["kind"],
+                "name": row["name"],
+                "context": row["context"],
+                "tags": json.loads(row["tags"]),
+            }
+        )
+        if limit and len(results) >= limit:
+            break
+    return results
@@ -13,34 +13,175 @@
 # limitations under the License.
 
 
+import asyncio
+import os
+import time
+
 from ignite.logger import get_logger
 
 LOGGER = get_logger(__name__)
+ENV = os.environ
+QUEUE_SIZE = int(ENV.get("IGNITE_SOCKET_QUEUE_SIZE", 256))
+SEND_TIMEOUT = float(ENV.get("IGNITE_SOCKET_SEND_TIMEOUT", 10))
+# "disconnect" closes clients that fall a full queue behind, "drop" keeps
+# them connected and discards the messages they can't take.
+OVERFLOW = ENV.get("IGNITE_SOCKET_OVERFLOW", "disconnect")
+CLOSE_CODE = 1013
+
+
+def _get_loop():
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+class Connection:
+    def __init__(self, websocket, session_id, queue_size):
+        self.websocket = websocket
+        self.session_id = session_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.task = None
+        self.connected = time.time()
+        self.sent = 0
+        self.dropped = 0
+        self.lag = 0
+        self.closed = False
+
+    def __repr__(self):
+        return f"Connection({self.session_id})"
+
+    def put(self, data):
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait((time.time(), data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        return True
+
+    async def write(self, on_error):
+        while True:
+            queued, data = await self.queue.get()
+            try:
+                await asyncio.wait_for(self.websocket.send_json(data), SEND_TIMEOUT)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                on_error(self, f"send failed: {e!r}")
+                return
+            self.sent += 1
+            self.lag = time.time() - queued
+
+    def stop(self):
+        self.closed = True
+        if self.task and not self.task.done():
+            self.task.cancel()
+
+    def stats(self):
+        oldest = self.queue._queue[0][0] if self.queue.qsize() else 0
+        return {
+            "session_id": self.session_id,
+            "queued": self.queue.qsize(),
+            "max_queued": self.queue.maxsize,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "lag": round(self.lag, 4),
+            "oldest": round(time.time() - oldest, 4) if oldest else 0,
+            "connected": self.connected,
+        }
 
 
 class SocketManager:
-    def __init__(self):
-        self.connections = []
+    def __init__(self, queue_size=QUEUE_SIZE, overflow=OVERFLOW):
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.sessions = {}
+        self.disconnected = 0
 
     async def connect(self, websocket, session_id):
-        for i, (ws, id) in enumerate(self.connections):
-            if session_id == id:
-                LOGGER.warning(f"Closing websocket {session_id}")
-                self.connections.pop(i)
-                break
+        old = self.sessions.pop(session_id, None)
+        if old:
+            LOGGER.warning(f"Closing websocket {session_id}")
+            self._close(old)
         await websocket.accept()
-        self.connections.append((websocket, session_id))
-        LOGGER.info(f"Total connections: {len(self.connections)}")
+        connection = Connection(websocket, session_id, self.queue_size)
+        connection.task = asyncio.create_task(connection.write(self._drop))
+        self.sessions[session_id] = connection
+        LOGGER.info(f"Total connections: {len(self.sessions)}")
 
     def disconnect(self, websocket, session_id):
-        self.connections.remove((websocket, session_id))
-        LOGGER.info(f"Total connections: {len(self.connections)}")
+        connection = self.sessions.get(session_id)
+        if not connection or connection.websocket is not websocket:
+            return
+        del self.sessions[session_id]
+        connection.stop()
+        LOGGER.info(f"Total connections: {len(self.sessions)}")
 
-    async def broadcast(self, data):
-        for connection in self.connections:
-            await connection[0].send_json(data)
-    
     def get(self, session_id):
-        for ws, id in self.connections:
-            if session_id == id:
-                return ws
+        connection = self.sessions.get(session_id)
+        return connection.websocket if connection else None
+
+    def session_ids(self):
+        return list(self.sessions)
+
+    def send(self, session_id, data):
+        # Safe to call from any thread or loop, never waits on the client.
+        connection = self.sessions.get(session_id)
+        if not connection or connection.closed:
+            return False
+        self._put(connection, data)
+        return True
+
+    async def broadcast(self, data):
+        for connection in list(self.sessions.values()):
+            self._put(connection, data)
+
+    def _put(self, connection, data):
+        if _get_loop() is connection.loop:
+            self._enqueue(connection, data)
+            return
+        try:
+            connection.loop.call_soon_threadsafe(self._enqueue, connection, data)
+        except RuntimeError:
+            self._drop(connection, "event loop closed")
+
+    def _enqueue(self, connection, data):
+        if connection.put(data) or connection.closed:
+            return
+        if self.overflow == "drop":
+            LOGGER.debug(f"Dropped message for slow websocket {connection}")
+            return
+        self._drop(connection, f"send queue full ({connection.queue.maxsize})")
+
+    def _drop(self, connection, reason):
+        LOGGER.warning(f"Disconnecting websocket {connection.session_id}: {reason}")
+        if self.sessions.get(connection.session_id) is connection:
+            del self.sessions[connection.session_id]
+        self.disconnected += 1
+        self._close(connection)
+
+    def _close(self, connection):
+        connection.stop()
+
+        async def close():
+            try:
+                await connection.websocket.close(code=CLOSE_CODE)
+            except Exception:
+                pass
+
+        try:
+            connection.loop.call_soon_threadsafe(connection.loop.create_task, close())
+        except RuntimeError:
+            pass
+
+    def stats(self):
+        connections = [c.stats() for c in list(self.sessions.values())]
+        return {
+            "connections": len(connections),
+            "disconnected": self.disconnected,
+            "max_lag": max([c["lag"] for c in connections], default=0),
+            "sessions": connections,
+        }
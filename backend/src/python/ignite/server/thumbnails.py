@@ -0,0 +1,268 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import hashlib
+import os
+import platform
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future
+from pathlib import Path, PurePath
+
+from ignite import dispatch
+from ignite.server.constants import OS_NAMES, TOOLS
+from ignite.logger import get_logger
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+OS_NAME = OS_NAMES[platform.system()]
+SIZES = (128, 256, 512)
+DEFAULT_SIZE = 256
+# Pillow format name and media type for each derivative format.
+FORMATS = {"jpg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+FORMAT = ENV.get("IGNITE_THUMBNAIL_FORMAT", "jpg")
+QUALITY = int(ENV.get("IGNITE_THUMBNAIL_QUALITY", 85))
+CACHE_DIR = Path(
+    ENV.get(
+        "IGNITE_THUMBNAIL_CACHE", Path(ENV["IGNITE_USER_CONFIG_PATH"]) / "thumbnails"
+    )
+)
+CACHE_MB = int(ENV.get("IGNITE_THUMBNAIL_CACHE_MB", 1024))
+MAX_AGE = int(ENV.get("IGNITE_THUMBNAIL_MAX_AGE", 300))
+TIMEOUT = 60
+PRUNE_EVERY = 200
+MAX_FAILED = 10000
+SOURCE_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".tif": "image/tiff",
+    ".tiff": "image/tiff",
+    ".exr": "image/x-exr",
+}
+
+
+def get_size(size):
+    # Snap to the fixed sizes so every client shares the same derivatives.
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        return DEFAULT_SIZE
+    for s in SIZES:
+        if size <= s:
+            return s
+    return SIZES[-1]
+
+
+def _done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class ThumbnailCache:
+    def __init__(self, cache_dir=CACHE_DIR, fmt=FORMAT):
+        if fmt not in FORMATS:
+            LOGGER.error(f"Unknown thumbnail format {fmt}, using jpg")
+            fmt = "jpg"
+        self.cache_dir = Path(cache_dir)
+        self.fmt = fmt
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.unsupported = set()
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failed = 0
+
+    def locate(self, source, size):
+        # Keyed by source path and mtime, an overwritten source gets a new key
+        # and therefore a new ETag, the stale derivative is left to prune().
+        try:
+            st = os.stat(source)
+        except OSError:
+            return None, None
+        s = f"{source}\0{st.st_mtime_ns}\0{st.st_size}\0{size}\0{self.fmt}"
+        key = hashlib.blake2b(s.encode(), digest_size=16).hexdigest()
+        return key, self.cache_dir / key[:2] / f"{key}.{self.fmt}"
+
+    def result(self, path, key, media_type):
+        return {"path": path, "etag": key, "media_type": media_type}
+
+    def request(self, source, size=DEFAULT_SIZE):
+        # Returns a concurrent future resolving to the file to serve, or None.
+        source = PurePath(source).as_posix()
+        size = get_size(size)
+        media_type = SOURCE_TYPES.get(PurePath(source).suffix.lower())
+        if not media_type:
+            return _done(None)
+        key, dest = self.locate(source, size)
+        if not key:
+            return _done(None)
+        if dest.is_file():
+            with self.lock:
+                self.hits += 1
+            return _done(self.result(dest, key, FORMATS[self.fmt][1]))
+        with self.lock:
+            if key in self.unsupported:
+                self.hits += 1
+                return _done(self.result(Path(source), key, media_type))
+            future = self.pending.get(key)
+            if future:
+                return future
+            self.misses += 1
+            future = dispatch.submit(
+                "thumbnail", self.generate, source, dest, size, key, media_type
+            )
+            self.pending[key] = future
+        future.add_done_callback(lambda _: self.forget(key))
+        return future
+
+    def forget(self, key):
+        with self.lock:
+            self.pending.pop(key, None)
+
+    def generate(self, source, dest, size, key, media_type):
+        if dest.is_file():
+            return self.result(dest, key, FORMATS[self.fmt][1])
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        tmp = dest.with_name(f".{dest.stem}.{threading.get_ident()}{dest.suffix}")
+        ok = False
+        try:
+            ok = self.resize_pil(source, tmp, size) or self.resize_oiio(
+                source, tmp, size
+            )
+            if ok:
+                os.replace(tmp, dest)
+        except Exception as e:
+            LOGGER.error(f"Failed to write thumbnail for {source}: {e}")
+            ok = False
+        finally:
+            if not ok and tmp.exists():
+                tmp.unlink()
+        with self.lock:
+            if ok:
+                self.generated += 1
+            else:
+                self.failed += 1
+                if len(self.unsupported) >= MAX_FAILED:
+                    self.unsupported.clear()
+                self.unsupported.add(key)
+            prune = ok and self.generated % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+        if not ok:
+            # Still better than nothing, the browser can cache the original.
+            LOGGER.warning(f"Serving original in place of thumbnail for {source}")
+            return self.result(Path(source), key, media_type)
+        return self.result(dest, key, FORMATS[self.fmt][1])
+
+    def resize_pil(self, source, output, size):
+        if not Image:
+            return False
+        try:
+            with Image.open(source) as img:
+                # Lets JPEG decode at a fraction of the resolution.
+                img.draft("RGB", (size, size))
+                img = img.convert("RGB")
+                img.thumbnail((size, size))
+                img.save(output, FORMATS[self.fmt][0], quality=QUALITY)
+        except Exception as e:
+            LOGGER.debug(f"Pillow couldn't thumbnail {source}: {e}")
+            return False
+        return True
+
+    def resize_oiio(self, source, output, size):
+        tool = shutil.which(TOOLS.get("oiiotool").get(OS_NAME))
+        if not tool:
+            return False
+        cmd = [tool, source, "--ch", "R,G,B", "--fit", f"{size}x{size}"]
+        if source.lower().endswith(".exr"):
+            cmd += ["--colorconvert", "linear", "sRGB"]
+        cmd += ["-o", str(output)]
+        try:
+            process = subprocess.run(cmd, capture_output=True, timeout=TIMEOUT)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            LOGGER.error(f"oiiotool failed for {source}: {e}")
+            return False
+        if process.returncode:
+            LOGGER.error(f"oiiotool failed for {source}: {process.stderr.decode()}")
+            return False
+        return Path(output).is_file()
+
+    def prune(self, max_mb=CACHE_MB):
+        # Oldest derivatives go first, sources that changed leave theirs behind.
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.cache_dir):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+        limit = max_mb * 1024 * 1024
+        if total <= limit:
+            return 0
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= limit * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        LOGGER.debug(f"Pruned {removed} thumbnails from {self.cache_dir}")
+        return removed
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "format": self.fmt,
+                "pending": len(self.pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "generated": self.generated,
+                "failed": self.failed,
+                "hit_rate": round(self.hits / total, 4) if total else 0,
+                "generator": "pillow" if Image else "oiiotool",
+            }
+
+
+THUMBNAILS = ThumbnailCache()
+
+
+def request(path, size=DEFAULT_SIZE):
+    return THUMBNAILS.request(path, size)
+
+
+def prune():
+    return THUMBNAILS.prune()
+
+
+def get_stats():
+    return THUMBNAILS.stats()
@@ -0,0 +1,324 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import asyncio
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from ignite.server.media import POLL, report_paused
+from ignite.server.vault_store import is_storable
+from ignite.logger import get_logger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+WORKERS = int(ENV.get("IGNITE_COPY_WORKERS", 8))
+MODES = ("copy", "reflink", "hardlink")
+MODE = ENV.get("IGNITE_COPY_MODE", "copy")
+VERIFY = ENV.get("IGNITE_COPY_VERIFY", "1") == "1"
+CHUNK = 8 * 1024 * 1024
+BUFFER = 1024 * 1024
+FICLONE = 0x40049409
+# The kernel fast paths refuse some pairs of filesystems, those fall back.
+FALLBACK_ERRORS = {
+    errno.EXDEV,
+    errno.ENOSYS,
+    errno.EINVAL,
+    errno.EOPNOTSUPP,
+    errno.ENOTSUP,
+    errno.EBADF,
+    errno.EPERM,
+    errno.ENOTTY,
+}
+
+
+class Cancelled(Exception):
+    pass
+
+
+def get_files(source):
+    dirs = []
+    files = []
+    for root, names, filenames in os.walk(source, followlinks=True):
+        names.sort()
+        rel = os.path.relpath(root, source)
+        dirs.append(rel)
+        for name in sorted(filenames):
+            files.append(os.path.normpath(os.path.join(rel, name)))
+    return dirs, files
+
+
+def is_empty_dir(path):
+    try:
+        with os.scandir(path) as entries:
+            return not any(True for _ in entries)
+    except NotADirectoryError:
+        return False
+
+
+def checksum(path, advance=None):
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(BUFFER)
+            if not chunk:
+                break
+            h.update(chunk)
+            if advance:
+                advance(len(chunk))
+    return h.hexdigest()
+
+
+class CopyJob:
+    # Copies a directory tree with a pool of file workers. Data moves through
+    # copy_file_range or sendfile where the platform has them, reflink and
+    # hardlink modes share blocks instead when both sides are on the same
+    # filesystem, and fall back to a copy when they aren't.
+    def __init__(self, source, dest, state=None, mode=MODE, verify=VERIFY, store=None):
+        self.source = Path(source)
+        self.dest = Path(dest)
+        self.state = state if state is not None else {}
+        if mode not in MODES:
+            LOGGER.error(f"Unknown copy mode {mode}, using copy")
+            mode = "copy"
+        self.mode = mode
+        self.store = store
+        self.verify = verify and mode == "copy"
+        self.lock = threading.Lock()
+        self.dirs, self.files = get_files(self.source)
+        self.sizes = {}
+        for rel in self.files:
+            try:
+                self.sizes[rel] = os.stat(self.source / rel).st_size
+            except OSError:
+                self.sizes[rel] = 0
+        # Stored files are read once to hash them and once more when new.
+        twice = self.verify or self.store
+        self.total = sum(self.sizes.values()) * (2 if twice else 1)
+        self.done = 0
+        self.can_range = hasattr(os, "copy_file_range")
+        self.can_sendfile = hasattr(os, "sendfile")
+        self.can_reflink = bool(fcntl)
+        self.can_link = True
+        self.linked = 0
+        self.copied = 0
+
+    def progress(self):
+        if not self.total:
+            return 0
+        with self.lock:
+            return round(self.done / self.total * 100, 1)
+
+    def advance(self, amount):
+        with self.lock:
+            self.done += amount
+
+    def check(self):
+        while self.state.get("paused") and not self.state.get("killed"):
+            time.sleep(POLL)
+        if self.state.get("killed"):
+            raise Cancelled()
+
+    def copy_file(self, rel):
+        self.check()
+        src = self.source / rel
+        dst = self.dest / rel
+        if self.store and is_storable(src.name):
+            self.store_file(src, dst, rel)
+            return
+        if self.mode == "hardlink" and self.link(src, dst):
+            self.advance(self.sizes[rel])
+            return
+        if self.mode == "reflink" and self.reflink(src, dst):
+            self.advance(self.sizes[rel])
+            shutil.copystat(src, dst)
+            return
+        self.copy_data(src, dst)
+        shutil.copystat(src, dst)
+        with self.lock:
+            self.copied += 1
+        if self.verify:
+            self.check()
+            if checksum(src, self.advance) != checksum(dst):
+                raise OSError(f"Checksum mismatch copying {src} to {dst}")
+
+    def store_file(self, src, dst, rel):
+        # Content the vault store has already is linked, not copied again.
+        digest = self.store.hash(src, self.advance)
+        self.check()
+        if self.store.link(digest, dst):
+            self.advance(self.sizes[rel])
+            with self.lock:
+                self.linked += 1
+            return
+        tmp = self.store.temp_path(digest)
+        try:
+            self.copy_data(src, tmp)
+            if self.verify and self.store.hash(tmp) != digest:
+                raise OSError(f"Checksum mismatch copying {src} to {tmp}")
+            linked = self.store.add(tmp, digest, dst)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        with self.lock:
+            self.copied += 1
+        if not linked:
+            shutil.copystat(src, dst)
+
+    def link(self, src, dst):
+        if not self.can_link:
+            return False
+        try:
+            os.link(src, dst)
+        except OSError as e:
+            if e.errno not in FALLBACK_ERRORS:
+                raise
+            LOGGER.warning(f"Can't hardlink {src} to {dst}, copying instead: {e}")
+            self.can_link = False
+            return False
+        with self.lock:
+            self.linked += 1
+        return True
+
+    def reflink(self, src, dst):
+        if not self.can_reflink:
+            return False
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        except OSError as e:
+            if e.errno not in FALLBACK_ERRORS:
+                raise
+            LOGGER.warning(f"Can't reflink {src} to {dst}, copying instead: {e}")
+            self.can_reflink = False
+            return False
+        with self.lock:
+            self.linked += 1
+        return True
+
+    def copy_data(self, src, dst):
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            in_fd = fsrc.fileno()
+            out_fd = fdst.fileno()
+            if self.can_range and self.copy_kernel(os.copy_file_range, in_fd, out_fd):
+                return
+            if self.can_sendfile and self.copy_kernel(self.sendfile, in_fd, out_fd):
+                return
+            while True:
+                self.check()
+                chunk = fsrc.read(BUFFER)
+                if not chunk:
+                    break
+                fdst.write(chunk)
+                self.advance(len(chunk))
+
+    def sendfile(self, in_fd, out_fd, count):
+        return os.sendfile(out_fd, in_fd, None, count)
+
+    def copy_kernel(self, fn, in_fd, out_fd):
+        # Returns False when the call isn't supported here, before any data
+        # moved, so the next method can start from the top.
+        copied = 0
+        while True:
+            self.check()
+            try:
+                sent = fn(in_fd, out_fd, CHUNK)
+            except OSError as e:
+                if copied or e.errno not in FALLBACK_ERRORS:
+                    raise
+                if fn is os.copy_file_range:
+                    self.can_range = False
+                else:
+                    self.can_sendfile = False
+                return False
+            if not sent:
+                return True
+            copied += sent
+            self.advance(sent)
+
+    def run(self):
+        # Blocking, returns whether the whole tree made it. A failed copy is
+        # removed again, a half written version is worse than none. An empty
+        # dest is a version reserved for this copy.
+        if self.dest.exists() and not is_empty_dir(self.dest):
+            LOGGER.error(f"Can't copy {self.source} to {self.dest}, it exists")
+            return False
+        start = time.time()
+        try:
+            for rel in self.dirs:
+                (self.dest / rel).mkdir(parents=True, exist_ok=True)
+            with ThreadPoolExecutor(WORKERS) as pool:
+                futures = [pool.submit(self.copy_file, rel) for rel in self.files]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+            for rel in reversed(self.dirs):
+                shutil.copystat(self.source / rel, self.dest / rel)
+        except Cancelled:
+            LOGGER.warning(f"Stopped copying {self.source} to {self.dest}")
+            shutil.rmtree(self.dest, ignore_errors=True)
+            return False
+        except OSError as e:
+            LOGGER.error(f"Failed to copy {self.source} to {self.dest}: {e}")
+            shutil.rmtree(self.dest, ignore_errors=True)
+            return False
+        LOGGER.debug(
+            f"Copied {self.source} to {self.dest} in {time.time() - start:.2f}s: "
+            f"{len(self.files)} files, {self.copied} copied, {self.linked} linked"
+        )
+        return True
+
+
+def copy(source, dest, mode=MODE, verify=VERIFY, store=None):
+    return CopyJob(source, dest, mode=mode, verify=verify, store=store).run()
+
+
+async def copy_tree(
+    source,
+    dest,
+    state=None,
+    progress_fn=None,
+    mode=MODE,
+    verify=VERIFY,
+    store=None,
+):
+    state = state if state is not None else {}
+    job = CopyJob(source, dest, state, mode, verify, store)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(None, job.run)
+    reported = None
+    while not future.done():
+        await asyncio.wait({future}, timeout=POLL)
+        await report_paused(state, progress_fn, bool(state.get("paused")))
+        progress = job.progress()
+        if progress_fn and progress != reported and not future.done():
+            reported = progress
+            await progress_fn(progress)
+    return future.result()
@@ -0,0 +1,207 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import os
+from functools import lru_cache
+from pathlib import Path, PurePath
+
+import parse
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+CACHE_SIZE = int(ENV.get("IGNITE_URI_CACHE_SIZE", 65536))
+PREFIX = "ign:"
+FIELDS = ("project", "group", "context", "task", "name", "version", "comp")
+TEMPLATE = parse.compile("ign:{project}:{group}:{context}:{task}:{name}@{version}")
+TEMPLATE_COMP = parse.compile(
+    "ign:{project}:{group}:{context}:{task}:{name}@{version}#{comp}"
+)
+TEMPLATE_UNVERSIONED = parse.compile("ign:{project}:{group}:{context}:{task}:{name}")
+
+
+def is_uri(s):
+    return str(s).startswith(PREFIX)
+
+
+def format_version(s):
+    s = str(s)
+    return f"v{s.zfill(3)}"
+
+
+def _split(uri):
+    # Single pass equivalent of the templates for well formed URIs, anything
+    # unusual (empty fields, newlines) goes through _split_templates instead.
+    if not uri.startswith(PREFIX) or "\n" in uri:
+        return None
+    parts = uri[len(PREFIX) :].split(":", 4)
+    if not all(parts):
+        return None
+    if len(parts) < 5:
+        return dict(zip(FIELDS, parts))
+    data = dict(zip(FIELDS, parts[:4]))
+    rest = parts[4]
+    name, at, version = rest.partition("@")
+    comp = sep = ""
+    if "#" in uri:
+        # Like the templates, a "#" rules out the plain versioned form.
+        version, sep, comp = version.partition("#")
+        if not (at and sep):
+            at = ""
+    if not at:
+        data["name"] = rest
+        return data
+    if not (name and version) or (sep and not comp):
+        return None
+    data.update(name=name, version=version)
+    if comp:
+        data["comp"] = comp
+    return data
+
+
+def _split_templates(uri):
+    if "#" in uri:
+        result = TEMPLATE_COMP.parse(uri)
+    else:
+        result = TEMPLATE.parse(uri)
+    if not result:
+        result = TEMPLATE_UNVERSIONED.parse(uri)
+    if not result:
+        amount = uri.count(":")
+        pattern_split = "ign:{project}:{group}:{context}:{task}".split(":")
+        pattern = ":".join(pattern_split[: amount + 1])
+        result = parse.parse(pattern, uri)
+    if not result:
+        return None
+    return dict(result.named)
+
+
+def split(uri):
+    uri = str(uri)
+    data = _split(uri)
+    if data is None:
+        data = _split_templates(uri)
+    return data
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _to_path(uri, root):
+    data = split(uri)
+    if not data:
+        LOGGER.error(f"Failed to parse {uri}")
+        return ""
+    name = data.get("name")
+    if name and name != "__scene__":
+        data["task"] += "/exports"
+    elif name:
+        data["name"] = "scenes"
+    version = data.get("version")
+    if version and not version.startswith("v"):
+        data["version"] = format_version(version)
+    if data.get("comp"):
+        data["comp"] = data["comp"].replace("#", "")
+    parts = []
+    for part in FIELDS:
+        if not data.get(part):
+            break
+        parts.append(data[part])
+    return root.joinpath(*parts)
+
+
+def to_path(uri, root):
+    if not isinstance(root, Path):
+        root = Path(root)
+    return _to_path(str(uri), root)
+
+
+def format_uri(
+    project, group=None, context=None, task=None, name=None, version=None, comp=None
+):
+    uri = "ign"
+    for bit in (project, group, context, task, name):
+        if bit:
+            uri += f":{bit}"
+    if version:
+        if isinstance(version, str):
+            version = int(version.replace("v", ""))
+        uri += f"@{version}"
+    if comp:
+        uri += f"#{comp}"
+    return uri
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _from_path(path, kind, root, version_override):
+    path = PurePath(path).as_posix()
+    root = PurePath(root).as_posix()
+    splt = path.split(root, 1)[1].replace("/exports", "").split("/")
+    i = len(splt)
+    project = splt[0]
+    group = splt[1] if i > 1 else None
+    context = task = name = version = comp = None
+    if kind == "assetversion":
+        context = "/".join(splt[2:-3])
+        task = splt[-3]
+        name = splt[-2]
+        version = splt[-1]
+    elif kind == "asset":
+        context = "/".join(splt[2:-2])
+        task = splt[-2]
+        name = splt[-1]
+    elif kind.startswith("task"):
+        context = "/".join(splt[2:-1])
+        task = splt[-1]
+    elif kind == "scene":
+        context = "/".join(splt[2:-3])
+        task = splt[-3]
+        name = "__scene__"
+        version = splt[-1]
+    elif kind == "component" and splt[-2] == "preview":
+        # Scene component, currently just used for previews.
+        context = "/".join(splt[2:-5])
+        task = splt[-5]
+        name = splt[-2]
+        version = splt[-3]
+        comp = splt[-1]
+    elif kind == "component":
+        context = "/".join(splt[2:-4])
+        task = splt[-4]
+        name = splt[-3]
+        version = splt[-2]
+        comp = splt[-1]
+    else:
+        context = "/".join(splt[2:])
+    if version_override:
+        version = version_override
+    return format_uri(project, group, context, task, name, version, comp)
+
+
+def from_path(path, kind, root, version_override=None):
+    # Purely lexical, the caller has to know what kind of entity path is.
+    if not path or not kind:
+        return ""
+    return _from_path(path, kind, root, version_override)
+
+
+def cache_clear():
+    _to_path.cache_clear()
+    _from_path.cache_clear()
+
+
+def get_stats():
+    return {
+        "to_path": _to_path.cache_info()._asdict(),
+        "from_path": _from_path.cache_info()._asdict(),
+    }
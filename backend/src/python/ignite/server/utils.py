@@ -18,8 +18,8 @@ import os
 import re
 from pathlib import Path, PurePath
 
-import parse
 import yaml
+from ignite.server import anchor_cache, kind_cache, uri as uri_codec
 from ignite.server.constants import ANCHORS
 from ignite.logger import get_logger
 
@@ -29,13 +29,6 @@ IGNITE_ROOT = Path(ENV["IGNITE_ROOT"])
 SERVER_CONFIG_PATH = os.environ["IGNITE_SERVER_USER_CONFIG_PATH"]
 
 KINDS = {v: k for k, v in ANCHORS.items()}
-URI_TEMPLATE = parse.compile("ign:{project}:{group}:{context}:{task}:{name}@{version}")
-URI_TEMPLATE_COMP = parse.compile(
-    "ign:{project}:{group}:{context}:{task}:{name}@{version}#{comp}"
-)
-URI_TEMPLATE_UNVERSIONED = parse.compile(
-    "ign:{project}:{group}:{context}:{task}:{name}"
-)
 
 
 def get_config(formatted=True) -> dict:
@@ -53,6 +46,8 @@ def get_config(formatted=True) -> dict:
             "root": root,
             "server_address": config.get("server_address"),
             "vault": root / config["vault_name"],
+            "watcher": config.get("watcher", "auto"),
+            "watcher_poll_interval": config.get("watcher_poll_interval", 10),
         }
     return config
 
@@ -133,6 +128,8 @@ def create_anchor(path, name):
         data = {"creation_time": datetime.datetime.utcnow()}
         with open(full_path, "w+") as f:
             yaml.safe_dump(data, f)
+        anchor_cache.invalidate(full_path)
+        kind_cache.invalidate(path, recursive=False)
     return full_path
 
 
@@ -146,184 +143,54 @@ def create_delayed_anchor(path=None, name=None, anchor=None):
         data = {"creation_time": datetime.datetime.fromtimestamp(creation_time)}
         with open(anchor, "w+") as f:
             yaml.safe_dump(data, f)
+        anchor_cache.invalidate(anchor)
+        kind_cache.invalidate(anchor.parent, recursive=False)
 
 
-def get_uri(path, version_override=None):
+def get_uri(path, version_override=None, kind=None):
     if not path:
         return ""
-    path = Path(path)
-    path_str = path.as_posix()
-    if path.is_file() or "#" in path.name:
-        entity_kind = "component"
-    else:
-        entity_kind = get_dir_kind(path)
-    if not entity_kind:
-        return ""
-    splt = (
-        path_str.split(CONFIG["root"].as_posix(), 1)[1]
-        .replace("/exports", "")
-        .split("/")
-    )
-    i = len(splt)
-    project = splt[0]
-    group = splt[1] if i > 1 else None
-    context = task = name = version = comp = None
-    if entity_kind == "assetversion":
-        context = "/".join(splt[2:-3])
-        task = splt[-3]
-        name = splt[-2]
-        version = splt[-1]
-    elif entity_kind == "asset":
-        context = "/".join(splt[2:-2])
-        task = splt[-2]
-        name = splt[-1]
-    elif entity_kind.startswith("task"):
-        context = "/".join(splt[2:-1])
-        task = splt[-1]
-    elif entity_kind == "scene":
-        context = "/".join(splt[2:-3])
-        task = splt[-3]
-        name = "__scene__"
-        version = splt[-1]
-    elif entity_kind == "component" and splt[-2] == "preview":
-        # Scene component, currently just used for previews.
-        context = "/".join(splt[2:-5])
-        task = splt[-5]
-        name = splt[-2]
-        version = splt[-3]
-        comp = splt[-1]
-    elif entity_kind == "component":
-        context = "/".join(splt[2:-4])
-        task = splt[-4]
-        name = splt[-3]
-        version = splt[-2]
-        comp = splt[-1]
-    else:
-        context = "/".join(splt[2:])
-
-    bits = [project, group, context, task, name]
-    uri = "ign"
-    for bit in bits:
-        if bit:
-            uri += f":{bit}"
-    if version_override:
-        if isinstance(version_override, str):
-            version_override = int(version_override.replace("v", ""))
-        uri += f"@{version_override}"
-    elif version:
-        if isinstance(version, str):
-            version = int(version.replace("v", ""))
-        uri += f"@{version}"
-    if comp:
-        uri += f"#{comp}"
-    return uri
+    if not kind:
+        path = Path(path)
+        if path.is_file() or "#" in path.name:
+            kind = "component"
+        else:
+            kind = get_dir_kind(path)
+    return uri_codec.from_path(path, kind, CONFIG["root"], version_override)
 
 
 def is_uri(s):
-    s = str(s)
-    if not s.startswith("ign:"):
-        return False
-    # if not s.count(":") > 4:
-    #     return False
-    return True
+    return uri_codec.is_uri(s)
 
 
 def format_int_version(s):
-    s = str(s)
-    return f"v{s.zfill(3)}"
+    return uri_codec.format_version(s)
 
 
 def get_dir_type(path, dir_type):
-    root = CONFIG["root"].as_posix()
-    anchor = ANCHORS[dir_type]
-    path = Path(path)
-    parent = path
-    iter = 1
-    while root != parent.as_posix():
-        contents = [c.name for c in parent.iterdir()]
-        if anchor in contents:
-            return parent
-        parent = parent.parent
-        iter += 1
-        if iter > 20:
-            raise Exception(f"Reached iteration limit when walking directory: {path}")
-    return ""
+    return kind_cache.get_ancestor(path, dir_type, CONFIG["root"])
 
 
 def get_dir_kind(path):
-    anchors = KINDS.keys()
-    for x in Path(path).iterdir():
-        name = x.name
-        if name not in anchors:
-            continue
-        kind = KINDS[name]
-        if kind != "task":
-            return kind
-        with open(x, "r") as f:
-            config = yaml.safe_load(f)
-        if not config:
-            return "task_generic"
-        kind = "task_" + config.get("task_type", "generic")
+    anchor = kind_cache.get_anchor(path)
+    if not anchor:
+        return
+    kind = KINDS[anchor.name]
+    if kind != "task":
         return kind
+    config = anchor_cache.load_anchor(anchor)
+    if not config:
+        return "task_generic"
+    kind = "task_" + config.get("task_type", "generic")
+    return kind
 
 
 def uri_to_path(uri):
-    uri = str(uri)
-    if "#" in uri:
-        result = URI_TEMPLATE_COMP.parse(uri)
-    else:
-        result = URI_TEMPLATE.parse(uri)
-    if not result:
-        result = URI_TEMPLATE_UNVERSIONED.parse(uri)
-    if not result:
-        amount = uri.count(":")
-        pattern_split = "ign:{project}:{group}:{context}:{task}".split(":")
-        pattern = ":".join(pattern_split[: amount + 1])
-        result = parse.parse(pattern, uri)
-    if not result:
-        LOGGER.error(f"Failed to parse {uri}")
-        return ""
-    data = result.named
-    name = data.get("name")
-    if name and name != "__scene__":
-        data["task"] += "/exports"
-    elif name:
-        data["name"] = "scenes"
-    if data.get("version"):
-        version = data.get("version")
-        if not version.startswith("v"):
-            data["version"] = format_int_version(data["version"])
-    if data.get("comp"):
-        data["comp"] = data["comp"].replace("#", "")
-    path = CONFIG["root"]
-    parts = ["project", "group", "context", "task", "name", "version", "comp"]
-    for part in parts:
-        if not data.get(part):
-            return path
-        path = path / data[part]
-    return path
-
-
-def query_filter(entities, query):
-    filtered = []
-
-    filter_string = query.get("filter_string", "").strip()
-    if filter_string:
-        for entity in entities:
-            s = str(entity.values())
-            if filter_string in s:
-                filtered.append(entity)
-
-    if not filter_string:
-        return entities
-
-    return filtered
+    return uri_codec.to_path(uri, CONFIG["root"])
 
 
 def is_dir_of_kind(path, kind):
-    path = Path(path)
-    anchor = ANCHORS[kind]
-    return (path / anchor).is_file()
+    return kind_cache.is_kind(path, kind)
 
 
 def get_directories(path):
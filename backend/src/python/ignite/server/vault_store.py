@@ -0,0 +1,336 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import errno
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from uuid import uuid4
+
+from ignite.server.utils import CONFIG
+from ignite.logger import get_logger
+
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+
+LOGGER = get_logger(__name__)
+ENV = os.environ
+ENABLED = ENV.get("IGNITE_VAULT_DEDUPE", "0") == "1"
+STORE_NAME = ".store"
+ALGORITHM = "blake3" if blake3 else "blake2b"
+READ_ONLY = 0o444
+BUFFER = 1024 * 1024
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS objects (
+        hash TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        created REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS links (
+        path TEXT PRIMARY KEY,
+        hash TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS links_hash ON links (hash)",
+)
+
+
+def new_hash():
+    if blake3:
+        return blake3.blake3()
+    return hashlib.blake2b(digest_size=32)
+
+
+def is_storable(name):
+    # Anchors and other dot files get edited in place, a shared inode would
+    # carry the edit into every version.
+    return not name.startswith(".")
+
+
+def same_file(a, b):
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+class VaultStore:
+    # Every file is kept once under objects/ by its content hash, vault
+    # versions hardlink to it. The links table is the reference count.
+    def __init__(self, root):
+        self.root = Path(root)
+        self.objects = self.root / "objects" / ALGORITHM
+        self.tmp = self.root / "tmp"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.tmp.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(
+            self.root / "store.db", timeout=30, check_same_thread=False
+        )
+        self.conn.row_factory = sqlite3.Row
+        # Opened from every workstation over the vault share, WAL's shm file
+        # only coordinates processes on one host.
+        self.conn.execute("PRAGMA journal_mode=TRUNCATE")
+        with self.connect() as conn:
+            for statement in SCHEMA:
+                conn.execute(statement)
+        self.can_link = True
+
+    def __repr__(self):
+        return f"VaultStore({self.root})"
+
+    @contextmanager
+    def connect(self):
+        with self.lock:
+            with self.conn:
+                yield self.conn
+
+    def hash(self, path, advance=None):
+        h = new_hash()
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(BUFFER)
+                if not chunk:
+                    break
+                h.update(chunk)
+                if advance:
+                    advance(len(chunk))
+        return h.hexdigest()
+
+    def object_path(self, digest):
+        return self.objects / digest[:2] / digest
+
+    def temp_path(self, digest):
+        return self.tmp / f"{digest}.{uuid4().hex}"
+
+    def record(self, path, digest):
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO links (path, hash) VALUES (?, ?)",
+                (Path(path).as_posix(), digest),
+            )
+
+    def link(self, digest, dest):
+        # Returns False when there's no such object yet.
+        obj = self.object_path(digest)
+        if not obj.is_file():
+            return False
+        if self.can_link:
+            try:
+                os.link(obj, dest)
+                self.record(dest, digest)
+                return True
+            except FileNotFoundError:
+                # A gc removed it since, dest is still to be written.
+                if not obj.exists():
+                    return False
+                raise
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                LOGGER.warning(f"Can't hardlink into {dest}, storing copies: {e}")
+                self.can_link = False
+        return False
+
+    def add(self, tmp, digest, dest):
+        # Publishes a finished temp file as the object and links dest to it.
+        obj = self.object_path(digest)
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        size = os.stat(tmp).st_size
+        try:
+            # Another worker may have stored the same content meanwhile.
+            os.link(tmp, obj)
+            # Every version shares the object, a write through one would
+            # change them all.
+            os.chmod(obj, READ_ONLY)
+        except FileExistsError:
+            pass
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO objects (hash, size, created) VALUES (?, ?, ?)",
+                (digest, size, time.time()),
+            )
+        if self.link(digest, dest):
+            os.unlink(tmp)
+            return True
+        if same_file(tmp, obj):
+            # tmp is the object now, dest gets a copy of its own.
+            shutil.copyfile(tmp, dest)
+            os.unlink(tmp)
+        else:
+            os.replace(tmp, dest)
+        return False
+
+    def dedupe(self, path):
+        # Brings files that were copied in before the store existed into it.
+        files = linked = saved = 0
+        for root, dirs, names in os.walk(path):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in names:
+                if not is_storable(name):
+                    continue
+                file = Path(root) / name
+                files += 1
+                digest = self.hash(file)
+                obj = self.object_path(digest)
+                if same_file(file, obj):
+                    self.record(file, digest)
+                    continue
+                if obj.is_file():
+                    tmp = file.with_name(f".{name}.{uuid4().hex}")
+                    try:
+                        os.link(obj, tmp)
+                    except OSError as e:
+                        LOGGER.error(f"Failed to dedupe {file}: {e}")
+                        continue
+                    os.replace(tmp, file)
+                    saved += obj.stat().st_size
+                    linked += 1
+                    self.record(file, digest)
+                    continue
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                try:
+                    os.link(file, obj)
+                    os.chmod(obj, READ_ONLY)
+                except OSError as e:
+                    LOGGER.error(f"Failed to store {file}: {e}")
+                    continue
+                with self.connect() as conn:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO objects (hash, size, created) "
+                        "VALUES (?, ?, ?)",
+                        (digest, obj.stat().st_size, time.time()),
+                    )
+                self.record(file, digest)
+        LOGGER.debug(f"Deduped {path}: {files} files, {linked} linked")
+        return {"files": files, "linked": linked, "saved_bytes": saved}
+
+    def gc(self):
+        # Links whose file went away or was replaced stop counting, objects
+        # nothing counts anymore are removed, so are stray temp files.
+        with self.connect() as conn:
+            links = conn.execute("SELECT path, hash FROM links").fetchall()
+        stale = [
+            row["path"]
+            for row in links
+            if not same_file(row["path"], self.object_path(row["hash"]))
+        ]
+        with self.connect() as conn:
+            conn.executemany("DELETE FROM links WHERE path = ?", [(p,) for p in stale])
+            orphans = conn.execute(
+                "SELECT hash, size FROM objects WHERE hash NOT IN "
+                "(SELECT DISTINCT hash FROM links)"
+            ).fetchall()
+        removed = 0
+        freed = 0
+        for row in orphans:
+            obj = self.object_path(row["hash"])
+            try:
+                # Still linked from somewhere the store doesn't know about.
+                if obj.stat().st_nlink > 1:
+                    continue
+                obj.unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                LOGGER.error(f"Failed to remove {obj}: {e}")
+                continue
+            with self.connect() as conn:
+                conn.execute("DELETE FROM objects WHERE hash = ?", (row["hash"],))
+            removed += 1
+            freed += row["size"]
+        for tmp in self.tmp.iterdir():
+            try:
+                if time.time() - tmp.stat().st_mtime > 24 * 3600:
+                    tmp.unlink()
+            except OSError:
+                pass
+        LOGGER.info(f"{self} gc removed {removed} objects, {len(stale)} links")
+        return {"stale_links": len(stale), "removed": removed, "freed_bytes": freed}
+
+    def stats(self):
+        with self.connect() as conn:
+            stored = conn.execute(
+                "SELECT COUNT(*) AS amount, COALESCE(SUM(size), 0) AS size "
+                "FROM objects"
+            ).fetchone()
+            logical = conn.execute(
+                "SELECT COUNT(*) AS amount, COALESCE(SUM(objects.size), 0) AS size "
+                "FROM links JOIN objects ON links.hash = objects.hash"
+            ).fetchone()
+        saved = logical["size"] - stored["size"]
+        return {
+            "algorithm": ALGORITHM,
+            "objects": stored["amount"],
+            "links": logical["amount"],
+            "stored_bytes": stored["size"],
+            "logical_bytes": logical["size"],
+            "saved_bytes": max(saved, 0),
+            "ratio": (
+                round(logical["size"] / stored["size"], 2) if stored["size"] else 0
+            ),
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+STORES = {}
+STORES_LOCK = threading.Lock()
+
+
+def get_store(root=None):
+    # None unless the vault store is switched on and no root was given.
+    if root is None:
+        if not ENABLED:
+            return None
+        root = CONFIG["vault"] / STORE_NAME
+    root = Path(root)
+    with STORES_LOCK:
+        store = STORES.get(root)
+        if not store:
+            store = STORES[root] = VaultStore(root)
+        return store
+
+
+def gc():
+    store = get_store()
+    return store.gc() if store else {}
+
+
+def dedupe(path=None):
+    store = get_store()
+    if not store:
+        return {}
+    return store.dedupe(path or CONFIG["vault"])
+
+
+def get_stats():
+    store = get_store()
+    if not store:
+        return {"enabled": False}
+    return {"enabled": True, **store.stats()}
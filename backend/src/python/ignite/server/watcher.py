@@ -0,0 +1,496 @@
+# Copyright 2022 Georgios Savvas
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+
+#     https://www.apache.org/licenses/LICENSE-2.0
+
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from pathlib import PurePath
+
+from ignite.server import index
+from ignite.server.utils import CONFIG
+from ignite.logger import get_logger
+
+LOGGER = get_logger(__name__)
+DEBOUNCE = 0.5
+LEAF_KINDS = ("assetversion", "scene")
+NETWORK_FS = ("nfs", "nfs4", "cifs", "smbfs", "smb3", "9p", "afs", "fuse.sshfs")
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+WATCH_MASK = (
+    IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+EVENT_STRUCT = struct.Struct("iIII")
+
+
+def is_anchor(name):
+    return name.startswith(".ign_") and name.endswith(".yaml")
+
+
+def is_ignored(name):
+    return name.startswith(".") or name in index.RESERVED_NAMES
+
+
+def get_fs_type(path):
+    try:
+        with open("/proc/mounts", "r") as f:
+            mounts = f.read().splitlines()
+    except OSError:
+        return ""
+    path = os.path.realpath(path)
+    mount_point = ""
+    fs_type = ""
+    for line in mounts:
+        parts = line.split()
+        if len(parts) < 3:
+            continue
+        mount = parts[1].replace("\\040", " ")
+        if path != mount and not path.startswith(mount.rstrip("/") + "/"):
+            continue
+        if len(mount) >= len(mount_point):
+            mount_point = mount
+            fs_type = parts[2]
+    return fs_type
+
+
+def get_watch_dirs(entity_index, path=None):
+    # Only directories that can gain or lose entities need watching, version
+    # and scene directories are picked up through their parents.
+    root = entity_index.root.as_posix()
+    path = PurePath(path).as_posix() if path else root
+    parents = {}
+    if path == root:
+        parents[root] = "project"
+    for row in entity_index.rows(path=None if path == root else path):
+        if row["kind"] in LEAF_KINDS:
+            continue
+        parents[row["path"]] = row["kind"]
+    dirs = dict(parents)
+    for parent in parents:
+        for name in index.CONTAINER_NAMES:
+            container = f"{parent}/{name}"
+            if os.path.isdir(container):
+                dirs[container] = ""
+    if PurePath(path).name in index.CONTAINER_NAMES and os.path.isdir(path):
+        dirs[path] = ""
+    return dirs
+
+
+class InotifyBackend:
+    name = "inotify"
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library("c") or "libc.so.6"
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watches = {}
+        self.paths = {}
+
+    def watched(self):
+        return list(self.paths.keys())
+
+    def add(self, path):
+        if path in self.paths:
+            return True
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                raise OSError(err, "Reached fs.inotify.max_user_watches")
+            return False
+        self.watches[wd] = path
+        self.paths[path] = wd
+        return True
+
+    def discard(self, path):
+        wd = self.paths.pop(path, None)
+        if wd is None:
+            return
+        self.watches.pop(wd, None)
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout, tracked):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_STRUCT.unpack_from(data, offset)
+            offset += EVENT_STRUCT.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                events.append((None, "overflow"))
+                continue
+            parent = self.watches.get(wd)
+            if not parent:
+                continue
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                if self.paths.get(parent) == wd:
+                    self.paths.pop(parent)
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                events.append((parent, "removed"))
+                continue
+            if mask & IN_ISDIR:
+                if is_ignored(name) or parent not in tracked:
+                    continue
+                path = f"{parent}/{name}"
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    events.append((path, "created"))
+                elif mask & (IN_DELETE | IN_MOVED_FROM):
+                    events.append((path, "removed"))
+            elif is_anchor(name):
+                events.append((parent, "changed"))
+        return events
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+class PollingBackend:
+    name = "polling"
+
+    def __init__(self, interval, stop_event):
+        self.interval = interval
+        self.stop_event = stop_event
+        self.snapshots = {}
+        self.next_poll = time.time() + interval
+
+    def watched(self):
+        return list(self.snapshots.keys())
+
+    def snapshot(self, path):
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            entries = list(os.scandir(path))
+        except OSError:
+            return None
+        anchor = None
+        children = set()
+        for entry in entries:
+            name = entry.name
+            try:
+                if is_anchor(name):
+                    anchor = (name, entry.stat().st_mtime_ns)
+                elif not is_ignored(name) and entry.is_dir(follow_symlinks=False):
+                    children.add(name)
+            except OSError:
+                continue
+        return mtime, anchor, children
+
+    def add(self, path):
+        if path not in self.snapshots:
+            self.snapshots[path] = self.snapshot(path)
+        return True
+
+    def discard(self, path):
+        self.snapshots.pop(path, None)
+
+    def read(self, timeout, tracked):
+        wait = min(timeout, max(0, self.next_poll - time.time()))
+        if self.stop_event.wait(wait) or time.time() < self.next_poll:
+            return []
+        events = []
+        for path, old in list(self.snapshots.items()):
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                self.snapshots.pop(path, None)
+                events.append((path, "removed"))
+                continue
+            if old and mtime == old[0]:
+                if not old[1]:
+                    continue
+                try:
+                    anchor_mtime = os.stat(f"{path}/{old[1][0]}").st_mtime_ns
+                except OSError:
+                    anchor_mtime = None
+                if anchor_mtime == old[1][1]:
+                    continue
+            new = self.snapshot(path)
+            if new is None:
+                self.snapshots.pop(path, None)
+                events.append((path, "removed"))
+                continue
+            self.snapshots[path] = new
+            if not old:
+                continue
+            if new[1] != old[1]:
+                events.append((path, "changed"))
+            if path not in tracked:
+                continue
+            for name in new[2] - old[2]:
+                events.append((f"{path}/{name}", "created"))
+            for name in old[2] - new[2]:
+                events.append((f"{path}/{name}", "removed"))
+        self.next_poll = time.time() + self.interval
+        return events
+
+    def close(self):
+        self.snapshots = {}
+
+
+class Watcher:
+    def __init__(self):
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.backend = None
+        self.root = ""
+        self.tracked = set()
+        self.pending = {}
+        self.subscribers = []
+
+    def subscribe(self, fn):
+        if fn not in self.subscribers:
+            self.subscribers.append(fn)
+
+    def unsubscribe(self, fn):
+        if fn in self.subscribers:
+            self.subscribers.remove(fn)
+
+    def get_mode(self):
+        mode = str(CONFIG.get("watcher", "auto")).lower()
+        if mode in ("off", "false", "none", "no"):
+            return ""
+        if mode in ("poll", "polling"):
+            return "polling"
+        if not sys.platform.startswith("linux"):
+            if mode == "inotify":
+                LOGGER.warning("inotify is only available on Linux, polling instead")
+            return "polling"
+        if mode == "auto":
+            fs_type = get_fs_type(self.root)
+            if fs_type in NETWORK_FS:
+                LOGGER.info(f"Projects root is on {fs_type}, polling for changes")
+                return "polling"
+        return "inotify"
+
+    def make_backend(self, mode):
+        if mode == "inotify":
+            try:
+                return InotifyBackend()
+            except Exception as e:
+                LOGGER.warning(f"Could not start inotify ({e}), polling instead")
+        interval = float(CONFIG.get("watcher_poll_interval") or 10)
+        return PollingBackend(interval, self.stop_event)
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.root = CONFIG["root"].as_posix()
+        mode = self.get_mode()
+        if not mode:
+            LOGGER.info("Filesystem watcher disabled")
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(
+            target=self.run, args=(mode,), name="ignite-watcher", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+            self.thread = None
+
+    def restart(self):
+        self.stop()
+        self.start()
+
+    def run(self, mode):
+        self.backend = self.make_backend(mode)
+        LOGGER.info(f"Watching {self.root} for changes ({self.backend.name})")
+        try:
+            self.watch_all()
+            self.loop()
+        except OSError as e:
+            if e.errno != errno.ENOSPC or self.backend.name != "inotify":
+                LOGGER.error(f"Filesystem watcher stopped: {e}")
+                return
+            LOGGER.warning(f"{e}, falling back to polling")
+            self.backend.close()
+            self.backend = self.make_backend("polling")
+            self.watch_all()
+            self.loop()
+        except Exception as e:
+            LOGGER.error(f"Filesystem watcher stopped: {e}")
+        finally:
+            self.backend.close()
+            self.backend = None
+            self.tracked = set()
+            self.pending = {}
+
+    def loop(self):
+        while not self.stop_event.is_set():
+            events = self.backend.read(DEBOUNCE, self.tracked)
+            now = time.time()
+            for path, event in events:
+                if event == "overflow":
+                    LOGGER.warning("Watcher queue overflowed, resyncing")
+                    self.watch_all(recrawl=True)
+                    continue
+                queued = self.pending.get(path)
+                if queued and queued[0] == event:
+                    continue
+                self.pending[path] = (event, now)
+            self.flush()
+
+    def watch_all(self, recrawl=False):
+        self.tracked = set()
+        self.pending = {}
+        for path in self.backend.watched():
+            self.backend.discard(path)
+        self.tracked.add(self.root)
+        self.backend.add(self.root)
+        try:
+            entries = list(os.scandir(self.root))
+        except OSError as e:
+            LOGGER.error(f"Failed to list {self.root}: {e}")
+            return
+        for entry in entries:
+            if self.stop_event.is_set():
+                return
+            if is_ignored(entry.name) or not entry.is_dir(follow_symlinks=False):
+                continue
+            entity_index = index.get_index(entry.path)
+            if not entity_index:
+                continue
+            if recrawl:
+                entity_index.crawl()
+            else:
+                entity_index.ensure_crawled()
+            self.watch_tree(entity_index, entry.path)
+
+    def watch(self, path, kind=""):
+        self.backend.add(path)
+        if not kind or kind == "asset":
+            return
+        # Plain directories below tracked entities may become entities once
+        # an anchor is written into them.
+        try:
+            entries = list(os.scandir(path))
+        except OSError:
+            return
+        for entry in entries:
+            if is_ignored(entry.name) or entry.path in self.tracked:
+                continue
+            if entry.is_dir(follow_symlinks=False):
+                self.backend.add(entry.path)
+
+    def watch_tree(self, entity_index, path):
+        dirs = get_watch_dirs(entity_index, path)
+        self.tracked.update(dirs)
+        for d in sorted(dirs):
+            self.watch(d, dirs[d])
+
+    def unwatch_tree(self, path):
+        prefix = path + "/"
+        for watched in self.backend.watched():
+            if watched == path or watched.startswith(prefix):
+                self.backend.discard(watched)
+        self.tracked = {
+            p for p in self.tracked if p != path and not p.startswith(prefix)
+        }
+
+    def flush(self):
+        now = time.time()
+        ready = [p for p, (_, ts) in self.pending.items() if now - ts >= DEBOUNCE]
+        for path in sorted(ready):
+            event, _ = self.pending.pop(path)
+            try:
+                self.apply(path, event)
+            except Exception as e:
+                if isinstance(e, OSError) and e.errno == errno.ENOSPC:
+                    raise
+                LOGGER.error(f"Failed to process {event} event for {path}: {e}")
+            finally:
+                # Caches go stale whether or not the index kept up.
+                self.notify(event, path)
+
+    def notify(self, event, path):
+        for fn in self.subscribers:
+            try:
+                fn(event, path)
+            except Exception as e:
+                LOGGER.error(f"Watcher subscriber {fn} failed: {e}")
+
+    def apply(self, path, event):
+        if path == self.root:
+            return
+        entity_index = index.get_index(path)
+        if event == "removed":
+            self.unwatch_tree(path)
+            if entity_index and entity_index.root.as_posix() == path:
+                index.forget_index(path)
+            elif entity_index and entity_index.is_crawled:
+                entity_index.remove(path)
+            return
+        if not entity_index:
+            return
+        if entity_index.root.as_posix() == path:
+            if event == "created":
+                entity_index.ensure_crawled()
+                self.watch_tree(entity_index, path)
+            return
+        if not entity_index.is_crawled:
+            return
+        if event == "created":
+            entity_index.reindex(path)
+        else:
+            entity_index.update(path)
+        if entity_index.get(path) or PurePath(path).name in index.CONTAINER_NAMES:
+            self.watch_tree(entity_index, path)
+        elif os.path.isdir(path):
+            self.backend.add(path)
+
+
+WATCHER = Watcher()
@@ -0,0 +1,18 @@
+from ignite.client.api import update_entity
+from ignite.server.transfer import MODE, copy_tree
+from ignite.server.vault_store import get_store
+
+LABEL = "copy"
+CONCURRENCY = 2
+
+async def main(entity, state, progress_fn):
+    await progress_fn(state="running")
+    mode = entity.get("copy_mode", MODE)
+    # Vault imports link content the vault store already holds.
+    store = get_store(entity["store"]) if entity.get("store") else None
+    ok = await copy_tree(entity["path"], entity["copy_dest"], state=state, progress_fn=progress_fn, mode=mode, store=store)
+    if not ok:
+        await progress_fn(state="error")
+        return
+    update_entity(entity.get("update") or entity["copy_dest"], entity.get("recursive", False))
+    await progress_fn(100)
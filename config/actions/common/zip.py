@@ -1,16 +1,19 @@
-import shutil
 from pathlib import Path
+from ignite.server.archive import get_members, write_archive
 
 LABEL = "zip"
+CONCURRENCY = 2
 
 async def main(entity, state, progress_fn):
     await progress_fn(state="running")
-    zip_dest = Path(entity["zip_dest"])
-    zip_dest.parent.mkdir(exist_ok=True, parents=True)
-    source_path = Path(entity["path"])
-    shutil.make_archive(
-        zip_dest.as_posix(),
-        "zip",
-        source_path.as_posix()
-    )
+    # make_archive used to add the extension, the destination stays the same.
+    zip_dest = Path(f"{entity['zip_dest']}.zip")
+    if entity.get("sources"):
+        members = get_members(entity["sources"], nest=True)
+    else:
+        members = get_members([entity["path"]])
+    ok = await write_archive(members, zip_dest, state=state, progress_fn=progress_fn)
+    if not ok:
+        await progress_fn(state="error")
+        return
     await progress_fn(100)
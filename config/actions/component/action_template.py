@@ -3,6 +3,10 @@ import asyncio
 
 LABEL = "Very heavy task"
 EXTENSIONS = [".exr", ".jpg"]
+# Optional, queued actions with a higher priority start first.
+PRIORITY = 0
+# Optional, how many of this action can run at the same time.
+CONCURRENCY = None
 
 async def main(entity, state, progress_fn=None):
     if progress_fn:
@@ -3,7 +3,7 @@ import logging
 
 from pathlib import PurePath
 from ignite.logger import get_logger
-from ignite.server.media import convert_img
+from ignite.server.media import convert_images
 
 LABEL = "Create JPEGs"
 EXTENSIONS = [".exr"]
@@ -16,5 +16,8 @@ async def main(entity, state, progress_fn):
     name = input.name.replace("_acescg", "")
     output = input.with_name(name).with_suffix(".jpg")
     LOGGER.debug(f"Converting {input} to {output}")
-    convert_img(str(input), str(output))
+    ok = await convert_images(str(input), str(output), state, progress_fn)
+    if not ok:
+        await progress_fn(state="error")
+        return
     await progress_fn(100)
@@ -99,7 +99,7 @@ export const Tile = (props: TileProps) => {
       thumbnailPath = thumbnailPath.replace("####", frame);
     }
     if (!hasThumbnail) return "";
-    return BuildFileURL(thumbnailPath, config);
+    return BuildFileURL(thumbnailPath, config, { thumbnail: 256 });
   };
   const thumbnailURL = props.thumbnail || getSeqThumbnail();
 
@@ -33,6 +33,13 @@ type Context = {
   ancestor_kinds?: { [key: string]: string };
 };
 
+type Change = {
+  event: string;
+  path: string;
+  kind: string;
+  uri: string;
+};
+
 export type ContextContextType = {
   currentContext: Context;
   setCurrentContext: (path: string) => Promise<boolean>;
@@ -45,6 +52,12 @@ const createAssetUpdatesSocket = (sessionID: string, address: string) => {
   return serverSocket("asset_updates", sessionID, address);
 };
 
+const isAffected = (changes: Change[], context: Context) => {
+  if (!context.posix) return false;
+  const current = context.posix.replace(/\/$/, "");
+  return changes.some((change) => change.path === current || change.path.startsWith(`${current}/`));
+};
+
 const destroySocket = (socket: WebSocketWithInterval) => {
   if (!socket) return;
   if (socket.interval) clearInterval(socket.interval);
@@ -68,7 +81,21 @@ export const ContextProvider = ({ children }: PropsWithChildren) => {
     const serverAddress = window.services.get_env("IGNITE_SERVER_ADDRESS");
     Promise.all([sessionID, serverAddress]).then((resp) => {
       Promise.resolve(createAssetUpdatesSocket(resp[0], resp[1])).then((ws) => {
-        ws.onmessage = (data) => console.log("ASSET_UPDATES RECEIVED:", data);
+        // Everything, changes outside the current context are dropped here.
+        ws.onopen = () => ws.send(JSON.stringify({ subscribe: [] }));
+        ws.onmessage = (event) => {
+          const message = JSON.parse(event.data);
+          if (message.type !== "changes") return;
+          const changes = message.data.map((change: Change) => ({
+            ...change,
+            path: BuildFileURL(change.path, config, { pathOnly: true }).replaceAll("\\", "/"),
+          }));
+          setCurrentContext((prevState) =>
+            isAffected(changes, prevState)
+              ? { ...prevState, update: prevState.update + 1 }
+              : prevState,
+          );
+        };
         setSocket(ws);
       });
     });
@@ -18,6 +18,7 @@ interface Options {
   reverse?: Boolean;
   pathOnly?: Boolean;
   forceRemote?: Boolean;
+  thumbnail?: number;
 }
 
 const BuildFileURL = (
@@ -61,6 +62,10 @@ const BuildFileURL = (
     const platform_output = isWinPath ? output.replaceAll("/", "\\") : output;
     const value = `${platform_output}${platform_path}`;
     return value;
+  } else if ((remote || options.forceRemote) && options.thumbnail) {
+    const path = encodeURIComponent(unix_path);
+    const value = `http://${address}/api/v1/thumbnail?path=${path}&size=${options.thumbnail}`;
+    return value;
   } else if (remote || options.forceRemote) {
     const value = `http://${address}/files/${unix_path}`;
     return value;
@@ -178,10 +178,12 @@ export const VaultImport = ({
     setNameValue(data.name);
   }, [open]);
 
-  const handleSubmit = () => {
+  const handleSubmit = async () => {
     setLoading(true);
-    serverRequest("vault_import", { ...data, name: nameValue }).then((resp) => {
-      if (resp.ok) enqueueSnackbar("Done", { variant: "success" });
+    const sessionID = await window.services.get_env("IGNITE_SESSION_ID");
+    const payload = { ...data, name: nameValue, session_id: sessionID };
+    clientRequest("vault_import", payload).then((resp) => {
+      if (resp.ok) enqueueSnackbar("Vault import started", { variant: "success" });
       else enqueueSnackbar(resp.error || "An error occurred...", { variant: "error" });
       if (fn) fn();
     });
@@ -245,10 +247,12 @@ export const VaultExport = ({
     setNameValue(data.name);
   }, [open]);
 
-  const handleSubmit = () => {
+  const handleSubmit = async () => {
     setLoading(true);
-    serverRequest("vault_export", { ...data, name: nameValue }).then((resp) => {
-      if (resp.ok) enqueueSnackbar("Done", { variant: "success" });
+    const sessionID = await window.services.get_env("IGNITE_SESSION_ID");
+    const payload = { ...data, name: nameValue, session_id: sessionID };
+    clientRequest("vault_export", payload).then((resp) => {
+      if (resp.ok) enqueueSnackbar("Vault export started", { variant: "success" });
       else enqueueSnackbar(resp.msg || "An error occurred...", { variant: "error" });
       if (fn) fn();
     });
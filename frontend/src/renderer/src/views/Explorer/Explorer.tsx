@@ -23,7 +23,7 @@ import {
 } from "@renderer/types/common";
 import { debounce } from "lodash";
 import { useSnackbar } from "notistack";
-import React, { ChangeEvent, ClipboardEvent, useContext, useEffect, useState } from "react";
+import React, { ChangeEvent, ClipboardEvent, useContext, useEffect, useRef, useState } from "react";
 
 import ContextMenu, { ContextMenuType, handleContextMenu } from "../../components/ContextMenu";
 import DataPlaceholder from "../../components/DataPlaceholder";
@@ -119,6 +119,7 @@ const Explorer = () => {
   const [loadedData, setLoadedData] = useState([]);
   const [pages, setPages] = useState({ total: 1, current: 1 });
   const [query, setQuery] = useState(defaultQuery);
+  const cursors = useRef<{ [page: number]: string }>({});
   const savedExplorerSettings = loadExplorerSettings() as ExplorerSettings;
   const [explorerSettings, setExplorerSettings] = useState(
     savedExplorerSettings || defaultExplorerSettings,
@@ -153,13 +154,20 @@ const Explorer = () => {
     saveExplorerSettings(explorerSettings);
   }, [explorerSettings]);
 
+  useEffect(() => {
+    cursors.current = {};
+  }, [explorerSettings.currentResultType, explorerSettings.tilesPerPage, currentContext, query]);
+
   useEffect(() => {
     if (!config.ready) return;
+    const pageCursors = cursors.current;
+    const page = pages.current;
     const data = {
-      page: pages.current,
+      page: page,
       limit: explorerSettings.tilesPerPage,
       path: BuildFileURL(currentContext.path, config, { reverse: true, pathOnly: true }),
       query: query,
+      cursor: pageCursors[page],
     };
     const method = methods[explorerSettings.currentResultType as keyof typeof methods];
     setIsLoading(true);
@@ -168,6 +176,7 @@ const Explorer = () => {
       setIsLoading(false);
       setLoadedData(resp.data);
       setPages((prevPages) => ({ ...prevPages, total: resp.pages?.total }));
+      if (resp.cursor) pageCursors[page + 1] = resp.cursor;
     });
   }, [
     pages.current,
@@ -14,7 +14,7 @@
 
 import { IgniteAssetVersion, SaveReflexLayoutProps } from "@renderer/types/common";
 import { debounce } from "lodash";
-import { useContext, useEffect, useState } from "react";
+import { useContext, useEffect, useRef, useState } from "react";
 import { DndProvider } from "react-dnd";
 import { HTML5Backend } from "react-dnd-html5-backend";
 import { HandlerProps, ReflexContainer, ReflexElement, ReflexSplitter } from "react-reflex";
@@ -73,6 +73,7 @@ const Vault = (props: VaultProps) => {
   const [loadedData, setLoadedData] = useState([]);
   const [pages, setPages] = useState<PagesType>({ total: 1, current: 1, results: 0 });
   const [tilesPerPage, setTilesPerPage] = useState(50);
+  const cursors = useRef<{ [page: number]: string }>({});
   const [selectedEntity, setSelectedEntity] = useState<IgniteAssetVersion>();
   const { config } = useContext(ConfigContext) as ConfigContextType;
   const { vaultContext } = useContext(VaultContext) as VaultContextType;
@@ -118,14 +119,21 @@ const Vault = (props: VaultProps) => {
     });
   }, [vaultContext, refreshValue, props.open]);
 
+  useEffect(() => {
+    cursors.current = {};
+  }, [vaultContext, query, tilesPerPage, selectedCollection, refreshValue]);
+
   useEffect(() => {
     if (!props.open) return;
     if (!config.ready) return;
+    const pageCursors = cursors.current;
+    const page = pages.current;
     const data = {
       path: vaultContext.path,
-      page: pages.current,
+      page: page,
       limit: tilesPerPage,
       query: { ...query, latest: true },
+      cursor: pageCursors[page],
     };
     setIsLoading(true);
     serverRequest("get_assetversions", data).then((resp) => {
@@ -136,6 +144,7 @@ const Vault = (props: VaultProps) => {
         total: resp.pages?.total,
         results: resp.pages?.results,
       }));
+      if (resp.cursor) pageCursors[page + 1] = resp.cursor;
     });
   }, [
     pages.current,
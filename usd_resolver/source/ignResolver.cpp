@@ -2,6 +2,17 @@
 #include <iostream>
 #include <string>
 #include <cstdlib>
+#include <algorithm>
+#include <atomic>
+#include <chrono>
+#include <cstdint>
+#include <cstring>
+#include <mutex>
+#include <sstream>
+#include <unordered_map>
+#include <unordered_set>
+#include <utility>
+#include <vector>
 
 #include "pxr/pxr.h"
 #include "pxr/usd/ar/defineResolver.h"
@@ -13,6 +24,8 @@
 #include <pxr/base/tf/stringUtils.h>
 #include <pxr/base/tf/diagnostic.h>
 #include <pxr/base/vt/value.h>
+#include <pxr/base/js/json.h>
+#include <pxr/usd/sdf/layer.h>
 
 //  #include "pxr/base/arch/fileSystem.h"
 //  #include "pxr/base/arch/systemInfo.h"
@@ -23,7 +36,8 @@
 //  #include "pxr/base/tf/stringUtils.h"
 //  #include "pxr/base/vt/value.h"
 
-//  #include "tbb/concurrent_hash_map.h"
+#include "tbb/concurrent_hash_map.h"
+#include "tbb/spin_rw_mutex.h"
 
 #include "ignResolver.h"
 
@@ -34,6 +48,14 @@
 #pragma comment (lib, "Wldap32.lib")
 #pragma comment (lib, "advapi32.lib")
 
+#ifdef _WIN32
+#define IGN_EXPORT extern "C" __declspec(dllexport)
+#else
+#define IGN_EXPORT extern "C" __attribute__((visibility("default")))
+#endif
+
+PXR_NAMESPACE_USING_DIRECTIVE
+
 
 int is_uri(const std::string uri) {
    if (uri.rfind("ign:", 0) == 0) {
@@ -48,40 +70,346 @@ static size_t WriteCallback(void *contents, size_t size, size_t nmemb, void *use
    return size * nmemb;
 }
 
-std::string resolve_uri(const std::string uri) {
-    // std::cout << "Attempting to resolve " + uri + "\n";
+// Uris per /resolve_batch request when prefetching a layer's dependencies.
+static const size_t PREFETCH_BATCH_SIZE = 500;
+
+static std::once_flag curl_init_flag;
+// A single handle so the connection to the server is kept alive between
+// requests, curl handles can't be shared between threads so it's locked.
+static std::mutex curl_mutex;
+static CURL *curl_handle = NULL;
+static struct curl_slist *curl_headers = NULL;
+
+double get_env_number(const char* name, double fallback) {
+    char* value = std::getenv(name);
+    if (!value || !*value) {
+        return fallback;
+    }
+    char* end = NULL;
+    double number = std::strtod(value, &end);
+    return end == value ? fallback : number;
+}
+
+typedef std::chrono::steady_clock Clock;
+
+struct CacheEntry {
+    std::string path;
+    bool expires;
+    Clock::time_point expiry;
+    uint64_t used;
+};
+
+typedef tbb::concurrent_hash_map<std::string, CacheEntry> CacheMap;
+
+// Resolved uris kept for the whole session. Pinned versions never change
+// so they stay until evicted, @latest/@best and unversioned uris expire.
+// Setting IGNITE_RESOLVER_FLUSH to a new value empties it on the next
+// resolve, e.g. os.environ["IGNITE_RESOLVER_FLUSH"] = str(time.time()).
+class ResolveCache {
+public:
+    ResolveCache()
+        : latest_ttl(get_env_number("IGNITE_RESOLVER_LATEST_TTL", 5)),
+          ttl(get_env_number("IGNITE_RESOLVER_CACHE_TTL", 60)),
+          max_size((size_t)get_env_number("IGNITE_RESOLVER_CACHE_SIZE", 100000)),
+          tick(0), hits(0), misses(0), expired(0), evictions(0), flushes(0) {
+        char* value = std::getenv("IGNITE_RESOLVER_FLUSH");
+        flush_token = value ? value : "";
+    }
+
+    bool get(const std::string& uri, std::string& path) {
+        check_flush();
+        {
+            tbb::spin_rw_mutex::scoped_lock lock(entries_mutex, false);
+            CacheMap::accessor accessor;
+            if (entries.find(accessor, uri)) {
+                CacheEntry& entry = accessor->second;
+                if (!entry.expires || Clock::now() < entry.expiry) {
+                    entry.used = ++tick;
+                    path = entry.path;
+                    hits++;
+                    return true;
+                }
+                entries.erase(accessor);
+                expired++;
+            }
+        }
+        misses++;
+        return false;
+    }
+
+    bool contains(const std::string& uri) {
+        tbb::spin_rw_mutex::scoped_lock lock(entries_mutex, false);
+        CacheMap::const_accessor accessor;
+        if (!entries.find(accessor, uri)) {
+            return false;
+        }
+        return !accessor->second.expires || Clock::now() < accessor->second.expiry;
+    }
+
+    void set(const std::string& uri, const std::string& path) {
+        double seconds = get_ttl(uri, path);
+        if (seconds == 0) {
+            return;
+        }
+        {
+            tbb::spin_rw_mutex::scoped_lock lock(entries_mutex, false);
+            CacheMap::accessor accessor;
+            entries.insert(accessor, uri);
+            CacheEntry& entry = accessor->second;
+            entry.path = path;
+            entry.expires = seconds > 0;
+            entry.expiry = Clock::now() + std::chrono::milliseconds((int64_t)(seconds * 1000));
+            entry.used = ++tick;
+        }
+        if (entries.size() > max_size) {
+            evict();
+        }
+    }
+
+    bool mark_layer(const std::string& layerPath) {
+        std::lock_guard<std::mutex> lock(layers_mutex);
+        return layers.insert(layerPath).second;
+    }
+
+    void flush() {
+        {
+            tbb::spin_rw_mutex::scoped_lock lock(entries_mutex, true);
+            entries.clear();
+        }
+        std::lock_guard<std::mutex> lock(layers_mutex);
+        layers.clear();
+        flushes++;
+    }
+
+    std::string stats() {
+        std::ostringstream stream;
+        stream << "{\"size\": " << entries.size()
+               << ", \"max_size\": " << max_size
+               << ", \"hits\": " << hits.load()
+               << ", \"misses\": " << misses.load()
+               << ", \"expired\": " << expired.load()
+               << ", \"evictions\": " << evictions.load()
+               << ", \"flushes\": " << flushes.load()
+               << ", \"latest_ttl\": " << latest_ttl
+               << ", \"ttl\": " << ttl << "}";
+        return stream.str();
+    }
 
-    CURL *curl;
-    CURLcode res;
-    struct curl_slist *headers = NULL;
+private:
+    double get_ttl(const std::string& uri, const std::string& path) {
+        // Returns the seconds to keep a result for, negative never expires.
+        // Failures are retried soon in case the version gets published.
+        if (path.empty()) {
+            return latest_ttl;
+        }
+        size_t at = uri.rfind('@');
+        if (at == std::string::npos) {
+            return ttl;
+        }
+        std::string version = uri.substr(at + 1, uri.find('#', at) - at - 1);
+        if (version == "latest" || version == "best") {
+            return latest_ttl;
+        }
+        if (!version.empty() && version[0] == 'v') {
+            version = version.substr(1);
+        }
+        if (!version.empty() &&
+            version.find_first_not_of("0123456789") == std::string::npos) {
+            return -1;
+        }
+        return ttl;
+    }
+
+    void check_flush() {
+        char* value = std::getenv("IGNITE_RESOLVER_FLUSH");
+        std::string token = value ? value : "";
+        std::lock_guard<std::mutex> lock(flush_mutex);
+        if (token == flush_token) {
+            return;
+        }
+        flush_token = token;
+        flush();
+    }
 
-    headers = curl_slist_append(headers, "Accept: application/json");
-    headers = curl_slist_append(headers, "Content-Type: application/json");
-    headers = curl_slist_append(headers, "charset: utf-8");
+    void evict() {
+        // Drop the least recently used tenth in one go, whoever gets here
+        // first does it while the others carry on.
+        std::unique_lock<std::mutex> lock(evict_mutex, std::try_to_lock);
+        if (!lock.owns_lock()) {
+            return;
+        }
+        // Iterating isn't safe alongside inserts, this waits them out.
+        tbb::spin_rw_mutex::scoped_lock write_lock(entries_mutex, true);
+        std::vector<std::pair<uint64_t, std::string> > used;
+        used.reserve(entries.size());
+        for (CacheMap::iterator it = entries.begin(); it != entries.end(); ++it) {
+            used.push_back(std::make_pair(it->second.used, it->first));
+        }
+        size_t amount = used.size() / 10 + 1;
+        if (amount > used.size()) {
+            amount = used.size();
+        }
+        std::nth_element(used.begin(), used.begin() + (amount - 1), used.end());
+        for (size_t i = 0; i < amount; i++) {
+            if (entries.erase(used[i].second)) {
+                evictions++;
+            }
+        }
+    }
+
+    double latest_ttl;
+    double ttl;
+    size_t max_size;
+    CacheMap entries;
+    tbb::spin_rw_mutex entries_mutex;
+    std::atomic<uint64_t> tick;
+    std::atomic<uint64_t> hits;
+    std::atomic<uint64_t> misses;
+    std::atomic<uint64_t> expired;
+    std::atomic<uint64_t> evictions;
+    std::atomic<uint64_t> flushes;
+    std::mutex evict_mutex;
+    std::mutex flush_mutex;
+    std::string flush_token;
+    std::mutex layers_mutex;
+    std::unordered_set<std::string> layers;
+};
+
+static ResolveCache resolve_cache;
+
+IGN_EXPORT void ign_resolver_flush_cache() {
+    resolve_cache.flush();
+}
+
+// Writes the cache counters as json, returns the size needed for them.
+IGN_EXPORT size_t ign_resolver_cache_stats(char* buffer, size_t size) {
+    std::string stats = resolve_cache.stats();
+    if (buffer && size) {
+        size_t amount = std::min(stats.size(), size - 1);
+        std::memcpy(buffer, stats.c_str(), amount);
+        buffer[amount] = '\0';
+    }
+    return stats.size() + 1;
+}
+
+std::string post_request(const std::string endpoint, const std::string data) {
+    std::call_once(curl_init_flag, []() {
+        curl_global_init(CURL_GLOBAL_DEFAULT);
+    });
 
-    
     char* address_var = std::getenv("IGNITE_SERVER_ADDRESS");
     std::string address = address_var ? address_var : "";
-    address = std::string("http://") + address + "/api/v1/resolve";
-    std::string data = "{\"uri\":\"" + uri + "\"}";
+    address = std::string("http://") + address + "/api/v1/" + endpoint;
     std::string readBuffer = "";
-    curl_global_init(CURL_GLOBAL_DEFAULT);
-    curl = curl_easy_init();
-    if(curl) {
-        curl_easy_setopt(curl, CURLOPT_URL, address.c_str());
-        curl_easy_setopt(curl, CURLOPT_HTTPHEADER, headers);
-        curl_easy_setopt(curl, CURLOPT_POSTFIELDS, data.c_str());
-        curl_easy_setopt(curl, CURLOPT_POSTFIELDSIZE, data.length());
-        curl_easy_setopt(curl, CURLOPT_POST, 1);
-        curl_easy_setopt(curl, CURLOPT_WRITEFUNCTION, WriteCallback);
-        curl_easy_setopt(curl, CURLOPT_WRITEDATA, &readBuffer);
-        res = curl_easy_perform(curl);
-        curl_easy_cleanup(curl);
-    }
-
-    // std::cout << "Resolved to " + readBuffer + "\n\n";
+
+    std::lock_guard<std::mutex> lock(curl_mutex);
+    if (!curl_handle) {
+        curl_handle = curl_easy_init();
+        if (!curl_handle) {
+            std::cout << "Failed to initialise curl" << std::endl;
+            return readBuffer;
+        }
+        curl_headers = curl_slist_append(curl_headers, "Accept: application/json");
+        curl_headers = curl_slist_append(curl_headers, "Content-Type: application/json");
+        curl_headers = curl_slist_append(curl_headers, "charset: utf-8");
+        curl_easy_setopt(curl_handle, CURLOPT_HTTPHEADER, curl_headers);
+        curl_easy_setopt(curl_handle, CURLOPT_POST, 1L);
+        curl_easy_setopt(curl_handle, CURLOPT_TCP_KEEPALIVE, 1L);
+        curl_easy_setopt(curl_handle, CURLOPT_WRITEFUNCTION, WriteCallback);
+    }
+    curl_easy_setopt(curl_handle, CURLOPT_URL, address.c_str());
+    curl_easy_setopt(curl_handle, CURLOPT_POSTFIELDS, data.c_str());
+    curl_easy_setopt(curl_handle, CURLOPT_POSTFIELDSIZE, (long)data.length());
+    curl_easy_setopt(curl_handle, CURLOPT_WRITEDATA, &readBuffer);
+    CURLcode res = curl_easy_perform(curl_handle);
+    if (res != CURLE_OK) {
+        std::cout << "Request to " + address + " failed: " << curl_easy_strerror(res) << std::endl;
+        return "";
+    }
+    long status = 0;
+    curl_easy_getinfo(curl_handle, CURLINFO_RESPONSE_CODE, &status);
+    if (status != 200) {
+        std::cout << "Request to " + address + " returned " << status << std::endl;
+        return "";
+    }
     return readBuffer;
+}
 
+std::unordered_map<std::string, std::string> resolve_uris(const std::vector<std::string>& uris) {
+    std::unordered_map<std::string, std::string> resolved;
+    JsArray array;
+    for (const std::string& uri : uris) {
+        array.push_back(JsValue(uri));
+    }
+    JsObject request;
+    request["uris"] = JsValue(array);
+    std::string response = post_request("resolve_batch", JsWriteToString(JsValue(request)));
+    if (response.empty()) {
+        return resolved;
+    }
+    JsValue value = JsParseString(response);
+    if (!value.IsObject()) {
+        return resolved;
+    }
+    const JsObject& object = value.GetJsObject();
+    JsObject::const_iterator data = object.find("data");
+    if (data == object.end() || !data->second.IsObject()) {
+        return resolved;
+    }
+    for (const auto& item : data->second.GetJsObject()) {
+        // null means no such entity, cached as a failure.
+        resolved[item.first] = item.second.IsString() ? item.second.GetString() : "";
+    }
+    return resolved;
+}
+
+std::string resolve_uri(const std::string uri) {
+    // Goes through the batch endpoint so a single resolve is decoded the
+    // same way as a prefetched one and both cache the bare path.
+    // A null result or a failed request comes back as "", which get_ttl
+    // keeps only briefly, pinned or not.
+    std::unordered_map<std::string, std::string> resolved = resolve_uris({uri});
+    std::unordered_map<std::string, std::string>::const_iterator found = resolved.find(uri);
+    if (found == resolved.end()) {
+        return "";
+    }
+    return found->second;
+}
+
+void prefetch_layer(const std::string layerPath) {
+    // The first time a layer anchors a uri, resolve all of the uris it
+    // depends on in one go instead of one request each.
+    if (!resolve_cache.mark_layer(layerPath)) {
+        return;
+    }
+    SdfLayerHandle layer;
+    for (const SdfLayerHandle& loaded : SdfLayer::GetLoadedLayers()) {
+        if (loaded && loaded->GetResolvedPath().GetPathString() == layerPath) {
+            layer = loaded;
+            break;
+        }
+    }
+    if (!layer) {
+        return;
+    }
+    std::vector<std::string> uris;
+    for (const std::string& dependency : layer->GetCompositionAssetDependencies()) {
+        if (is_uri(dependency) && !resolve_cache.contains(dependency)) {
+            uris.push_back(dependency);
+        }
+    }
+    // A single dependency gets resolved on demand anyway.
+    if (uris.size() < 2) {
+        return;
+    }
+    for (size_t i = 0; i < uris.size(); i += PREFETCH_BATCH_SIZE) {
+        size_t end = std::min(i + PREFETCH_BATCH_SIZE, uris.size());
+        std::vector<std::string> batch(uris.begin() + i, uris.begin() + end);
+        std::unordered_map<std::string, std::string> resolved = resolve_uris(batch);
+        for (const auto& item : resolved) {
+            resolve_cache.set(item.first, item.second);
+        }
+    }
 }
 
 PXR_NAMESPACE_OPEN_SCOPE
@@ -93,6 +421,9 @@ IgniteResolver::IgniteResolver() {
 }
 
 IgniteResolver::~IgniteResolver() {
+    if (std::getenv("IGNITE_RESOLVER_STATS")) {
+        std::cout << "Ignite resolver cache: " + resolve_cache.stats() << std::endl;
+    }
 }
 
 std::string
@@ -115,6 +446,7 @@ IgniteResolver::_CreateIdentifier(
     // just return the normalized URI as the asset's identifier.
     if (assetPath.length() > 4 &&
         assetPath.substr(0, 4).compare("ign:") == 0) {
+        prefetch_layer(anchorAssetPath.GetPathString());
         return assetPath;
     }
 
@@ -152,7 +484,11 @@ IgniteResolver::_ResolveForNewAsset(const std::string& assetURI) const {
         return ArResolvedPath();
     }
 
-    std::string resolvedPath = resolve_uri(assetURI);
+    std::string resolvedPath;
+    if (!resolve_cache.get(assetURI, resolvedPath)) {
+        resolvedPath = resolve_uri(assetURI);
+        resolve_cache.set(assetURI, resolvedPath);
+    }
 
     std::cout << "_ResolveForNewAsset output " + resolvedPath << std::endl;
 